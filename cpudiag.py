@@ -33,40 +33,37 @@ emulator_8080.state.set_memory_by_address(0x01, 0x02) # 0x0100
 emulator_8080.state.set_memory_by_address(0xc9, 0x06) # Return
 # Stack pointer address didn't include correct initial offset
 emulator_8080.state.set_memory_by_address(0x07, 0x0170)
-# Skip DAA tests
-emulator_8080.state.set_memory_by_address(0xc3, 0x059c) # JMP to:
-emulator_8080.state.set_memory_by_address(0xc2, 0x059d) # lo c2
-emulator_8080.state.set_memory_by_address(0x05, 0x059e) # hi 05
 
-instruction_count = 0
+# The diagnostic prints messages through a CALL to 0x0005 and exits
+# through a jump to 0x0000, stop the emulator whenever it gets to either
+emulator_8080.add_trap(0x0005)
+emulator_8080.add_trap(0x0000)
 
 def get_membyte(address):
     return emulator_8080.state.get_memory_by_address(address)
 
 # Begin test
-while instruction_count < 620:
-    print("{:<8}".format(instruction_count) 
-       + "0x{:04x}".format(emulator_8080.state.get_register_value('pc'))
-        + "\t", end = '')
-    opcode = emulator_8080.emulate_operation()
-    if opcode == 0xcd: # call
-        if (5 == emulator_8080.state.get_register_value('pc')):
-            # If we jump to address 5, print the relevant message
-            address = emulator_8080.state.get_register_value('d') << 8
-            address += emulator_8080.state.get_register_value('e')
-            address += 3
-            line = ">"
-            while get_membyte(address) != ord("$"):
-                line += chr(get_membyte(address))
-                address += 1
-            print(line)
-            print(emulator_8080.state.summarize())
-            input("enter to continue")
-        elif (0 == emulator_8080.state.get_register_value('pc')):
-            # If we jump to address 0, the test has ended
-            print("> Exit called")
-            exit()
-    instruction_count += 1
-    if instruction_count % 10 == 0:# or instruction_count >= 600:
+while True:
+    reason = emulator_8080.run(100000)
+    if reason != 'trap':
+        # stopped for something the diagnostic never does, eg. halting
+        print("> Stopped: " + reason + " at 0x{:04x}".format(
+                        emulator_8080.state.get_register_value('pc')))
         print(emulator_8080.state.summarize())
-
+        exit()
+    if (5 == emulator_8080.state.get_register_value('pc')):
+        # If we jump to address 5, print the relevant message
+        address = emulator_8080.state.get_register_value('d') << 8
+        address += emulator_8080.state.get_register_value('e')
+        address += 3
+        line = ">"
+        while get_membyte(address) != ord("$"):
+            line += chr(get_membyte(address))
+            address += 1
+        print(line)
+        print(emulator_8080.state.summarize())
+        input("enter to continue")
+    elif (0 == emulator_8080.state.get_register_value('pc')):
+        # If we jump to address 0, the test has ended
+        print("> Exit called")
+        exit()
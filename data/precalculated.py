@@ -796,3 +796,342 @@ packed_monochrome_to_palette = {
     0xff : [  1,  1,  1,  1,  1,  1,  1,  1],
 }
 
+
+'''Zero, sign and parity flags for each 8-bit result, indexed by the
+    result and stored as (z, s, p). Parity is the 8080 definition,
+    True for an even number of set bits'''
+zsp_flags = [
+    (True,  False, True ), # 0x00
+    (False, False, False), # 0x01
+    (False, False, False), # 0x02
+    (False, False, True ), # 0x03
+    (False, False, False), # 0x04
+    (False, False, True ), # 0x05
+    (False, False, True ), # 0x06
+    (False, False, False), # 0x07
+    (False, False, False), # 0x08
+    (False, False, True ), # 0x09
+    (False, False, True ), # 0x0a
+    (False, False, False), # 0x0b
+    (False, False, True ), # 0x0c
+    (False, False, False), # 0x0d
+    (False, False, False), # 0x0e
+    (False, False, True ), # 0x0f
+    (False, False, False), # 0x10
+    (False, False, True ), # 0x11
+    (False, False, True ), # 0x12
+    (False, False, False), # 0x13
+    (False, False, True ), # 0x14
+    (False, False, False), # 0x15
+    (False, False, False), # 0x16
+    (False, False, True ), # 0x17
+    (False, False, True ), # 0x18
+    (False, False, False), # 0x19
+    (False, False, False), # 0x1a
+    (False, False, True ), # 0x1b
+    (False, False, False), # 0x1c
+    (False, False, True ), # 0x1d
+    (False, False, True ), # 0x1e
+    (False, False, False), # 0x1f
+    (False, False, False), # 0x20
+    (False, False, True ), # 0x21
+    (False, False, True ), # 0x22
+    (False, False, False), # 0x23
+    (False, False, True ), # 0x24
+    (False, False, False), # 0x25
+    (False, False, False), # 0x26
+    (False, False, True ), # 0x27
+    (False, False, True ), # 0x28
+    (False, False, False), # 0x29
+    (False, False, False), # 0x2a
+    (False, False, True ), # 0x2b
+    (False, False, False), # 0x2c
+    (False, False, True ), # 0x2d
+    (False, False, True ), # 0x2e
+    (False, False, False), # 0x2f
+    (False, False, True ), # 0x30
+    (False, False, False), # 0x31
+    (False, False, False), # 0x32
+    (False, False, True ), # 0x33
+    (False, False, False), # 0x34
+    (False, False, True ), # 0x35
+    (False, False, True ), # 0x36
+    (False, False, False), # 0x37
+    (False, False, False), # 0x38
+    (False, False, True ), # 0x39
+    (False, False, True ), # 0x3a
+    (False, False, False), # 0x3b
+    (False, False, True ), # 0x3c
+    (False, False, False), # 0x3d
+    (False, False, False), # 0x3e
+    (False, False, True ), # 0x3f
+    (False, False, False), # 0x40
+    (False, False, True ), # 0x41
+    (False, False, True ), # 0x42
+    (False, False, False), # 0x43
+    (False, False, True ), # 0x44
+    (False, False, False), # 0x45
+    (False, False, False), # 0x46
+    (False, False, True ), # 0x47
+    (False, False, True ), # 0x48
+    (False, False, False), # 0x49
+    (False, False, False), # 0x4a
+    (False, False, True ), # 0x4b
+    (False, False, False), # 0x4c
+    (False, False, True ), # 0x4d
+    (False, False, True ), # 0x4e
+    (False, False, False), # 0x4f
+    (False, False, True ), # 0x50
+    (False, False, False), # 0x51
+    (False, False, False), # 0x52
+    (False, False, True ), # 0x53
+    (False, False, False), # 0x54
+    (False, False, True ), # 0x55
+    (False, False, True ), # 0x56
+    (False, False, False), # 0x57
+    (False, False, False), # 0x58
+    (False, False, True ), # 0x59
+    (False, False, True ), # 0x5a
+    (False, False, False), # 0x5b
+    (False, False, True ), # 0x5c
+    (False, False, False), # 0x5d
+    (False, False, False), # 0x5e
+    (False, False, True ), # 0x5f
+    (False, False, True ), # 0x60
+    (False, False, False), # 0x61
+    (False, False, False), # 0x62
+    (False, False, True ), # 0x63
+    (False, False, False), # 0x64
+    (False, False, True ), # 0x65
+    (False, False, True ), # 0x66
+    (False, False, False), # 0x67
+    (False, False, False), # 0x68
+    (False, False, True ), # 0x69
+    (False, False, True ), # 0x6a
+    (False, False, False), # 0x6b
+    (False, False, True ), # 0x6c
+    (False, False, False), # 0x6d
+    (False, False, False), # 0x6e
+    (False, False, True ), # 0x6f
+    (False, False, False), # 0x70
+    (False, False, True ), # 0x71
+    (False, False, True ), # 0x72
+    (False, False, False), # 0x73
+    (False, False, True ), # 0x74
+    (False, False, False), # 0x75
+    (False, False, False), # 0x76
+    (False, False, True ), # 0x77
+    (False, False, True ), # 0x78
+    (False, False, False), # 0x79
+    (False, False, False), # 0x7a
+    (False, False, True ), # 0x7b
+    (False, False, False), # 0x7c
+    (False, False, True ), # 0x7d
+    (False, False, True ), # 0x7e
+    (False, False, False), # 0x7f
+    (False, True,  False), # 0x80
+    (False, True,  True ), # 0x81
+    (False, True,  True ), # 0x82
+    (False, True,  False), # 0x83
+    (False, True,  True ), # 0x84
+    (False, True,  False), # 0x85
+    (False, True,  False), # 0x86
+    (False, True,  True ), # 0x87
+    (False, True,  True ), # 0x88
+    (False, True,  False), # 0x89
+    (False, True,  False), # 0x8a
+    (False, True,  True ), # 0x8b
+    (False, True,  False), # 0x8c
+    (False, True,  True ), # 0x8d
+    (False, True,  True ), # 0x8e
+    (False, True,  False), # 0x8f
+    (False, True,  True ), # 0x90
+    (False, True,  False), # 0x91
+    (False, True,  False), # 0x92
+    (False, True,  True ), # 0x93
+    (False, True,  False), # 0x94
+    (False, True,  True ), # 0x95
+    (False, True,  True ), # 0x96
+    (False, True,  False), # 0x97
+    (False, True,  False), # 0x98
+    (False, True,  True ), # 0x99
+    (False, True,  True ), # 0x9a
+    (False, True,  False), # 0x9b
+    (False, True,  True ), # 0x9c
+    (False, True,  False), # 0x9d
+    (False, True,  False), # 0x9e
+    (False, True,  True ), # 0x9f
+    (False, True,  True ), # 0xa0
+    (False, True,  False), # 0xa1
+    (False, True,  False), # 0xa2
+    (False, True,  True ), # 0xa3
+    (False, True,  False), # 0xa4
+    (False, True,  True ), # 0xa5
+    (False, True,  True ), # 0xa6
+    (False, True,  False), # 0xa7
+    (False, True,  False), # 0xa8
+    (False, True,  True ), # 0xa9
+    (False, True,  True ), # 0xaa
+    (False, True,  False), # 0xab
+    (False, True,  True ), # 0xac
+    (False, True,  False), # 0xad
+    (False, True,  False), # 0xae
+    (False, True,  True ), # 0xaf
+    (False, True,  False), # 0xb0
+    (False, True,  True ), # 0xb1
+    (False, True,  True ), # 0xb2
+    (False, True,  False), # 0xb3
+    (False, True,  True ), # 0xb4
+    (False, True,  False), # 0xb5
+    (False, True,  False), # 0xb6
+    (False, True,  True ), # 0xb7
+    (False, True,  True ), # 0xb8
+    (False, True,  False), # 0xb9
+    (False, True,  False), # 0xba
+    (False, True,  True ), # 0xbb
+    (False, True,  False), # 0xbc
+    (False, True,  True ), # 0xbd
+    (False, True,  True ), # 0xbe
+    (False, True,  False), # 0xbf
+    (False, True,  True ), # 0xc0
+    (False, True,  False), # 0xc1
+    (False, True,  False), # 0xc2
+    (False, True,  True ), # 0xc3
+    (False, True,  False), # 0xc4
+    (False, True,  True ), # 0xc5
+    (False, True,  True ), # 0xc6
+    (False, True,  False), # 0xc7
+    (False, True,  False), # 0xc8
+    (False, True,  True ), # 0xc9
+    (False, True,  True ), # 0xca
+    (False, True,  False), # 0xcb
+    (False, True,  True ), # 0xcc
+    (False, True,  False), # 0xcd
+    (False, True,  False), # 0xce
+    (False, True,  True ), # 0xcf
+    (False, True,  False), # 0xd0
+    (False, True,  True ), # 0xd1
+    (False, True,  True ), # 0xd2
+    (False, True,  False), # 0xd3
+    (False, True,  True ), # 0xd4
+    (False, True,  False), # 0xd5
+    (False, True,  False), # 0xd6
+    (False, True,  True ), # 0xd7
+    (False, True,  True ), # 0xd8
+    (False, True,  False), # 0xd9
+    (False, True,  False), # 0xda
+    (False, True,  True ), # 0xdb
+    (False, True,  False), # 0xdc
+    (False, True,  True ), # 0xdd
+    (False, True,  True ), # 0xde
+    (False, True,  False), # 0xdf
+    (False, True,  False), # 0xe0
+    (False, True,  True ), # 0xe1
+    (False, True,  True ), # 0xe2
+    (False, True,  False), # 0xe3
+    (False, True,  True ), # 0xe4
+    (False, True,  False), # 0xe5
+    (False, True,  False), # 0xe6
+    (False, True,  True ), # 0xe7
+    (False, True,  True ), # 0xe8
+    (False, True,  False), # 0xe9
+    (False, True,  False), # 0xea
+    (False, True,  True ), # 0xeb
+    (False, True,  False), # 0xec
+    (False, True,  True ), # 0xed
+    (False, True,  True ), # 0xee
+    (False, True,  False), # 0xef
+    (False, True,  True ), # 0xf0
+    (False, True,  False), # 0xf1
+    (False, True,  False), # 0xf2
+    (False, True,  True ), # 0xf3
+    (False, True,  False), # 0xf4
+    (False, True,  True ), # 0xf5
+    (False, True,  True ), # 0xf6
+    (False, True,  False), # 0xf7
+    (False, True,  False), # 0xf8
+    (False, True,  True ), # 0xf9
+    (False, True,  True ), # 0xfa
+    (False, True,  False), # 0xfb
+    (False, True,  True ), # 0xfc
+    (False, True,  False), # 0xfd
+    (False, True,  False), # 0xfe
+    (False, True,  True ), # 0xff
+]
+
+
+'''Auxiliary carry after INR, indexed by the 8-bit result. Set when
+    the increment carried out of bit 3, i.e. the low nibble wrapped'''
+inr_aux_carry = [
+    True,  False, False, False, False, False, False, False, # 0x00
+    False, False, False, False, False, False, False, False, # 0x08
+    True,  False, False, False, False, False, False, False, # 0x10
+    False, False, False, False, False, False, False, False, # 0x18
+    True,  False, False, False, False, False, False, False, # 0x20
+    False, False, False, False, False, False, False, False, # 0x28
+    True,  False, False, False, False, False, False, False, # 0x30
+    False, False, False, False, False, False, False, False, # 0x38
+    True,  False, False, False, False, False, False, False, # 0x40
+    False, False, False, False, False, False, False, False, # 0x48
+    True,  False, False, False, False, False, False, False, # 0x50
+    False, False, False, False, False, False, False, False, # 0x58
+    True,  False, False, False, False, False, False, False, # 0x60
+    False, False, False, False, False, False, False, False, # 0x68
+    True,  False, False, False, False, False, False, False, # 0x70
+    False, False, False, False, False, False, False, False, # 0x78
+    True,  False, False, False, False, False, False, False, # 0x80
+    False, False, False, False, False, False, False, False, # 0x88
+    True,  False, False, False, False, False, False, False, # 0x90
+    False, False, False, False, False, False, False, False, # 0x98
+    True,  False, False, False, False, False, False, False, # 0xa0
+    False, False, False, False, False, False, False, False, # 0xa8
+    True,  False, False, False, False, False, False, False, # 0xb0
+    False, False, False, False, False, False, False, False, # 0xb8
+    True,  False, False, False, False, False, False, False, # 0xc0
+    False, False, False, False, False, False, False, False, # 0xc8
+    True,  False, False, False, False, False, False, False, # 0xd0
+    False, False, False, False, False, False, False, False, # 0xd8
+    True,  False, False, False, False, False, False, False, # 0xe0
+    False, False, False, False, False, False, False, False, # 0xe8
+    True,  False, False, False, False, False, False, False, # 0xf0
+    False, False, False, False, False, False, False, False, # 0xf8
+]
+
+
+'''Auxiliary carry after DCR, indexed by the 8-bit result. The 8080
+    decrements by adding 0xff, so AC is set unless the low nibble
+    borrowed (wrapped to 0xf)'''
+dcr_aux_carry = [
+    True,  True,  True,  True,  True,  True,  True,  True,  # 0x00
+    True,  True,  True,  True,  True,  True,  True,  False, # 0x08
+    True,  True,  True,  True,  True,  True,  True,  True,  # 0x10
+    True,  True,  True,  True,  True,  True,  True,  False, # 0x18
+    True,  True,  True,  True,  True,  True,  True,  True,  # 0x20
+    True,  True,  True,  True,  True,  True,  True,  False, # 0x28
+    True,  True,  True,  True,  True,  True,  True,  True,  # 0x30
+    True,  True,  True,  True,  True,  True,  True,  False, # 0x38
+    True,  True,  True,  True,  True,  True,  True,  True,  # 0x40
+    True,  True,  True,  True,  True,  True,  True,  False, # 0x48
+    True,  True,  True,  True,  True,  True,  True,  True,  # 0x50
+    True,  True,  True,  True,  True,  True,  True,  False, # 0x58
+    True,  True,  True,  True,  True,  True,  True,  True,  # 0x60
+    True,  True,  True,  True,  True,  True,  True,  False, # 0x68
+    True,  True,  True,  True,  True,  True,  True,  True,  # 0x70
+    True,  True,  True,  True,  True,  True,  True,  False, # 0x78
+    True,  True,  True,  True,  True,  True,  True,  True,  # 0x80
+    True,  True,  True,  True,  True,  True,  True,  False, # 0x88
+    True,  True,  True,  True,  True,  True,  True,  True,  # 0x90
+    True,  True,  True,  True,  True,  True,  True,  False, # 0x98
+    True,  True,  True,  True,  True,  True,  True,  True,  # 0xa0
+    True,  True,  True,  True,  True,  True,  True,  False, # 0xa8
+    True,  True,  True,  True,  True,  True,  True,  True,  # 0xb0
+    True,  True,  True,  True,  True,  True,  True,  False, # 0xb8
+    True,  True,  True,  True,  True,  True,  True,  True,  # 0xc0
+    True,  True,  True,  True,  True,  True,  True,  False, # 0xc8
+    True,  True,  True,  True,  True,  True,  True,  True,  # 0xd0
+    True,  True,  True,  True,  True,  True,  True,  False, # 0xd8
+    True,  True,  True,  True,  True,  True,  True,  True,  # 0xe0
+    True,  True,  True,  True,  True,  True,  True,  False, # 0xe8
+    True,  True,  True,  True,  True,  True,  True,  True,  # 0xf0
+    True,  True,  True,  True,  True,  True,  True,  False, # 0xf8
+]
@@ -0,0 +1,177 @@
+'''
+    python8080, an 8080 emulator designed for arcade games.
+    Copyright (C) 2019  Jacob Gray
+
+    This program is free software: you can redistribute it and/or
+    modify it under the terms of the GNU General Public License as
+    published by the Free Software Foundation, either version 3 of
+    the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.
+    If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import hashlib
+import importlib.util
+import os
+import emu8080.codegen_8080 as codegen_8080
+import emu8080.jit_8080 as jit_8080
+import emu8080.opcode_spec_8080 as opcode_spec_module
+import emu8080.system_state_8080 as system_state_8080
+from emu8080.opcode_spec_8080 import opcode_spec_8080
+from emu8080.jit_8080 import scan_block, block_source
+
+''' Compiles ROM code ahead of time. Starting from the reset and RST
+    vectors, control flow is followed through the ROM and every block
+    reached is translated as jit_8080 would at runtime. The blocks are
+    written out as one Python module, cached on disk under a hash of
+    the ROM contents and of the code generating it, and imported on
+    later runs so no block has to be translated while the game runs.
+    Modules for the same ROM from older code are deleted as a new one
+    is written.
+
+    Anything not found this way, such as code reached through PCHL or
+    code in RAM, is left to the block translator and interpreter '''
+
+# The reset vector and the RST 0-7 targets
+_entry_points = [0x00, 0x08, 0x10, 0x18, 0x20, 0x28, 0x30, 0x38]
+
+def _successors(memory, exit_address, terminator):
+    '''Addresses control can go to after the instruction ending a block.
+        exit_address is that instruction's address, or the address the
+        block was cut off at if terminator is None'''
+    if terminator is None:
+        return [exit_address]
+    mnemonic, operation, operands, length, cycles, flags \
+                                        = opcode_spec_8080[terminator]
+    following = exit_address + length
+    target = memory[(exit_address + 1) & 0xffff] \
+           | (memory[(exit_address + 2) & 0xffff] << 8)
+    if operation == 'jmp':
+        return [target]
+    elif operation in ('jmp_if', 'call', 'call_if'):
+        return [target, following]
+    elif operation == 'rst':
+        # the vector itself is already an entry point
+        return [following]
+    elif operation in ('ret', 'pchl'):
+        # return addresses are reached from their calls, and PCHL
+        # targets aren't known until runtime
+        return []
+    return [following]
+
+def find_blocks(memory, rom_ranges, mapped = False):
+    '''Follows control flow from the reset and RST vectors, returning
+        {entry address : scan_block result} for every block reached
+        that lies entirely within the given (start, end) ROM ranges.
+        mapped selects the handlers reading through a memory map'''
+    in_rom = bytearray(0x10000)
+    for start, end in rom_ranges:
+        in_rom[start:end + 1] = b'\x01' * (end + 1 - start)
+    blocks = {}
+    seen = set()
+    pending = [pc for pc in _entry_points if in_rom[pc]]
+    while pending:
+        pc = pending.pop()
+        if pc in seen or pc > 0xffff or not in_rom[pc]:
+            continue
+        seen.add(pc)
+        block = scan_block(memory, pc, mapped = mapped)
+        if block is None:
+            # starts with its terminator, follow it without a block
+            opcode = memory[pc]
+            if opcode_spec_8080[opcode][1] == 'unimplemented':
+                continue
+            pending += _successors(memory, pc, opcode)
+            continue
+        lines, exit_address, inline_cycles, lead_cycles, terminator, end \
+                                                                = block
+        if not all(in_rom[pc:end]):
+            # runs on into RAM, left for runtime translation
+            continue
+        blocks[pc] = block
+        pending += _successors(memory, exit_address, terminator)
+    return blocks
+
+def generate_module(memory, rom_ranges, mapped = False):
+    '''Returns the source of a module defining a build function for
+        every block found in the ROM, and a `blocks` dict of
+        {entry address : (build_block, lead cycles, terminator, end)}
+        as taken by BlockTranslator.add_precompiled'''
+    blocks = find_blocks(memory, rom_ranges, mapped)
+    sources = ["''' Generated by emu8080/aot_8080.py, do not edit '''", ""]
+    entries = []
+    for pc in sorted(blocks):
+        lines, exit_address, inline_cycles, lead_cycles, terminator, end \
+                                                            = blocks[pc]
+        sources.append(block_source(pc, blocks[pc]))
+        entries.append("    0x%04x : (build_block_%04x, %d, %s, 0x%04x),"
+                        % (pc, pc, lead_cycles,
+                           "None" if terminator is None
+                                  else "0x%02x" % terminator,
+                           end))
+    return "\n".join(sources + ["blocks = {"] + entries + ["}"]) + "\n"
+
+# modules whose source the generated blocks depend on
+_code_modules = (codegen_8080, jit_8080, opcode_spec_module,
+                 system_state_8080)
+
+def rom_key(memory, rom_ranges, mapped = False):
+    '''Key naming the module for a ROM, as "<ROM hash>_<code hash>".
+        The first half identifies the ROM contents and handlers, the
+        second the code generating the module, so a changed ROM or
+        emulator never loads a stale one'''
+    rom_hash = hashlib.sha256(b"mapped" if mapped else b"")
+    for start, end in sorted(rom_ranges):
+        rom_hash.update(b"%04x-%04x" % (start, end))
+        rom_hash.update(memory[start:end + 1])
+    code_hash = hashlib.sha256()
+    for path in [module.__file__ for module in _code_modules] \
+                + [__file__]:
+        with open(path, 'rb') as source_file:
+            code_hash.update(source_file.read())
+    return rom_hash.hexdigest()[:16] + "_" + code_hash.hexdigest()[:16]
+
+def _remove_stale(cache_dir, name):
+    '''Deletes the modules in cache_dir generated for the same ROM as
+        name by other code, and any named by a single hash as before
+        the key was split, with their compiled bytecode'''
+    prefix = name.rsplit("_", 1)[0] + "_"
+    for file_name in os.listdir(cache_dir):
+        if not file_name.startswith("rom_") \
+                or not file_name.endswith(".py") \
+                or file_name == name + ".py":
+            continue
+        if file_name.startswith(prefix) or file_name.count("_") == 1:
+            path = os.path.join(cache_dir, file_name)
+            for stale in (path, importlib.util.cache_from_source(path)):
+                if os.path.exists(stale):
+                    os.remove(stale)
+
+def load_rom_blocks(memory, rom_ranges, cache_dir, mapped = False):
+    '''Returns the precompiled blocks for the ROM, importing them from
+        cache_dir if a module for this ROM is there and generating and
+        saving it first if not. mapped selects the handlers, see
+        find_blocks'''
+    name = "rom_" + rom_key(memory, rom_ranges, mapped)
+    path = os.path.join(cache_dir, name + ".py")
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok = True)
+        source = generate_module(memory, rom_ranges, mapped)
+        # write then rename, so an interrupted run never leaves half
+        # a module behind to be imported next time
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w') as output_file:
+            output_file.write(source)
+        os.replace(temp_path, path)
+        _remove_stale(cache_dir, name)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.blocks
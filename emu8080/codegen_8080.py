@@ -0,0 +1,771 @@
+'''
+    python8080, an 8080 emulator designed for arcade games.
+    Copyright (C) 2019  Jacob Gray
+
+    This program is free software: you can redistribute it and/or
+    modify it under the terms of the GNU General Public License as
+    published by the Free Software Foundation, either version 3 of
+    the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.
+    If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import linecache
+import re
+from emu8080.opcode_spec_8080 import opcode_spec_8080
+# 8-bit register : (pair holding it, True for the high byte)
+from emu8080.system_state_8080 import _pair_halves
+from data.precalculated import zsp_flags
+from data.precalculated import inr_aux_carry
+from data.precalculated import dcr_aux_carry
+
+''' Generates the instruction handlers used by Emulator8080 from the
+    table in opcode_spec_8080. Each opcode gets its own Python function
+    with its registers written into the code, e.g. MOV B,C becomes
+    `state.b = state.c`, rather than a functools.partial that looks the
+    register names up every time it runs.
+
+    The generated handlers follow the same rules as the old hand-written
+    ones: they are called with no arguments and return the amount to
+    increase PC by afterwards (0 if they set PC themselves) '''
+
+# Conditional CALL/RET take 6 more cycles than listed when the branch
+# is taken, the cycle table holds the not-taken count
+CONDITIONAL_TAKEN_CYCLES = 6
+
+# condition : (flag tested, flag value that takes the branch)
+_conditions = {
+    'nz' : ('z',  False),
+    'z'  : ('z',  True),
+    'nc' : ('cy', False),
+    'c'  : ('cy', True),
+    'po' : ('p',  False),
+    'pe' : ('p',  True),
+    'p'  : ('s',  False),
+    'm'  : ('s',  True)
+}
+
+_word_immediate = "(mem[state.pc + 1] | (mem[state.pc + 2] << 8))"
+
+'''
+***********************************************************************
+                          Addressing modes
+***********************************************************************
+'''
+
+''' Every template reads and writes registers and memory through these,
+    so the way the state is laid out only matters in one place. BC, DE
+    and HL are held as 16-bit pairs (see SystemState), so the 8-bit
+    registers are masked or shifted out of them and HL is used as an
+    address as it is '''
+
+def _read(register):
+    '''Expression for an 8-bit operand: a register, 'm' for the byte
+        at HL or 'd8' for the immediate byte'''
+    if register == 'm':
+        return "mem[address]"
+    elif register == 'd8':
+        return "mem[state.pc + 1]"
+    elif register == 'a':
+        return "state.a"
+    pair, high = _pair_halves[register]
+    if high:
+        return "(state.%s >> 8)" % pair
+    return "(state.%s & 0xff)" % pair
+
+def _write(register, expression):
+    '''Statement storing an already 8-bit expression in a register or,
+        for 'm', the byte at HL'''
+    if register == 'm':
+        return "mem[address] = " + expression
+    elif register == 'a':
+        return "state.a = " + expression
+    pair, high = _pair_halves[register]
+    if high:
+        return "state.%s = (%s << 8) | (state.%s & 0xff)" \
+                                            % (pair, expression, pair)
+    return "state.%s = (state.%s & 0xff00) | %s" % (pair, pair, expression)
+
+def _setup(*registers):
+    '''Lines that must come before _read/_write of these operands'''
+    if 'm' in registers:
+        return ["address = state.hl"]
+    return []
+
+def _read_pair(pair):
+    '''Expression for the 16-bit value of a register pair or SP'''
+    return "state." + pair
+
+def _write_pair(pair, name):
+    '''Lines storing the 16-bit value held in local variable `name`'''
+    return ["state.%s = %s" % (pair, name)]
+
+def _push(high, low):
+    '''Lines pushing two bytes onto the stack, high byte first'''
+    return ["sp = (state.sp - 2) & 0xffff",
+            "mem[(sp + 1) & 0xffff] = " + high,
+            "mem[sp] = " + low,
+            "state.sp = sp"]
+
+def _pop(high_target, low_target):
+    '''Lines popping two bytes from the stack into the given targets'''
+    return ["sp = state.sp",
+            low_target + " = mem[sp]",
+            high_target + " = mem[(sp + 1) & 0xffff]",
+            "state.sp = (sp + 2) & 0xffff"]
+
+def _condition(name):
+    '''Expression that is True when the named condition holds'''
+    flag, taken_on = _conditions[name]
+    if taken_on:
+        return "state." + flag
+    return "not state." + flag
+
+def _indent(lines):
+    '''Indents source lines by one level'''
+    return ["    " + line for line in lines]
+
+'''
+***********************************************************************
+                            Flag updates
+***********************************************************************
+'''
+
+def _flags_add(value, operand, result):
+    '''Flags for result = value + operand (+ carry), result unmasked.
+        AC is the carry into bit 4'''
+    return ["state.z, state.s, state.p = zsp_flags[%s & 0xff]" % result,
+            "state.cy = %s > 0xff" % result,
+            "state.ac = ((%s ^ %s ^ %s) & 0x10) != 0" \
+                                            % (value, operand, result)]
+
+def _flags_sub(value, operand, result):
+    '''Flags for result = value + ~subtrahend + (1 - borrow), which is
+        how the 8080 subtracts. CY is a borrow, set when that addition
+        does not carry out'''
+    return ["state.z, state.s, state.p = zsp_flags[%s & 0xff]" % result,
+            "state.cy = %s <= 0xff" % result,
+            "state.ac = ((%s ^ %s ^ %s) & 0x10) != 0" \
+                                            % (value, operand, result)]
+
+def _flags_logic(result, aux_carry):
+    '''Flags for AND/OR/XOR, which always clear CY'''
+    return ["state.z, state.s, state.p = zsp_flags[%s]" % result,
+            "state.cy = False",
+            "state.ac = " + aux_carry]
+
+'''
+***********************************************************************
+                        Instruction templates
+***********************************************************************
+'''
+
+''' Each template takes the operands and length from the spec and
+    returns the body of the handler as a list of source lines '''
+
+def _nop(operands, length):
+    return ["return 1"]
+
+def _mov(operands, length):
+    target, source = operands
+    if target == source:
+        return ["return 1"]
+    return _setup(target, source) \
+         + [_write(target, _read(source)),
+            "return 1"]
+
+def _mvi(operands, length):
+    target, = operands
+    return _setup(target) \
+         + [_write(target, _read('d8')),
+            "return 2"]
+
+def _lxi(operands, length):
+    pair, = operands
+    return ["state.%s = %s" % (pair, _word_immediate),
+            "return 3"]
+
+def _stax(operands, length):
+    pair, = operands
+    return ["mem[%s] = state.a" % _read_pair(pair),
+            "return 1"]
+
+def _ldax(operands, length):
+    pair, = operands
+    return ["state.a = mem[%s]" % _read_pair(pair),
+            "return 1"]
+
+def _inx(operands, length):
+    pair, = operands
+    return ["value = (%s + 1) & 0xffff" % _read_pair(pair)] \
+         + _write_pair(pair, "value") \
+         + ["return 1"]
+
+def _dcx(operands, length):
+    pair, = operands
+    return ["value = (%s - 1) & 0xffff" % _read_pair(pair)] \
+         + _write_pair(pair, "value") \
+         + ["return 1"]
+
+def _inr(operands, length):
+    target, = operands
+    return _setup(target) \
+         + ["result = (%s + 1) & 0xff" % _read(target),
+            _write(target, "result"),
+            "state.z, state.s, state.p = zsp_flags[result]",
+            "state.ac = inr_aux_carry[result]",
+            "return 1"]
+
+def _dcr(operands, length):
+    target, = operands
+    return _setup(target) \
+         + ["result = (%s - 1) & 0xff" % _read(target),
+            _write(target, "result"),
+            "state.z, state.s, state.p = zsp_flags[result]",
+            "state.ac = dcr_aux_carry[result]",
+            "return 1"]
+
+def _rlc(operands, length):
+    return ["value = state.a",
+            "state.cy = value > 0x7f",
+            "state.a = ((value << 1) | (value >> 7)) & 0xff",
+            "return 1"]
+
+def _rrc(operands, length):
+    return ["value = state.a",
+            "state.cy = (value & 1) != 0",
+            "state.a = (value >> 1) | ((value & 1) << 7)",
+            "return 1"]
+
+def _ral(operands, length):
+    return ["value = state.a",
+            "state.a = ((value << 1) | state.cy) & 0xff",
+            "state.cy = value > 0x7f",
+            "return 1"]
+
+def _rar(operands, length):
+    return ["value = state.a",
+            "state.a = (value >> 1) | (state.cy << 7)",
+            "state.cy = (value & 1) != 0",
+            "return 1"]
+
+def _dad(operands, length):
+    pair, = operands
+    return ["result = %s + %s" % (_read_pair('hl'), _read_pair(pair)),
+            "state.cy = result > 0xffff",
+            "result &= 0xffff"] \
+         + _write_pair('hl', "result") \
+         + ["return 1"]
+
+def _shld(operands, length):
+    return ["address = " + _word_immediate,
+            "value = state.hl",
+            "mem[address] = value & 0xff",
+            "mem[(address + 1) & 0xffff] = value >> 8",
+            "return 3"]
+
+def _lhld(operands, length):
+    return ["address = " + _word_immediate,
+            "state.hl = mem[address] | (mem[(address + 1) & 0xffff] << 8)",
+            "return 3"]
+
+def _sta(operands, length):
+    return ["mem[%s] = state.a" % _word_immediate,
+            "return 3"]
+
+def _lda(operands, length):
+    return ["state.a = mem[%s]" % _word_immediate,
+            "return 3"]
+
+def _daa(operands, length):
+    # Corrects A after adding two binary-coded decimal values
+    return ["value = state.a",
+            "carry = state.cy",
+            "correction = 0",
+            "if (value & 0x0f) > 0x09 or state.ac:",
+            "    correction = 0x06",
+            "if (value >> 4) > 0x09 or carry \\",
+            "        or ((value >> 4) >= 0x09 and (value & 0x0f) > 0x09):",
+            "    correction += 0x60",
+            "    carry = True",
+            "result = value + correction",
+            "state.a = result & 0xff"] \
+         + _flags_add("value", "correction", "result") \
+         + ["state.cy = carry",
+            "return 1"]
+
+def _cma(operands, length):
+    return ["state.a ^= 0xff",
+            "return 1"]
+
+def _stc(operands, length):
+    return ["state.cy = True",
+            "return 1"]
+
+def _cmc(operands, length):
+    return ["state.cy = not state.cy",
+            "return 1"]
+
+def _add(operands, length, carry = False):
+    source, = operands
+    result = "result = value + operand"
+    if carry:
+        result += " + state.cy"
+    return _setup(source) \
+         + ["value = state.a",
+            "operand = " + _read(source),
+            result,
+            "state.a = result & 0xff"] \
+         + _flags_add("value", "operand", "result") \
+         + ["return %d" % length]
+
+def _adc(operands, length):
+    return _add(operands, length, carry = True)
+
+def _sub(operands, length, borrow = False, store = True):
+    source, = operands
+    result = "result = value + operand + 1"
+    if borrow:
+        result += " - state.cy"
+    lines = _setup(source) \
+          + ["value = state.a",
+             "operand = %s ^ 0xff" % _read(source),
+             result]
+    if store:
+        lines.append("state.a = result & 0xff")
+    return lines \
+         + _flags_sub("value", "operand", "result") \
+         + ["return %d" % length]
+
+def _sbb(operands, length):
+    return _sub(operands, length, borrow = True)
+
+def _cmp(operands, length):
+    return _sub(operands, length, store = False)
+
+def _ana(operands, length):
+    source, = operands
+    # The 8080 sets AC from bit 3 of the inputs for AND
+    return _setup(source) \
+         + ["value = state.a",
+            "operand = " + _read(source),
+            "result = value & operand",
+            "state.a = result"] \
+         + _flags_logic("result", "((value | operand) & 0x08) != 0") \
+         + ["return %d" % length]
+
+def _xra(operands, length):
+    source, = operands
+    return _setup(source) \
+         + ["result = state.a ^ " + _read(source),
+            "state.a = result"] \
+         + _flags_logic("result", "False") \
+         + ["return %d" % length]
+
+def _ora(operands, length):
+    source, = operands
+    return _setup(source) \
+         + ["result = state.a | " + _read(source),
+            "state.a = result"] \
+         + _flags_logic("result", "False") \
+         + ["return %d" % length]
+
+def _jmp(operands, length):
+    return ["state.pc = " + _word_immediate,
+            "return 0"]
+
+def _jmp_if(operands, length):
+    condition, = operands
+    return ["if %s:" % _condition(condition)] \
+         + _indent(_jmp((), length)) \
+         + ["return 3"]
+
+def _call(operands, length):
+    return ["target = " + _word_immediate,
+            "return_address = (state.pc + 3) & 0xffff"] \
+         + _push("return_address >> 8", "return_address & 0xff") \
+         + ["state.pc = target",
+            "return 0"]
+
+def _call_if(operands, length):
+    condition, = operands
+    taken = _call((), length)[:-1]
+    return ["if %s:" % _condition(condition)] \
+         + _indent(taken + ["state._cycles += %d"
+                                % CONDITIONAL_TAKEN_CYCLES,
+                            "return 0"]) \
+         + ["return 3"]
+
+def _ret(operands, length):
+    return ["sp = state.sp",
+            "state.pc = mem[sp] | (mem[(sp + 1) & 0xffff] << 8)",
+            "state.sp = (sp + 2) & 0xffff",
+            "return 0"]
+
+def _ret_if(operands, length):
+    condition, = operands
+    taken = _ret((), length)[:-1]
+    return ["if %s:" % _condition(condition)] \
+         + _indent(taken + ["state._cycles += %d"
+                                % CONDITIONAL_TAKEN_CYCLES,
+                            "return 0"]) \
+         + ["return 1"]
+
+def _rst(operands, length):
+    target, = operands
+    return ["return_address = (state.pc + 1) & 0xffff"] \
+         + _push("return_address >> 8", "return_address & 0xff") \
+         + ["state.pc = 0x%02x" % target,
+            "return 0"]
+
+def _push_pair(operands, length):
+    pair, = operands
+    if pair == 'psw':
+        # Spec declares format thusly: s z 0 ac 0 p 1 cy
+        return ["flags = 0x02 | state.cy | (state.p << 2) "
+                    "| (state.ac << 4) | (state.z << 6) | (state.s << 7)"] \
+             + _push("state.a", "flags") \
+             + ["return 1"]
+    return ["value = state." + pair] \
+         + _push("value >> 8", "value & 0xff") \
+         + ["return 1"]
+
+def _pop_pair(operands, length):
+    pair, = operands
+    if pair == 'psw':
+        return _pop("state.a", "flags") \
+             + ["state.cy = (flags & 0x01) != 0",
+                "state.p = (flags & 0x04) != 0",
+                "state.ac = (flags & 0x10) != 0",
+                "state.z = (flags & 0x40) != 0",
+                "state.s = (flags & 0x80) != 0",
+                "return 1"]
+    return ["sp = state.sp",
+            "state.%s = mem[sp] | (mem[(sp + 1) & 0xffff] << 8)" % pair,
+            "state.sp = (sp + 2) & 0xffff",
+            "return 1"]
+
+def _xthl(operands, length):
+    return ["sp = state.sp",
+            "value = state.hl",
+            "state.hl = mem[sp] | (mem[(sp + 1) & 0xffff] << 8)",
+            "mem[sp] = value & 0xff",
+            "mem[(sp + 1) & 0xffff] = value >> 8",
+            "return 1"]
+
+def _pchl(operands, length):
+    return ["state.pc = " + _read_pair('hl'),
+            "return 0"]
+
+def _sphl(operands, length):
+    return ["state.sp = " + _read_pair('hl'),
+            "return 1"]
+
+def _xchg(operands, length):
+    return ["state.hl, state.de = state.de, state.hl",
+            "return 1"]
+
+def _hlt(operands, length):
+    # PC moves past the HLT, so an interrupt returns to what follows
+    return ["state.halted = True",
+            "return 1"]
+
+def _di(operands, length):
+    return ["state.interrupt_enabled = False",
+            "return 1"]
+
+def _ei(operands, length):
+    return ["state.interrupt_enabled = True",
+            "return 1"]
+
+def _out(operands, length):
+    ''' The port's write function, registered by the machine with
+        Emulator8080.set_port_handlers, is called with A '''
+    return ["port_writes[mem[state.pc + 1]](state.a)",
+            "return 2"]
+
+def _in(operands, length):
+    ''' A is loaded from the port's read function, registered by the
+        machine with Emulator8080.set_port_handlers '''
+    return ["state.a = port_reads[mem[state.pc + 1]]()",
+            "return 2"]
+
+_templates = {
+    'nop'     : _nop,
+    'mov'     : _mov,
+    'mvi'     : _mvi,
+    'lxi'     : _lxi,
+    'stax'    : _stax,
+    'ldax'    : _ldax,
+    'inx'     : _inx,
+    'dcx'     : _dcx,
+    'inr'     : _inr,
+    'dcr'     : _dcr,
+    'rlc'     : _rlc,
+    'rrc'     : _rrc,
+    'ral'     : _ral,
+    'rar'     : _rar,
+    'dad'     : _dad,
+    'shld'    : _shld,
+    'lhld'    : _lhld,
+    'sta'     : _sta,
+    'lda'     : _lda,
+    'daa'     : _daa,
+    'cma'     : _cma,
+    'stc'     : _stc,
+    'cmc'     : _cmc,
+    'add'     : _add,
+    'adc'     : _adc,
+    'sub'     : _sub,
+    'sbb'     : _sbb,
+    'ana'     : _ana,
+    'xra'     : _xra,
+    'ora'     : _ora,
+    'cmp'     : _cmp,
+    'jmp'     : _jmp,
+    'jmp_if'  : _jmp_if,
+    'call'    : _call,
+    'call_if' : _call_if,
+    'ret'     : _ret,
+    'ret_if'  : _ret_if,
+    'rst'     : _rst,
+    'push'    : _push_pair,
+    'pop'     : _pop_pair,
+    'xthl'    : _xthl,
+    'pchl'    : _pchl,
+    'sphl'    : _sphl,
+    'xchg'    : _xchg,
+    'hlt'     : _hlt,
+    'di'      : _di,
+    'ei'      : _ei,
+    'out'     : _out,
+    'in'      : _in
+}
+
+'''
+***********************************************************************
+                           Code generation
+***********************************************************************
+'''
+
+_stack_word = "(mem[state.sp] | (mem[(state.sp + 1) & 0xffff] << 8))"
+
+def _trace(mnemonic, operation, operands, length):
+    '''dlog call recording the instruction, its immediate data and the
+        values it is about to read: the byte at HL for M operands, the
+        word on top of the stack for POP, RET and XTHL, what PUSH saves
+        (A for PSW) and the data LDA, LHLD and LDAX load'''
+    values = []
+    if length == 2:
+        values.append("mem[state.pc + 1]")
+    elif length == 3:
+        values.append(_word_immediate)
+    if 'm' in operands:
+        values.append("mem[state.hl]")
+    if operation in ('pop', 'ret', 'ret_if', 'xthl'):
+        values.append(_stack_word)
+    elif operation == 'push':
+        values.append("state.a" if operands == ('psw',)
+                      else _read_pair(operands[0]))
+    elif operation == 'lda':
+        values.append("mem[%s]" % _word_immediate)
+    elif operation == 'lhld':
+        values.append("(mem[%s] | (mem[(%s + 1) & 0xffff] << 8))"
+                                    % (_word_immediate, _word_immediate))
+    elif operation == 'ldax':
+        values.append("mem[%s]" % _read_pair(operands[0]))
+    return 'dlog(%s)' % ", ".join(['"%s\\t"' % mnemonic] + values)
+
+def _watch_writes(lines):
+    '''Adds a check after every memory write in a template's lines,
+        reporting writes to addresses marked with watch_memory'''
+    watched_lines = []
+    for line in lines:
+        write = _memory_write.match(line)
+        if write is None:
+            watched_lines.append(line)
+            continue
+        indent, address, value = write.groups()
+        watched_lines += [indent + "written = " + address,
+                          indent + "mem[written] = " + value,
+                          indent + "if watch[written]:",
+                          indent + "    watched_write(written)"]
+    return watched_lines
+
+_memory_write = re.compile(r"^(\s*)mem\[(.+)\] = (.+)$")
+
+_flag_target = re.compile(r"\bstate\.(z|s|p|cy|ac)\b")
+
+def _check_flags(mnemonic, body, flags):
+    '''Raises ValueError unless a body sets exactly the flags its
+        opcode_spec_8080 entry lists'''
+    written = set()
+    for line in body:
+        if " = " in line:
+            written.update(_flag_target.findall(line.split(" = ")[0]))
+    if written != set(flags.split()):
+        raise ValueError("%s sets flags '%s', opcode_spec_8080 lists '%s'"
+                         % (mnemonic, " ".join(sorted(written)), flags))
+
+# the instruction's own bytes, always read from memory directly
+_instruction_bytes = ("state.pc + 1", "state.pc + 2")
+
+def _map_expression(source):
+    '''Turns every memory read in an expression into a read_memory
+        call, leaving reads of the instruction's own bytes alone'''
+    mapped = []
+    position = 0
+    while True:
+        start = source.find("mem[", position)
+        if start < 0:
+            return "".join(mapped) + source[position:]
+        end = start + len("mem[")
+        depth = 1
+        while depth:
+            depth += {"[" : 1, "]" : -1}.get(source[end], 0)
+            end += 1
+        address = source[start + len("mem["):end - 1]
+        if address in _instruction_bytes:
+            read = "mem[%s]" % address
+        else:
+            read = "read_memory(%s)" % _map_expression(address)
+        mapped.append(source[position:start] + read)
+        position = end
+
+def _map_reads(lines):
+    '''Sends every data read in a template's lines through the
+        memory map's read function, see memory_map_8080'''
+    mapped_lines = []
+    for line in lines:
+        write = _memory_write.match(line)
+        if write is None:
+            mapped_lines.append(_map_expression(line))
+            continue
+        indent, address, value = write.groups()
+        mapped_lines.append(indent + "mem[%s] = %s"
+                                % (address, _map_expression(value)))
+    return mapped_lines
+
+def instruction_body(opcode, watched = False, mapped = False):
+    '''Returns the body of an opcode's handler as a list of source
+        lines, or None if the opcode is not implemented. Watched bodies
+        report writes to watched memory to state.watched_write. Mapped
+        bodies read data through state._read_memory'''
+    mnemonic, operation, operands, length, cycles, flags \
+                                            = opcode_spec_8080[opcode]
+    if operation == 'unimplemented':
+        return None
+    body = _templates[operation](operands, length)
+    _check_flags(mnemonic, body, flags)
+    if mapped:
+        body = _map_reads(body)
+    if watched:
+        body = _watch_writes(body)
+    return body
+
+def _decode_operands(body, length):
+    '''Replaces the immediate data reads in a body with the `data`
+        argument of a decoded handler, see generate_handler'''
+    source = "\n".join(body)
+    if length == 2:
+        source = source.replace("mem[state.pc + 1]", "data")
+    elif length == 3:
+        source = source.replace(_word_immediate, "data")
+        source = source.replace("mem[state.pc + 1]", "(data & 0xff)")
+        source = source.replace("mem[state.pc + 2]", "(data >> 8)")
+    return source.split("\n")
+
+def generate_handler(opcode, traced = False, watched = False,
+                     decoded = False, mapped = False):
+    '''Returns the source of the handler function for one opcode, or
+        None if the opcode is not implemented. Traced handlers pass the
+        instruction to dlog before running it, untraced ones contain no
+        logging code at all. Decoded handlers for instructions with
+        immediate data take it as their argument, a byte or a word,
+        instead of reading it from memory. Mapped handlers read through
+        the memory map, see instruction_body'''
+    mnemonic, operation, operands, length, cycles, flags \
+                                            = opcode_spec_8080[opcode]
+    body = instruction_body(opcode, watched, mapped)
+    if body is None:
+        return None
+    if traced:
+        trace = [_trace(mnemonic, operation, operands, length)]
+        if mapped:
+            trace = _map_reads(trace)
+        body = trace + body
+    signature = "def op_%02x():" % opcode
+    if decoded and length > 1:
+        body = _decode_operands(body, length)
+        signature = "def op_%02x(data):" % opcode
+    lines = [signature,
+             "    # 0x%02x %s" % (opcode, mnemonic)] \
+          + _indent(body)
+    return "\n".join(lines) + "\n"
+
+def generate_source(traced = False, watched = False, decoded = False,
+                    mapped = False):
+    '''Returns the source of a module defining build_handlers(), which
+        creates every handler bound to one state and returns them as a
+        dict keyed by opcode'''
+    handlers = []
+    entries = []
+    for opcode in range(0x100):
+        handler = generate_handler(opcode, traced, watched, decoded,
+                                   mapped)
+        if handler is None:
+            # unimplemented opcodes are kept as strings, as before
+            entries.append("0x%02x : %r," \
+                                % (opcode, opcode_spec_8080[opcode][0]))
+        else:
+            handlers.append(handler)
+            entries.append("0x%02x : op_%02x," % (opcode, opcode))
+    lines = ["def build_handlers(state, dlog, port_reads, port_writes,",
+             "                   zsp_flags, inr_aux_carry, dcr_aux_carry):",
+             "    mem = state._memory",
+             "    watch = state._write_watch",
+             "    watched_write = state.watched_write",
+             "    read_memory = state._read_memory",
+             ""]
+    for handler in handlers:
+        lines += _indent(handler.split("\n"))
+    lines += ["    return {"] + _indent(_indent(entries)) + ["    }"]
+    return "\n".join(line.rstrip() for line in lines) + "\n"
+
+_build_handlers = {}
+
+def build_instruction_dict(state, dlog, port_reads, port_writes,
+                           traced = False, watched = False,
+                           decoded = False, mapped = False):
+    '''Returns a dict of generated handlers bound to the given state,
+        usable in place of the old instruction_dict_8080 (except for
+        the decoded variant, see generate_handler). IN and OUT call
+        the functions in the 256-entry port_reads/port_writes lists,
+        looked up as they run. Mapped handlers need state._read_memory
+        set, see MemoryMap.attach. The source of each variant is only
+        generated and compiled once per process'''
+    variant = (traced, watched, decoded, mapped)
+    build_handlers = _build_handlers.get(variant)
+    if build_handlers is None:
+        source = generate_source(traced, watched, decoded, mapped)
+        filename = "<generated 8080 handlers%s%s%s%s>" \
+                        % (", traced" if traced else "",
+                           ", watched" if watched else "",
+                           ", decoded" if decoded else "",
+                           ", mapped reads" if mapped else "")
+        # register the source so tracebacks can show generated lines
+        linecache.cache[filename] = (len(source), None,
+                                     source.splitlines(True), filename)
+        namespace = {}
+        exec(compile(source, filename, 'exec'), namespace)
+        build_handlers = namespace['build_handlers']
+        _build_handlers[variant] = build_handlers
+    return build_handlers(state, dlog, port_reads, port_writes,
+                          zsp_flags, inr_aux_carry, dcr_aux_carry)
@@ -17,13 +17,30 @@
     If not, see <https://www.gnu.org/licenses/>.
 '''
 
+
 from functools import partial
 from emu8080.system_state_8080 import SystemState
+from emu8080.opcode_spec_8080 import opcode_spec_8080
+from emu8080.codegen_8080 import build_instruction_dict
+from emu8080.jit_8080 import BlockTranslator
+from emu8080.aot_8080 import load_rom_blocks
 from sys import exit
 
 _debug_mode = 'none' # options are 'print' or 'write'
 _debug_file = "./debug_file"
-state = SystemState()
+HLT_OPCODE = 0x76
+# Cycles that pass per emulate_operation call while halted
+HALTED_STEP_CYCLES = 4
+# Longest loop, in bytes, that spin detection will look at
+SPIN_LOOP_MAX_BYTES = 32
+# Operations that only read memory and write registers or flags
+_spin_safe_operations = {
+    'nop', 'lxi', 'ldax', 'inx', 'dcx', 'inr', 'dcr', 'mvi', 'rlc', 'rrc',
+    'ral', 'rar', 'dad', 'lhld', 'lda', 'daa', 'cma', 'stc', 'cmc', 'mov',
+    'add', 'adc', 'sub', 'sbb', 'ana', 'xra', 'ora', 'cmp', 'xchg', 'sphl'
+}
+# Of those, the ones that write memory when their target is M
+_register_target_operations = {'inr', 'dcr', 'mvi', 'mov'}
 
 def unimplemented_instruction(opcode):
     '''Prints failed instruction info'''
@@ -33,28 +50,6 @@ def unimplemented_instruction(opcode):
     #print(state.summarize())
     exit()
 
-def emulate_operation():
-    '''Parse current instruction and call the relevant code, 
-        increasing the PC as appropriate for that instruction'''
-    opcode = state.get_current_opcode()
-    # opcodes in dict that are yet to be defined exist as strings,
-    # which will crash the program (string cannot be executed error)
-    '''Pulling the instruction from dict as an index rather than
-        with dict.get() will crash if an invalid value is submitted
-        but benchmarking suggests performance increases up to 40%'''
-    operation = instruction_dict_8080[opcode]
-    #print("{:04x}\t".format(state.get_register_value('pc')) \
-    #    + "{:02x}\t".format(opcode), end=' ')
-    # call the function or partial from the instruction dictionary
-    instruction_length = operation()
-    '''The return value for some functions defines whether to
-        increment the PC at this point, because e.g. a True JMP_IF
-        shouldn't increase it (it affects the downstream value 
-        incorrectly) but a false JMP_IF should change. The correct
-        increase is returned by each operation to be used here'''
-    state.increase_pc(instruction_length)
-    return opcode
-
 def hexform(value):
     '''Return numbers as hex strings, or return string back if
         a different type is provided'''
@@ -78,24 +73,6 @@ def dlog(*messages):
         #    o.write(messages + '\n')
     return
 
-def load_program(binary_data, start_address = 0):
-    '''Loads a program into memory from binary data, starting at 
-        start_address if provided'''
-    state.load_program(binary_data, start_address)
-
-def impl_count():
-    '''Provides a count of implemented and unimplemented instructions
-        in the instruction dict'''
-    done = 0
-    notdone = 0
-    for element in instruction_dict_8080.values():
-        if type(element) is str:
-            done += 1
-        else:
-            notdone += 1
-    print("Blank instructions    : " + str(done))
-    print("Existing instructions : " + str(notdone))
-
 def get_high_byte(data):
     '''Returns the high byte of a 16-bit value'''
     return (data & 0xff00) >> 8
@@ -109,1062 +86,596 @@ def get_16_bit_from_byte_pair(high_byte, low_byte):
     return (high_byte << 8) | low_byte
 
 
-'''
-***********************************************************************
-                       Instruction set functions
-***********************************************************************
-'''
-
-''' Each instruction returns the amount to increase the PC following
-    that operation'''
-
-def nop():
-    '''No operation'''
-    dlog("NOP\t")
-    return 1
-
-def mov(register_to, register_from):
-    '''Move stored value from register2 to register1'''
-    dlog("MOV\t\t", register_to, "<-", register_from)
-    state.set_register_copy(register_to, register_from)
-    return 1
-
-def mov_m(register_to):
-    '''Move stored value from register2 to register1'''
-    value = state.get_memory_by_registers('h', 'l')
-    dlog("MOV M\t\t", register_to, "<-", value)
-    state.set_register_value(register_to, value)
-    return 1
-
-def mov_to_m(target_register):
-    '''Move target register into memory address specified by HL'''
-    dlog("MOV TO M\t", target_register)
-    value = state.get_register_value(target_register)
-    state.set_memory_by_registers(value, 'h', 'l')
-    return 1
-
-def lxi(high_target, low_target):
-    '''Load Pair Immediate into specified register pair'''
-    high_data = state.get_memory_by_offset(2)
-    low_data = state.get_memory_by_offset(1)
-    dlog("LXI\t\t", high_target, low_target, high_data, low_data)
-    state.set_register_value(high_target, high_data)
-    state.set_register_value(low_target, low_data)
-    return 3
-
-def lxi_sp():
-    '''Load Pair Immediate into Stack Pointer'''
-    high_data = state.get_memory_by_offset(2)
-    low_data = state.get_memory_by_offset(1)
-    dlog("LXI SP\t\t", high_data, low_data)
-    state.set_register_value('sp', \
-        get_16_bit_from_byte_pair(high_data, low_data))
-    return 3
-
-def add(register_to, register_from):
-    '''Add a register value to defined register, updating flags.
-        If read_carry is passed as True, the carry bit will be added
-        in the operation.'''
-    dlog("ADD\t\t", register_to, register_from)
-    result = state.get_register_value(register_to) \
-            + state.get_register_value(register_from)
-    state.set_register_value(register_to, result)
-    state.set_flags(result, ['z','s','p','cy','ac'])
-    return 1
-
-def add_m(register_to):
-    '''Add memory byte stored at HL to the provided register,
-        updating flags'''
-    dlog("ADD M\t\t", register_to)
-    result = state.get_register_value(register_to) \
-            + state.get_memory_by_registers('h', 'l')
-    state.set_register_value(register_to, result)
-    state.set_flags(result, ['z','s','p','cy','ac'])
-    return 1
-
-def adc(register_to, register_from):
-    '''Add from register value to register_to, including the value
-        of the carry bit, and updates flags based on the result'''
-    dlog("ADC\t\t", register_to, register_from)
-    result = state.get_register_value(register_to)    \
-            + state.get_register_value(register_from) \
-            + state.get_flag('cy')
-    state.set_register_value(register_to, result)
-    state.set_flags(result, ['z','s','p','cy','ac'])
-    return 1
-
-def adc_m(register_to):
-    '''Add memory byte stored at HL to the provided register,
-        updating flags'''
-    dlog("ADC M\t\t", register_to)
-    result = state.get_register_value(register_to)    \
-            + state.get_memory_by_registers('h', 'l') \
-            + state.get_flag('cy')
-    state.set_register_value(register_to, result)
-    state.set_flags(result, ['z','s','p','cy','ac'])
-    return 1
-
-def adi(register_to):
-    '''Add immediate byte to the specified register, 
-        updating flags.'''
-    byte = state.get_memory_by_offset(1)
-    dlog("ADI\t\t", byte)
-    result = state.get_register_value(register_to) + byte
-    state.set_register_value(register_to, result)
-    state.set_flags(result, ['z','s','p','cy','ac'])
-    return 2
-
-def aci(register_to):
-    '''Add immediate byte to the specified register, as well as the
-        value of the carry bit, and update flags.'''
-    byte = state.get_memory_by_offset(1)
-    dlog("ADI\t\t", byte)
-    result = state.get_register_value(register_to) \
-                + byte                             \
-                + state.get_flag('cy')
-    state.set_register_value(register_to, result)
-    state.set_flags(result, ['z','s','p','cy','ac'])
-    return 2
-
-def sub(register_to, register_from):
-    '''Subtract - Store difference of to and from into register_to'''
-    dlog("SUB\t\t", register_to, register_from)
-    subtrahend = state.get_register_value(register_from)
-    carry = subtrahend > state.get_register_value(register_to)
-    subtrahend = -subtrahend & 0xff
-    result = state.get_register_value(register_to) + subtrahend
-    state.set_register_value(register_to, result)
-    state.set_flags(result, ['z','s','p','ac'])
-    state.set_single_flag('cy', carry)
-    return 1
-
-def sub_m(register_to):
-    '''Subtract from memory - Store difference of to and memory byte
-        at HL into regsiter_to'''
-    subtrahend = state.get_memory_by_registers('h', 'l')
-    dlog("SUB M\t\t", register_to, subtrahend)
-    carry = subtrahend > state.get_register_value(register_to)
-    subtrahend = -subtrahend & 0xff
-    result = state.get_register_value(register_to) + subtrahend
-    state.set_register_value(register_to, result)
-    state.set_flags(result, ['z','s','p','ac'])
-    state.set_single_flag('cy', carry)
-    return 1
-
-def sbb(register_to, register_from):
-    '''Subtract with borrow - Store difference of to and from into
-        register_to, including the carry bit as a borrow'''
-    #TODO I don't think this is correct for new carry when borrowing
-    dlog("SBB\t\t", register_to, register_from)
-    subtrahend = state.get_register_value(register_from)
-    carry = subtrahend > state.get_register_value(register_to)
-    subtrahend = -subtrahend & 0xff
-    result = state.get_register_value(register_to) \
-                + subtrahend                       \
-                - state.get_flag('cy')
-    state.set_register_value(register_to, result)
-    state.set_flags(result, ['z','s','p','ac'])
-    state.set_single_flag('cy', carry)
-    return 1
-
-def sbb_m(register_to):
-    '''Subtractfrom memory with borrow - Store difference of to and
-        memory byte at HL into regsiter_to, including the carry bit
-        as a borrow''' 
-    #TODO I don't think this is correct for new carry when borrowing
-    subtrahend = state.get_memory_by_registers('h', 'l')
-    dlog("SBB M\t\t", register_to, subtrahend)
-    carry = subtrahend > state.get_register_value(register_to)
-    subtrahend = -subtrahend & 0xff
-    result = state.get_register_value(register_to) \
-                + subtrahend                       \
-                - state.get_flag('cy')
-    state.set_register_value(register_to, result)
-    state.set_flags(result, ['z','s','p','ac'])
-    state.set_single_flag('cy', carry)
-    return 1
-
-def sui(register_to):
-    '''Subtract Immedate - Stores difference of register_to and
-        immediate byte in register_to, updating flags'''
-    subtrahend = state.get_memory_by_offset(1)
-    dlog("SUI\t\t", register_to, subtrahend)
-    carry = subtrahend > state.get_register_value(register_to)
-    subtrahend = -subtrahend & 0xff
-    result = state.get_register_value(register_to) + subtrahend
-    state.set_register_value(register_to, result)
-    state.set_flags(result, ['z','s','p','ac'])
-    state.set_single_flag('cy', carry)
-    return 2
-
-def sbi(register_to):
-    '''Subtract Immediate with Borrow - Stores difference of 
-        register_to and immediate byte in register_to, including
-        the value of the carry bit as a borrow and updating flags'''
-    subtrahend = state.get_memory_by_offset(1)
-    dlog("SBI\t\t", register_to, subtrahend)
-    carry = subtrahend > state.get_register_value(register_to)
-    subtrahend = -subtrahend & 0xff
-    result = state.get_register_value(register_to) \
-                + subtrahend                       \
-                - state.get_flag('cy')
-    state.set_register_value(register_to, result)
-    state.set_flags(result, ['z','s','p','ac'])
-    state.set_single_flag('cy', carry)
-    return 2
-
-def cmp(register_to, register_from):
-    '''Compare, sets flags based on (to - from). If from is not
-        set, use immediate byte instead'''
-    subtrahend = state.get_register_value(register_from)
-    dlog("CMP\t\t", register_to, register_from, subtrahend)
-    carry = subtrahend > state.get_register_value(register_to)
-    subtrahend = -subtrahend & 0xff
-    result = state.get_register_value(register_to) + subtrahend
-    state.set_flags(result, ['z','s','p','ac'])
-    state.set_single_flag('cy', carry)
-    return 1
-
-def cmp_m(register):
-    '''Compare to memory, sets flags based on 
-        (register - memory at HL)'''
-    subtrahend = state.get_memory_by_registers('h', 'l')
-    dlog("CMP M\t\t", register, subtrahend)
-    carry = subtrahend > state.get_register_value(register)
-    subtrahend = -subtrahend & 0xff
-    result = state.get_register_value(register) + subtrahend
-    state.set_flags(result, ['z','s','p','ac'])
-    state.set_single_flag('cy', carry)
-    return 1
-        
-
-def cmi(register):
-    '''Compare to immediate - sets flags based on 
-        (register - immediate byte)'''
-    subtrahend = state.get_memory_by_offset(1)
-    dlog("CMI\t\t", register, subtrahend)
-    carry = subtrahend > state.get_register_value(register)
-    subtrahend = -subtrahend & 0xff
-    result = state.get_register_value(register) + subtrahend
-    state.set_flags(result, ['z','s','p','ac'])
-    state.set_single_flag('cy', carry)
-    return 2
-
-def save(register_from, register_high, register_low):
-    '''Saves data value to the address specified by the 
-        provided 8-bit registerpair '''
-    dlog("SAVE\t\t", register_from, register_high, register_low)
-    value = state.get_register_value(register_from)
-    state.set_memory_by_registers(value, register_high, register_low)
-    return 1
-
-def load_r(target_register, high_byte, low_byte):
-    '''Loads 16-bit data into target register from register pair'''
-    dlog("LOAD R\t\t", target_register, high_byte, low_byte)
-    value = (state.get_register_value(high_byte) << 8) \
-            | state.get_register_value(low_byte)
-    state.set_register_value(target_register, value)
-    if target_register == 'pc':
-        return 0
-    else:
-        return 1
-
-def load_m(target_register, high_byte, low_byte):
-    '''Loads data into the target register from a memory address, 
-        provided as register pair'''
-    dlog("LOAD M\t\t", target_register, high_byte, low_byte)
-    state.set_register_value(target_register, \
-                state.get_memory_by_registers(high_byte, low_byte))
-    if target_register == 'pc':
-        return 0
-    else:
-        return 1
-
-def inr(target_register):
-    '''Increment Register'''
-    dlog("INR\t\t", target_register)
-    result = state.get_register_value(target_register) + 1
-    state.set_register_value(target_register, result)
-    state.set_flags(result, ['z','s','p','ac'])
-    return 1
-
-def inr_m():
-    '''Increment Memory stored at address described by HL'''
-    dlog("INR M\t\t")
-    result = state.get_memory_by_registers('h', 'l')
-    result += 1
-    state.set_memory_by_registers(result, 'h', 'l')
-    state.set_flags(result, ['z','s','p','ac'])
-    return 1
-
-def dcr(target_register):
-    '''Decrement Register'''
-    dlog("DCR\t\t", target_register)
-    state.decrement_register(target_register)
-    # NOTE: inaccurate, does not handle 0-- correctly for flags
-    state.set_flags(state.get_register_value(target_register), \
-                                             ['z','s','p','ac'])
-    return 1
-
-def dcr_m():
-    '''Decrement Memory stored at address described by HL'''
-    dlog("DCR M\t\t")
-    result = state.get_memory_by_registers('h', 'l')
-    result -= 1
-    state.set_memory_by_registers(result, 'h', 'l')
-    state.set_flags(result, ['z', 's', 'p', 'ac'])
-    return 1
-
-def mvi(target_register):
-    '''Loads immediate byte into the target register'''
-    byte = state.get_memory_by_offset(1)
-    dlog("MVI\t\t", target_register, byte)
-    state.set_register_value(target_register, byte)
-    return 2
-
-def mvi_m():
-    '''Loads immediate byte to the memory address indicated by HL'''
-    byte = state.get_memory_by_offset(1)
-    dlog("MVI_M\t\t", byte)
-    state.set_memory_by_registers(byte, 'h', 'l')
-    return 2
-
-def jmp(address = None):
-    '''Jump to immediate address, or arg address if provided'''
-    address = state.get_memory_word_immediate()
-    dlog("JMP\t\t", address)
-    state.set_register_value('pc', address)
-    return 0
-
-def jmp_flag(condition):
-    '''Jump to immediate address if flag is True'''
-    dlog("JMP IF\t\t", condition)
-    if state.get_flag(condition):
-        address = state.get_memory_word_immediate()
-        state.set_register_value('pc', address)
-        return 0
-    else:
-        return 3
-
-def jmp_not_flag(condition):
-    '''Jump to immediate address if flag is False'''
-    dlog("JMP IFN\t\t", condition)
-    if not state.get_flag(condition):
-        address = state.get_memory_word_immediate()
-        state.set_register_value('pc', address)
-        return 0
-    else:
-        return 3
-
-def push(high_byte, low_byte):
-    '''Push register values onto the stack'''
-    dlog("PUSH\t\t", high_byte, low_byte)
-    if type(high_byte) is str: # Then it's a register, convert
-        high_byte = state.get_register_value(high_byte)
-        low_byte = state.get_register_value(low_byte)
-    state.decrement_register('sp')
-    state.set_stack_top(high_byte)
-    state.decrement_register('sp')
-    state.set_stack_top(low_byte)
-    return 1
-
-def push_psw():
-    '''Push ACC and flags onto the stack'''
-    dlog("PUSH PSW\t")
-    high_byte = state.get_register_value('a')
-    low_byte = 0b10 # Spec declares format thusly: s z 0 ac 0 p 1 cy
-    low_byte ^= state.get_flag('cy') << 0
-    low_byte ^= state.get_flag('p')  << 2
-    low_byte ^= state.get_flag('ac') << 4
-    low_byte ^= state.get_flag('z')  << 6
-    low_byte ^= state.get_flag('s')  << 7
-    push(high_byte, low_byte)
-    return 1
-
-def pop(high_target, low_target):
-    '''Pop values from the stack to the given target registers'''
-    dlog("POP\t\t", high_target, low_target)
-    state.set_register_value(low_target, state.get_stack_top())
-    state.increment_register('sp')
-    state.set_register_value(high_target, state.get_stack_top())
-    state.increment_register('sp')
-    return 1
-
-def pop_psw():
-    '''Pop values from the stack into ACC and state flags'''
-    dlog("POP PSW\t")
-    flags_byte = state.get_stack_top() #format: s z 0 ac 0 p 1 cy
-    state.increment_register('sp')
-    state.set_register_value('a', state.get_stack_top())
-    state.increment_register('sp')
-    state.set_single_flag('cy', flags_byte & (1<<0))
-    state.set_single_flag('p',  flags_byte & (1<<2))
-    state.set_single_flag('ac', flags_byte & (1<<4))
-    state.set_single_flag('z',  flags_byte & (1<<6))
-    state.set_single_flag('s',  flags_byte & (1<<7))
-    return 1
-
-def call():
-    '''Push pc+3 onto stack, jump to immediate address'''
-    target = state.get_memory_word_immediate()
-    dlog("CALL\t\t", target)
-    state.increase_pc(3)
-    high_byte = get_high_byte(state.get_register_value('pc'))
-    low_byte = get_low_byte(state.get_register_value('pc'))
-    push(high_byte, low_byte)
-    state.set_register_value('pc', target)
-    return 0
-
-def ret():
-    '''Pop address from the stack, store it in pc'''
-    low_data = state.get_stack_top()
-    state.increment_register('sp')
-    high_data = state.get_stack_top()
-    state.increment_register('sp')
-    dlog("RET\t\t", high_data, low_data)
-    true_data = get_16_bit_from_byte_pair(high_data, low_data)
-    state.set_register_value('pc', true_data)
-    return 0
-
-def call_flag(condition):
-    '''Call if condition is True'''
-    dlog("CALL IF\t\t", condition)
-    if state.get_flag(condition):
-        call()
-        return 0
-    else:
-        return 3
-
-def call_not_flag(condition):
-    '''Call if condition is False'''
-    dlog("CALL IFN\t\t", condition)
-    if not state.get_flag(condition):
-        call()
-        return 0
-    else:
-        return 3
-
-def ret_flag(condition):
-    '''Return if condition is True'''
-    dlog("RET IF\t\t", condition)
-    if state.get_flag(condition):
-        ret()
-        return 0
-    else:
-        return 1
-
-def ret_not_flag(condition):
-    '''Return if condition is False'''
-    dlog("RET IFN\t\t", condition)
-    if not state.get_flag(condition):
-        ret()
-        return 0
-    else:
-        return 1
-
-def rst(target):
-    '''Reset (interrupt) - stores the current PC on the stack and
-        jumps to the target memory location'''
-    dlog("RST\t\t", target)
-    high_byte = get_high_byte(state.get_register_value('pc'))
-    low_byte = get_low_byte(state.get_register_value('pc'))
-    push(high_byte, low_byte)
-    state.set_register_value('pc', target)
-    return 0
-
-'''The following logical operation methods could probably be
-    condensed through some trickery, but I'm not sure what yet
-    and it works fine as is. It just seems like a lot of repetition'''
-
-def ana(register_from):
-    '''Logical AND, stores A & register_from -> A'''
-    dlog("ANA\t\t", register_from)
-    result = state.get_register_value('a')
-    result &= state.get_register_value(register_from)
-    state.set_register_value('a', result)
-    state.set_flags(result, ['z', 's', 'p', 'cy', 'ac'])
-    return 1
-
-def ana_m():
-    '''Logical AND, stores A & memory byte described by HL -> A'''
-    dlog("ANA_M\t\t")
-    result = state.get_register_value('a')
-    result &= state.get_memory_by_registers('h', 'l')
-    state.set_register_value('a', result)
-    state.set_flags(result, ['z', 's', 'p', 'cy', 'ac'])
-    return 1
-
-def ani():
-    '''Logical AND Immediate, stores A & immediate byte ->A'''
-    byte = state.get_memory_by_offset(1)
-    dlog("ANI\t\t", byte)
-    result = state.get_register_value('a')
-    result &= byte
-    state.set_register_value('a', result)
-    state.set_flags(result, ['z', 's', 'p'])
-    state.set_single_flag('cy', False) # According to the spec
-    return 2
-
-def xra(register_from):
-    '''Logical XOR, stores A ^ register_from -> A'''
-    dlog("XRA\t\t", register_from)
-    result = state.get_register_value('a')
-    result ^= state.get_register_value(register_from)
-    state.set_register_value('a', result)
-    state.set_flags(result, ['z', 's', 'p', 'cy', 'ac'])
-    return 1
-
-def xra_m():
-    '''Logical XOR, stores A ^ memory byte described by HL -> A'''
-    dlog("XRA M\t\t")
-    result = state.get_register_value('a')
-    result ^= state.get_memory_by_registers('h', 'l')
-    state.set_register_value('a', result)
-    state.set_flags(result, ['z', 's', 'p', 'cy', 'ac'])
-    return 1
-
-def xri():
-    '''Logical XOR, stores A ^ immediate byte -> A'''
-    byte = state.get_memory_by_offset(1)
-    dlog("XRI\t\t", byte)
-    result = state.get_register_value('a')
-    result ^= byte
-    state.set_register_value('a', result)
-    state.set_flags(result, ['z', 's', 'p', 'cy', 'ac'])
-    return 2
-
-def ora(register_from):
-    '''Logical OR, stores A | register_from -> A'''
-    dlog("ORA\t\t", register_from)
-    result = state.get_register_value('a')
-    result |= state.get_register_value(register_from)
-    state.set_register_value('a', result)
-    state.set_flags(result, ['z', 's', 'p', 'cy', 'ac'])
-    return 1
-
-def ora_m():
-    '''Logical OR, stores A ^ memory byte described by HL -> A'''
-    dlog("ORA M\t\t")
-    result = state.get_register_value('a')
-    result |= state.get_memory_by_registers('h', 'l')
-    state.set_register_value('a', result)
-    state.set_flags(result, ['z', 's', 'p', 'cy', 'ac'])
-    return 1
-
-def ori():
-    '''Logical OR, stores A | immediate byte -> A'''
-    byte = state.get_memory_by_offset(1)
-    dlog("ORI\t\t", byte)
-    result = state.get_register_value('a')
-    result |= byte
-    state.set_register_value('a', result)
-    state.set_flags(result, ['z', 's', 'p', 'cy', 'ac'])
-    return 2
-
-def cma():
-    '''Complement Accumulator, inverts the value stored in acc'''
-    dlog("CMA\t")
-    state.set_register_value('a', ~state.get_register_value('a'))
-    return 1
-
-def addx(high_byte, low_byte, mod_value):
-    '''Add mod_value to register pair, treating it as a 16-bit value
-        and storing back into original registers. For use in INX/DCX
-        operations'''
-    dlog("ADDX\t\t", high_byte, low_byte, mod_value)
-    bigval = state.get_register_pair_value(high_byte, low_byte)
-    bigval += mod_value
-    state.set_register_pair_value(bigval, high_byte, low_byte)
-    return 1
-
-def addx_sp(mod_value):
-    '''Add mod_value to stack pointer. For use in INXSP/DCXSP'''
-    dlog("ADDX_SP\t\t", mod_value)
-    result = state.get_register_value('sp') + mod_value
-    state.set_register_value('sp', result)
-    return 1
-
-def rlc():
-    '''Rotate Accumulator Left - the mnemonic seems backwards for
-        RLC/RAL RRC/RAR but that's canonical via the manual'''
-    dlog("RLC\t")
-    result = state.get_register_value('a')
-    bit7 = (result & 128) != 0
-    result <<= 1
-    result += bit7 # places bit 7 at new bit 0
-    state.set_single_flag('cy', bit7)
-    state.set_register_value('a', result)
-    return 1
-
-def ral():
-    '''Rotate Accumulator Left through Carry'''
-    dlog("RAL\t")
-    result = state.get_register_value('a')
-    bit7 = (result & 128) != 0
-    result <<= 1
-    result += state.get_flag('cy') # places carry bit at new bit 0
-    state.set_single_flag('cy', bit7)
-    state.set_register_value('a', result)
-    return 1
-
-def rrc():
-    '''Rotate Accumulator Right'''
-    dlog("RRC\t")
-    result = state.get_register_value('a')
-    bit0 = (result & 1) != 0
-    result >>= 1
-    result += bit0 * 128 # places bit 0 at new bit 7
-    state.set_single_flag('cy', bit0)
-    state.set_register_value('a', result)
-    return 1
-
-def rar():
-    '''Rotate Accumulator Right through Carry'''
-    dlog("RAR\t")
-    result = state.get_register_value('a')
-    bit0 = (result & 1) != 0
-    result >>= 1
-    result += state.get_flag('cy') * 128 # places cy bit at new bit 7
-    state.set_single_flag('cy', bit0)
-    state.set_register_value('a', result)
-    return 1
-
-def stc():
-    '''Set Carry'''
-    dlog("STC\t")
-    state.set_single_flag('cy', True)
-    return 1
-
-def cmc():
-    '''Complement Carry'''
-    dlog("CMC\t")
-    state.set_single_flag('cy', not state.get_flag('cy'))
-    return 1
-
-def set_interrupt_enabled(new_bool):
-    '''Sets interrupt_enabled to the given bool'''
-    dlog("SetInter\t", new_bool)
-    state.set_single_flag('interrupt_enabled', new_bool)
-    return 1
-
-def dad(high_byte, low_byte):
-    ''' Double Add - provided register pair is added to HL pair 
-        with 16-bit math'''
-    dlog("DAD\t\t", high_byte, low_byte)
-    result = state.get_register_pair_value('h', 'l')
-    result += state.get_register_pair_value(high_byte, low_byte)
-    state.set_single_flag('cy', result > 0xffff)
-    state.set_register_pair_value(result, 'h', 'l')
-    return 1
-
-def dad_sp():
-    '''Double Add - the current stack pointer is added to HL as 
-        a 16-bit value'''
-    high_byte = get_high_byte(state.get_register_value('sp'))
-    low_byte = get_low_byte(state.get_register_value('sp'))
-    dlog("DAD SP\t\t", high_byte, low_byte)
-    result = state.get_register_pair_value('h', 'l')
-    result += state.get_register_value('sp')
-    state.set_single_flag('cy', result > 0xffff)
-    state.set_register_pair_value(result, 'h', 'l')
-    return 1
-
-def xchg():
-    '''Exchange Registers DE and HL'''
-    dlog("XCHG\t\thl <-> de")
-    tmp = state.get_register_value('h')
-    state.set_register_copy('h', 'd')
-    state.set_register_value('d', tmp)
-    tmp = state.get_register_value('l')
-    state.set_register_copy('l', 'e')
-    state.set_register_value('e', tmp)
-    return 1
-
-def xthl():
-    '''Exchange stack values with HL'''
-    dlog("XTHL\t\thl <-> stack")
-    tmp_high = state.get_register_value('h')
-    tmp_low = state.get_register_value('l')
-    pop('h', 'l')
-    push(tmp_high, tmp_low)
-    return 1
-
-def lda():
-    '''Load A with data from the memory address specified by the
-        next two immediate bytes'''
-    address = state.get_memory_word_immediate()
-    data = state.get_memory_by_address(address)
-    dlog("LDA\t\t", address, ":", data)
-    state.set_register_value('a', data)
-    return 3
-
-def sta():
-    '''Store A at the memory address specified by the next two
-        immediate bytes'''
-    address = state.get_memory_word_immediate()
-    dlog("STA\t\t", address)
-    state.store_register_at_address('a', address)
-    return 3
-
-def lhld():
-    '''Load HL Direct - loads byte from memory address specified by
-        two immediate bytes into L, and the byte from the following
-        address into H'''
-    address = state.get_memory_word_immediate()
-    dlog("LHLD\t\t", address)
-    state.set_register_value('l', \
-                    state.get_memory_by_address(address))
-    address += 1
-    state.set_register_value('h', \
-                    state.get_memory_by_address(address))
-    return 3
-
-def shld():
-    '''Store HL Direct - stores L at memory address specified by two
-        immediate bytes, and H into the byte following that address'''
-    address = state.get_memory_word_immediate()
-    dlog("SHLD\t\t", address)
-    state.store_register_at_address('l', address)
-    address += 1
-    state.store_register_at_address('h', address)
-    return 3
-
-def _pretend_read():
-    '''IN placeholder for internal use - just writes a log saying
-        an IN opcode was reached. actual device read should be caught
-        and handled through machine-specific code externally, using the
-        apply_read_data function'''
-    device_id = state.get_memory_by_offset(1)
-    dlog("IN\t\t", device_id)
-    return 2
-
-def apply_read_data(data):
-    '''For use in IN operations, called externally to pass read data 
-        into the accumulator (register A)'''
-    state.set_register_value('a', data)
-
-def _pretend_write():
-    '''OUT placeholder for internal use - just writes a log saying
-        an OUT opcode was reached. actual device write should be
-        caught and handled through machine-specific code externally,
-        using the get_write_data function'''
-    device_id = state.get_memory_by_offset(1)
-    dlog("OUT\t\t", device_id)
-    return 2
-
-def get_write_data():
-    '''For use in OUT operations, returns data to be written out to
-        the external device'''
-    return state.get_register_value('a')
-
-def interrupt(opcode):
-    '''Performs the given operation, typically a RST but can
-        theoretically be anything. Called externally, never from
-        within the emulator'''
-    dlog("INTERRUPT\t", opcode, state.get_flag("interrupt_enabled"))
-    if state.get_flag("interrupt_enabled"):
-        set_interrupt_enabled(False)
-        operation = instruction_dict_8080.get(opcode)
-        operation()
-
-def daa(): # TODO add AC flag to relevant other ops
-    '''Decimal Adjust Accumulator : Fancy decimal math that
-        is not yet implemented, except for basic conversion'''
-    dlog("DAA\t\t")
-    result = state.get_register_value('a')
-    # calculate bottom bits first
-    bottom_bits = result & 0x0f
-    if bottom_bits > 0x09 or state.get_flag('ac'):
-        bottom_bits += 0x06
-        result      += 0x06
-    # If bottom_bits carries out, set AC flag, else reset AC flag
-    state.set_single_flag('ac', bottom_bits & 0x10)
-    # next calculate top bits, based on effects of bottom bits
-    top_bits = result & 0xf0
-    if top_bits > 0x90 or state.get_flag('cy'):
-        top_bits += 0x60
-        result   += 0x60
-    state.set_register_value('a', result)
-    # If top_bits carries out, set CY flag, else ignore (not reset)
-    if top_bits & 0x100:
-        state.set_single_flag('cy', True)
-    state.set_flags(result, ['z','s','p'])
-    return 1
-
-'''Map byte instructions to functions'''
-instruction_dict_8080 = { # size    flags
-    0x00 : nop,                             #"NOP",
-    0x01 : partial(lxi, 'b', 'c'),          #"LXI B,D16", #   
-    0x02 : partial(save, 'a', 'b', 'c'),    #"STAX B",
-    0x03 : partial(addx, 'b', 'c', 1),      #"INX B",
-    0x04 : partial(inr, 'b'),               #"INR B",     #Z, S, P, AC
-    0x05 : partial(dcr, 'b'),               #"DCR B",     #Z, S, P, AC
-    0x06 : partial(mvi, 'b'),               #"MVI B,D8",  #
-    0x07 : rlc,                             #"RLC",       #CY
-    0x08 : nop,                             #"---",
-    0x09 : partial(dad, 'b', 'c'),          #"DAD B",     #CY
-    0x0a : partial(load_m, 'a', 'b', 'c'),  #"LDAX B",
-    0x0b : partial(addx, 'b', 'c', -1),     #"DCX B",
-    0x0c : partial(inr, 'c'),               #"INR C",     #Z, S, P, AC
-    0x0d : partial(dcr, 'c'),               #"DCR C",     #Z, S, P, AC
-    0x0e : partial(mvi, 'c'),               #"MVI C,D8",  #
-    0x0f : rrc,                             #"RRC",       #CY
-    0x10 : nop,                             #"---",
-    0x11 : partial(lxi, 'd', 'e'),          #"LXI D,D16", #
-    0x12 : partial(save, 'a', 'd', 'e'),    #"STAX D",
-    0x13 : partial(addx, 'd', 'e', 1),      #"INX D",
-    0x14 : partial(inr, 'd'),               #"INR D",     #Z, S, P, AC
-    0x15 : partial(dcr, 'd'),               #"DCR D",     #Z, S, P, AC
-    0x16 : partial(mvi, 'd'),               #"MVI D,D8",  #
-    0x17 : ral,                             #"RAL",       #CY
-    0x18 : nop,                             #"---",
-    0x19 : partial(dad, 'd', 'e'),          #"DAD D",     #CY
-    0x1a : partial(load_m, 'a', 'd', 'e'),  #"LDAX D",
-    0x1b : partial(addx, 'd', 'e', -1),     #"DCX D",
-    0x1c : partial(inr, 'e'),               #"INR E",     #Z, S, P, AC
-    0x1d : partial(dcr, 'e'),               #"DCR E",     #Z, S, P, AC
-    0x1e : partial(mvi, 'e'),               #"MVI E,D8",  #
-    0x1f : rar,                             #"RAR",       #CY
-    0x20 : "RIM",       #                       'special'
-    0x21 : partial(lxi, 'h', 'l'),          #"LXI H,D16", #
-    0x22 : shld,                            #"SHLD adr",  #
-    0x23 : partial(addx, 'h', 'l', 1),      #"INX H",     #
-    0x24 : partial(inr, 'h'),               #"INR H",     #Z, S, P, AC
-    0x25 : partial(dcr, 'h'),               #"DCR H",     #Z, S, P, AC
-    0x26 : partial(mvi, 'h'),               #"MVI H,D8",  #
-    0x27 : daa,                             #"DAA",       #ZSPCYAC
-    0x28 : nop,                             #"---",
-    0x29 : partial(dad, 'h', 'l'),          #"DAD H",     #CY
-    0x2a : lhld,                            #"LHLD adr",  #          
-    0x2b : partial(addx, 'h', 'l', -1),     #"DCX H",
-    0x2c : partial(inr, 'l'),               #"INR L",     #Z, S, P, AC
-    0x2d : partial(dcr, 'l'),               #"DCR L",     #Z, S, P, AC
-    0x2e : partial(mvi, 'l'),               #"MVI L,D8",  #
-    0x2f : cma,                             #"CMA",
-    0x30 : "SIM",
-    0x31 : lxi_sp,                          #"LXI SP,D16",#
-    0x32 : sta,                             #"STA adr",   #
-    0x33 : partial(addx_sp, 1),             #"INX SP",    
-    0x34 : partial(inr_m),                  #"INR M",     #Z, S, P, AC
-    0x35 : dcr_m,                           #"DCR M",     #Z, S, P, AC
-    0x36 : mvi_m,                           #"MVI M,D8",  #
-    0x37 : stc,                             #"STC",       #CY
-    0x38 : nop,                             #"---",
-    0x39 : dad_sp,                          #"DAD SP",    #CY
-    0x3a : lda,                             #"LDA adr",   #
-    0x3b : partial(addx_sp, -1),            #"DCX SP",
-    0x3c : partial(inr, 'a'),               #"INR A",     #Z, S, P, AC
-    0x3d : partial(dcr, 'a'),               #"DCR A",     #Z, S, P, AC
-    0x3e : partial(mvi, 'a'),               #"MVI A,D8",  #
-    0x3f : cmc,                             #"CMC",       #CY
-    
-    0x40 : partial(mov, 'b', 'b'),          #"MOV B,B",
-    0x41 : partial(mov, 'b', 'c'),          #"MOV B,C",
-    0x42 : partial(mov, 'b', 'd'),          #"MOV B,D",
-    0x43 : partial(mov, 'b', 'e'),          #"MOV B,E",
-    0x44 : partial(mov, 'b', 'h'),          #"MOV B,H",
-    0x45 : partial(mov, 'b', 'l'),          #"MOV B,L",
-    0x46 : partial(mov_m, 'b'),             #"MOV B,M",
-    0x47 : partial(mov, 'b', 'a'),          #"MOV B,A",
-    
-    0x48 : partial(mov, 'c', 'b'),          #"MOV C,B",
-    0x49 : partial(mov, 'c', 'c'),          #"MOV C,C",
-    0x4a : partial(mov, 'c', 'd'),          #"MOV C,D",
-    0x4b : partial(mov, 'c', 'e'),          #"MOV C,E",
-    0x4c : partial(mov, 'c', 'h'),          #"MOV C,H",
-    0x4d : partial(mov, 'c', 'l'),          #"MOV C,L",
-    0x4e : partial(mov_m, 'c'),             #"MOV C,M",
-    0x4f : partial(mov, 'c', 'a'),          #"MOV C,A",
-    
-    0x50 : partial(mov, 'd', 'b'),          #"MOV D,B",
-    0x51 : partial(mov, 'd', 'c'),          #"MOV D,C",
-    0x52 : partial(mov, 'd', 'd'),          #"MOV D,D",
-    0x53 : partial(mov, 'd', 'e'),          #"MOV D,E",
-    0x54 : partial(mov, 'd', 'h'),          #"MOV D,H",
-    0x55 : partial(mov, 'd', 'l'),          #"MOV D,L",
-    0x56 : partial(mov_m, 'd'),             #"MOV D,M",
-    0x57 : partial(mov, 'd', 'a'),          #"MOV D,A",
-    
-    0x58 : partial(mov, 'e', 'b'),          #"MOV E,B",
-    0x59 : partial(mov, 'e', 'c'),          #"MOV E,C",
-    0x5a : partial(mov, 'e', 'd'),          #"MOV E,D",
-    0x5b : partial(mov, 'e', 'e'),          #"MOV E,E",
-    0x5c : partial(mov, 'e', 'h'),          #"MOV E,H",
-    0x5d : partial(mov, 'e', 'l'),          #"MOV E,L",
-    0x5e : partial(mov_m, 'e'),             #"MOV E,M",
-    0x5f : partial(mov, 'e', 'a'),          #"MOV E,A",
-    
-    0x60 : partial(mov, 'h', 'b'),          #"MOV H,B",
-    0x61 : partial(mov, 'h', 'c'),          #"MOV H,C",
-    0x62 : partial(mov, 'h', 'd'),          #"MOV H,D",
-    0x63 : partial(mov, 'h', 'e'),          #"MOV H,E",
-    0x64 : partial(mov, 'h', 'h'),          #"MOV H,H",
-    0x65 : partial(mov, 'h', 'l'),          #"MOV H,L",
-    0x66 : partial(mov_m, 'h'),             #"MOV H,M",
-    0x67 : partial(mov, 'h', 'a'),          #"MOV H,A",
-    
-    0x68 : partial(mov, 'l', 'b'),          #"MOV L,B",
-    0x69 : partial(mov, 'l', 'c'),          #"MOV L,C",
-    0x6a : partial(mov, 'l', 'd'),          #"MOV L,D",
-    0x6b : partial(mov, 'l', 'e'),          #"MOV L,E",
-    0x6c : partial(mov, 'l', 'h'),          #"MOV L,H",
-    0x6d : partial(mov, 'l', 'l'),          #"MOV L,L",
-    0x6e : partial(mov_m, 'l'),             #"MOV L,M",
-    0x6f : partial(mov, 'l', 'a'),          #"MOV L,A",
-    
-    0x70 : partial(mov_to_m, 'b'),          #"MOV M,B",
-    0x71 : partial(mov_to_m, 'c'),          #"MOV M,C",
-    0x72 : partial(mov_to_m, 'd'),          #"MOV M,D",
-    0x73 : partial(mov_to_m, 'e'),          #"MOV M,E",
-    0x74 : partial(mov_to_m, 'h'),          #"MOV M,H",
-    0x75 : partial(mov_to_m, 'l'),          #"MOV M,L",
-    0x76 : "HLT", #incr pc to next instr, CPU STOPs until interrupt
-    0x77 : partial(mov_to_m, 'a'),          #"MOV M,A",
-    
-    0x78 : partial(mov, 'a', 'b'),          #"MOV A,B",
-    0x79 : partial(mov, 'a', 'c'),          #"MOV A,C",
-    0x7a : partial(mov, 'a', 'd'),          #"MOV A,D",
-    0x7b : partial(mov, 'a', 'e'),          #"MOV A,E",
-    0x7c : partial(mov, 'a', 'h'),          #"MOV A,H",
-    0x7d : partial(mov, 'a', 'l'),          #"MOV A,L",
-    0x7e : partial(mov_m, 'a'),             #"MOV A,M",
-    0x7f : partial(mov, 'a', 'a'),          #"MOV A,A",
-    
-    0x80 : partial(add, 'a', 'b'),          #"ADD B",    #Z,S,P,CY,AC
-    0x81 : partial(add, 'a', 'c'),          #"ADD C",
-    0x82 : partial(add, 'a', 'd'),          #"ADD D",
-    0x83 : partial(add, 'a', 'e'),          #"ADD E",
-    0x84 : partial(add, 'a', 'h'),          #"ADD H",
-    0x85 : partial(add, 'a', 'l'),          #"ADD L",
-    0x86 : partial(add_m, 'a'),             #"ADD M",
-    0x87 : partial(add, 'a', 'a'),          #"ADD A",
-    
-    0x88 : partial(adc, 'a', 'b'),          #"ADC B",
-    0x89 : partial(adc, 'a', 'c'),          #"ADC C",
-    0x8a : partial(adc, 'a', 'd'),          #"ADC D",
-    0x8b : partial(adc, 'a', 'e'),          #"ADC E",
-    0x8c : partial(adc, 'a', 'h'),          #"ADC H",
-    0x8d : partial(adc, 'a', 'l'),          #"ADC L",
-    0x8e : partial(adc_m, 'a'),             #"ADC M",
-    0x8f : partial(adc, 'a', 'a'),          #"ADC A",
-    
-    0x90 : partial(sub, 'a', 'b'),          #"SUB B",
-    0x91 : partial(sub, 'a', 'c'),          #"SUB C",
-    0x92 : partial(sub, 'a', 'd'),          #"SUB D",
-    0x93 : partial(sub, 'a', 'e'),          #"SUB E",
-    0x94 : partial(sub, 'a', 'h'),          #"SUB H",
-    0x95 : partial(sub, 'a', 'l'),          #"SUB L",
-    0x96 : partial(sub_m, 'a'),             #"SUB M",
-    0x97 : partial(sub, 'a', 'a'),          #"SUB A",
-    
-    0x98 : partial(sbb, 'a', 'b'),          #"SBB B",
-    0x99 : partial(sbb, 'a', 'c'),          #"SBB C",
-    0x9a : partial(sbb, 'a', 'd'),          #"SBB D",
-    0x9b : partial(sbb, 'a', 'e'),          #"SBB E",
-    0x9c : partial(sbb, 'a', 'h'),          #"SBB H",
-    0x9d : partial(sbb, 'a', 'l'),          #"SBB L",
-    0x9e : partial(sbb_m, 'a'),             #"SBB M",
-    0x9f : partial(sbb, 'a', 'a'),          #"SBB A",
-    
-    0xa0 : partial(ana, 'b'),               #"ANA B",
-    0xa1 : partial(ana, 'c'),               #"ANA C",
-    0xa2 : partial(ana, 'd'),               #"ANA D",
-    0xa3 : partial(ana, 'e'),               #"ANA E",
-    0xa4 : partial(ana, 'h'),               #"ANA H",
-    0xa5 : partial(ana, 'l'),               #"ANA L",
-    0xa6 : partial(ana_m),                  #"ANA M",
-    0xa7 : partial(ana, 'a'),               #"ANA A",
-    
-    0xa8 : partial(xra, 'b'),               #"XRA B",
-    0xa9 : partial(xra, 'c'),               #"XRA C",
-    0xaa : partial(xra, 'd'),               #"XRA D",
-    0xab : partial(xra, 'e'),               #"XRA E",
-    0xac : partial(xra, 'h'),               #"XRA H",
-    0xad : partial(xra, 'l'),               #"XRA L",
-    0xae : partial(xra_m),                  #"XRA M",
-    0xaf : partial(xra, 'a'),               #"XRA A",
-    
-    0xb0 : partial(ora, 'b'),               #"ORA B",
-    0xb1 : partial(ora, 'c'),               #"ORA C",
-    0xb2 : partial(ora, 'd'),               #"ORA D",
-    0xb3 : partial(ora, 'e'),               #"ORA E",
-    0xb4 : partial(ora, 'h'),               #"ORA H",
-    0xb5 : partial(ora, 'l'),               #"ORA L",
-    0xb6 : partial(ora_m),                  #"ORA M",
-    0xb7 : partial(ora, 'a'),               #"ORA A",
-    
-    0xb8 : partial(cmp, 'a', 'b'),          #"CMP B",
-    0xb9 : partial(cmp, 'a', 'c'),          #"CMP C",
-    0xba : partial(cmp, 'a', 'd'),          #"CMP D",
-    0xbb : partial(cmp, 'a', 'e'),          #"CMP E",
-    0xbc : partial(cmp, 'a', 'h'),          #"CMP H",
-    0xbd : partial(cmp, 'a', 'l'),          #"CMP L",
-    0xbe : partial(cmp_m, 'a'),             #"CMP M",
-    0xbf : partial(cmp, 'a', 'a'),          #"CMP A",     #Z,S,P,CY,AC
-    
-    0xc0 : partial(ret_not_flag, 'z'),      #"RNZ",
-    0xc1 : partial(pop, 'b', 'c'),          #"POP B",
-    0xc2 : partial(jmp_not_flag, 'z'),      #"JNZ adr",   #   3
-    0xc3 : jmp,                             #"JMP adr",   #   3
-    0xc4 : partial(call_not_flag, 'z'),     #"CNZ adr",   #   3
-    0xc5 : partial(push, 'b', 'c'),         #"PUSH B",
-    0xc6 : partial(adi, 'a'),               #"ADI D8",    #Z,S,P,CY,AC
-    0xc7 : partial(rst, 0x0),               #"RST 0",
-    0xc8 : partial(ret_flag, 'z'),          #"RZ",
-    0xc9 : ret,                             #"RET",
-    0xca : partial(jmp_flag, 'z'),          #"JZ adr",    #   3
-    0xcb : nop,                             #"---",
-    0xcc : partial(call_flag, 'z'),         #"CZ adr",    #   3
-    0xcd : call,                            #"CALL adr",  #   3
-    0xce : partial(aci, 'a'),               #"ACI D8",    #Z,S,P,CY,AC
-    0xcf : partial(rst, 0x8),               #"RST 1",
-    0xd0 : partial(ret_not_flag, 'cy'),     #"RNC",
-    0xd1 : partial(pop, 'd', 'e'),          #"POP D",
-    0xd2 : partial(jmp_not_flag, 'cy'),     #"JNC adr",   #   3
-    0xd3 : _pretend_write,                  #"OUT D8",    #   2
-    0xd4 : partial(call_not_flag, 'cy'),    #"CNC adr",   #   3
-    0xd5 : partial(push, 'd', 'e'),         #"PUSH D",
-    0xd6 : partial(sui, 'a'),               #"SUI D8",    #Z,S,P,CY,AC
-    0xd7 : partial(rst, 0x10),              #"RST 2",
-    0xd8 : partial(ret_flag, 'cy'),         #"RC",
-    0xd9 : nop,                             #"---",
-    0xda : partial(jmp_flag, 'cy'),         #"JC adr",    #   3
-    0xdb : _pretend_read,                   #"IN D8",     #   2
-    0xdc : partial(call_flag, 'cy'),        #"CC adr",    #   3
-    0xdd : nop,                             #"---",
-    0xde : partial(sbi, 'a'),               #"SBI D8",    #Z,S,P,CY,AC
-    0xdf : partial(rst, 0x18),              #"RST 3",
-    0xe0 : partial(ret_not_flag, 'p'),      #"RPO",
-    0xe1 : partial(pop, 'h', 'l'),          #"POP H",
-    0xe2 : partial(jmp_not_flag, 'p'),      #"JPO adr",   #   3
-    0xe3 : xthl,                            #"XTHL",
-    0xe4 : partial(call_not_flag, 'p'),     #"CPO adr",   #   3
-    0xe5 : partial(push, 'h', 'l'),         #"PUSH H",
-    0xe6 : ani,                             #"ANI D8",    #Z,S,P,CY,AC
-    0xe7 : partial(rst, 0x20),              #"RST 4",
-    0xe8 : partial(ret_flag, 'p'),          #"RPE",
-    0xe9 : partial(load_r, 'pc', 'h', 'l'), #"PCHL",
-    0xea : partial(jmp_flag, 'p'),          #"JPE adr",   #   3
-    0xeb : xchg,                            #"XCHG",
-    0xec : partial(call_flag, 'p'),         #"CPE adr",   #   3
-    0xed : nop,                             #"---",
-    0xee : xri,                             #"XRI D8",    #Z,S,P,CY,AC
-    0xef : partial(rst, 0x28),              #"RST 5:",
-    0xf0 : partial(ret_not_flag, 's'),      #"RP",
-    0xf1 : pop_psw,                         #"POP PSW",   
-    0xf2 : partial(jmp_not_flag, 's'),      #"JP adr",    #   3
-    0xf3 : partial(set_interrupt_enabled, False),#"DI",
-    0xf4 : partial(call_not_flag, 's'),     #"CP adr",    #   3
-    0xf5 : push_psw,                        #"PUSH PSW",
-    0xf6 : ori,                             #"ORI D8",    #Z,S,P,CY,AC
-    0xf7 : partial(rst, 0x30),              #"RST 6",
-    0xf8 : partial(ret_flag, 's'),          #"RM",
-    0xf9 : partial(load_r, 'sp', 'h', 'l'), #"SPHL",
-    0xfa : partial(jmp_flag, 's'),          #"JM adr",    #   3
-    0xfb : partial(set_interrupt_enabled, True),#"EI",
-    0xfc : partial(call_flag, 's'),         #"CM adr",    #   3
-    0xfd : nop,                             #"---",
-    0xfe : partial(cmi, 'a'),               #"CPI D8",    #   2
-    0xff : partial(rst, 0x38),              #"RST 7"
-}
-
+class Emulator8080:
+    '''An 8080 CPU: owns its SystemState and the table mapping each 
+        opcode to the handler that emulates it. Handlers are generated
+        from opcode_spec_8080 by codegen_8080 and bound to this state.
+        Any number of these can exist in one process without sharing
+        memory or registers'''
+
+    def __init__(self, state = None):
+        '''Uses the provided SystemState, or a fresh one if none is
+            given'''
+        if state is None:
+            state = SystemState()
+        self.state = state
+        # port : function, called by IN and OUT, see set_port_handlers
+        self._port_reads = [None] * 0x100
+        self._port_writes = [None] * 0x100
+        self.set_port_handlers(None, None)
+        self._traps = set()
+        self.spin_detection = False
+        self._spin_until = None
+        self._spin_last = None
+        self._spin_last_cycles = 0
+        self.spin_skips = 0
+        self.spin_skipped_cycles = 0
+        self._translator = None
+        self._decoded = None
+        self._decoded_handlers = None
+        self._memory_map = None
+        # whether the handlers read through the memory map
+        self._mapped = False
+        self._fast_dict = self._build_dict(traced = False)
+        self._traced_dict = None
+        # tracing starts on if the module is set to produce debug output
+        self.set_tracing(_debug_mode != 'none')
+
+    def set_tracing(self, enabled):
+        '''Switches between the traced instruction dict, which passes
+            every instruction to dlog, and the fast one, which contains
+            no logging code at all. Takes effect from the next
+            instruction, so it can be called while the program runs'''
+        if enabled and self._traced_dict is None:
+            self._traced_dict = self._build_dict(traced = True)
+        self.tracing = enabled
+        if enabled:
+            self.instruction_dict_8080 = self._traced_dict
+        else:
+            self.instruction_dict_8080 = self._fast_dict
+        if self._translator is not None:
+            # blocks call into the old dict's handlers
+            self._translator.flush()
+
+    def _build_dict(self, traced):
+        '''Generates an instruction dict for this emulator's state, with
+            IN and OUT calling the port handler tables and jumps
+            watching for spin loops if that is enabled'''
+        handlers = build_instruction_dict(self.state, dlog,
+                                          self._port_reads,
+                                          self._port_writes, traced,
+                                          watched = self._watch_writes(),
+                                          mapped = self._map_reads())
+        for opcode in range(0x100):
+            handlers[opcode] = self._wrap_handler(opcode, handlers[opcode])
+        return handlers
+
+    def _watch_writes(self):
+        '''True if a cache of decoded or translated code, a memory map
+            or a track_writes bitmap needs to hear about writes made by
+            the program'''
+        return self._translator is not None or self._decoded is not None \
+            or self._memory_map is not None \
+            or self.state._written is not None
+
+    def _map_reads(self):
+        '''True if an attached memory map has pages with read handlers,
+            which handlers read through the state's read_memory'''
+        return self.state._read_memory is not None
+
+    def _wrap_handler(self, opcode, handler):
+        '''Adds spin detection to jumps if it is on'''
+        operation = opcode_spec_8080[opcode][1]
+        if self.spin_detection and operation in ('jmp', 'jmp_if'):
+            handler = self._spin_operation(handler)
+        return handler
+
+    def _rebuild_dicts(self):
+        '''Regenerates the instruction dicts after a setting they are
+            built from has changed'''
+        self._fast_dict = self._build_dict(traced = False)
+        if self._traced_dict is not None:
+            self._traced_dict = self._build_dict(traced = True)
+        if self._decoded is not None:
+            self._decoded_handlers = build_instruction_dict(self.state,
+                                dlog, self._port_reads, self._port_writes,
+                                watched = True, decoded = True,
+                                mapped = self._map_reads())
+            self._decoded[:] = [None] * 0x10000
+        self.set_tracing(self.tracing)
+
+    def set_port_handlers(self, reads, writes):
+        '''Registers the functions that perform IN and OUT, as dicts of
+            {port : function}. IN loads A with what the port's read
+            function returns, OUT calls the port's write function with
+            A. Ports without a read function leave A as it is and
+            writes to ports without one are ignored. Passing None for
+            both makes run_until stop after each IN and OUT instead, so
+            the caller can handle them with apply_read_data and
+            get_write_data'''
+        state = self.state
+        def read_unmapped():
+            return state.a
+        def write_unmapped(value):
+            pass
+        # filled in place, the handlers hold on to these lists
+        self._port_reads[:] = [read_unmapped] * 0x100
+        self._port_writes[:] = [write_unmapped] * 0x100
+        self._ports_registered = reads is not None or writes is not None
+        for port, read in (reads or {}).items():
+            self._port_reads[port] = read
+        for port, write in (writes or {}).items():
+            self._port_writes[port] = write
+
+    def set_io_handlers(self, read_device, write_device):
+        '''Registers one function for every IN and one for every OUT,
+            the older form of set_port_handlers. Each is called with the
+            port number, read_device should pass its data in with
+            apply_read_data and write_device can fetch A with
+            get_write_data. Passing None for both makes run_until stop
+            at IN and OUT instead'''
+        if read_device is None and write_device is None:
+            self.set_port_handlers(None, None)
+            return
+        state = self.state
+        def read_port(port):
+            read_device(port)
+            return state.a
+        def write_port(port, value):
+            write_device(port)
+        self.set_port_handlers(
+                    {port : partial(read_port, port) for port in range(0x100)},
+                    {port : partial(write_port, port)
+                                                for port in range(0x100)})
+
+    def set_spin_detection(self, enabled):
+        '''Turns spin loop detection on or off. When on, run_until
+            recognizes a short backward loop that repeats with the same
+            registers and flags without writing anything, i.e. one that
+            can only end when an interrupt changes memory, and skips as
+            many whole passes of it as fit in the run_until cycle
+            budget, so the interrupt still lands where it would without
+            skipping. spin_skips and spin_skipped_cycles count what was
+            skipped'''
+        self.spin_detection = enabled
+        self._rebuild_dicts()
+
+    def set_memory_map(self, memory_map):
+        '''Attaches a MemoryMap to the state, see memory_map_8080, so
+            writes to ROM, mirror and device pages are handled as the
+            map declares. Attach it after loading the ROM and before
+            load_precompiled_rom, as blocks compiled for the other kind
+            of memory reads are dropped. None goes back to flat RAM'''
+        if memory_map is not None:
+            memory_map.attach(self)
+        elif self._memory_map is not None:
+            self._memory_map.detach()
+
+    def _memory_map_changed(self):
+        '''Called by MemoryMap.attach and detach. Rebuilds the handlers
+            for the new kind of memory reads and the write watch table
+            without the old map's pages'''
+        state = self.state
+        state._write_watch[:] = bytes(len(state._write_watch))
+        if self._translator is not None \
+                and self._mapped != self._map_reads():
+            self._translator.drop_precompiled()
+        self._mapped = self._map_reads()
+        # also drops translated blocks and decode cache entries, which
+        # watch their memory again as they are made
+        self._rebuild_dicts()
+        if self._memory_map is not None:
+            self._memory_map._watch_pages()
+        if self._translator is not None:
+            self._translator.watch_precompiled()
+        if state._written is not None:
+            state.watch_memory(state._written_start, state._written_start
+                               + len(state._written) - 1)
+
+    def track_writes(self, address_start, address_end):
+        '''Starts the state keeping a bitmap of writes to an inclusive
+            address range, see SystemState.track_writes'''
+        self.state.track_writes(address_start, address_end)
+        # handlers must report writes for the bitmap to be kept
+        self._rebuild_dicts()
+
+    def set_jit(self, enabled):
+        '''Turns the basic block translator on or off. When on,
+            run_until runs translated blocks of straight-line code
+            instead of interpreting them one instruction at a time, see
+            jit_8080. Blocks are only used when run_until is given no
+            target PC or instruction count, I/O handlers are registered
+            and tracing is off, otherwise it interprets as usual'''
+        if enabled and self._translator is None:
+            self._translator = BlockTranslator(self)
+        elif not enabled and self._translator is not None:
+            self._translator.close()
+            self._translator = None
+        # handlers must report writes so translated code is dropped
+        self._rebuild_dicts()
+
+    def set_decode_cache(self, enabled):
+        '''Turns the decode cache on or off. When on, run_until keeps the
+            decoded form of each instruction it runs by address: the
+            handler with its immediate data already bound, its length
+            and its cycles, so running it again needs no fetching or
+            decoding. Entries are dropped when their memory is written.
+            The block translator takes priority when both are on'''
+        if enabled and self._decoded is None:
+            self._decoded = [None] * 0x10000
+            self.state.add_write_watcher(self._invalidate_decoded)
+        elif not enabled and self._decoded is not None:
+            self.state.remove_write_watcher(self._invalidate_decoded)
+            self._decoded = None
+            self._decoded_handlers = None
+        self._rebuild_dicts()
+
+    def _decode(self, pc):
+        '''Decodes the instruction at pc into a decode cache entry of
+            (operation, immediate data, length, cycles) and caches it.
+            Returns None for instructions run_until must see itself,
+            which are never cached'''
+        memory = self.state._memory
+        opcode = memory[pc]
+        mnemonic, operation, operands, length, cycles, flags \
+                                            = opcode_spec_8080[opcode]
+        handler = self._decoded_handlers[opcode]
+        if type(handler) is str or opcode == HLT_OPCODE \
+                or (operation in ('in', 'out')
+                    and not self._ports_registered):
+            return None
+        data = None
+        if length == 2:
+            data = memory[(pc + 1) & 0xffff]
+            handler = partial(handler, data)
+        elif length == 3:
+            data = memory[(pc + 1) & 0xffff] \
+                 | (memory[(pc + 2) & 0xffff] << 8)
+            handler = partial(handler, data)
+        entry = (self._wrap_handler(opcode, handler), data, length, cycles)
+        self._decoded[pc] = entry
+        self.state.watch_memory(pc, min(pc + length - 1, 0xffff))
+        return entry
+
+    def _invalidate_decoded(self, address):
+        '''Drops decode cache entries for instructions covering a
+            written address'''
+        decoded = self._decoded
+        for start in (address, address - 1, address - 2):
+            entry = decoded[start & 0xffff]
+            if entry is not None and start + entry[2] > address:
+                decoded[start & 0xffff] = None
+
+    def load_precompiled_rom(self, rom_ranges, cache_dir):
+        '''Turns the block translator on and gives it the blocks of the
+            ROM loaded in the given (start, end) address ranges, compiled
+            ahead of time and cached in cache_dir, see aot_8080. Call
+            after the ROM has been loaded'''
+        self.set_jit(True)
+        self._translator.add_precompiled(
+                    load_rom_blocks(self.state._memory, rom_ranges,
+                                    cache_dir, self._map_reads()))
+
+    def _spin_operation(self, operation):
+        '''Wraps a JMP handler so that a backward jump taken twice in a
+            row from identical registers and flags, in a loop that
+            _is_spin_loop accepts, skips as many whole passes of the
+            loop as fit in what is left of the run_until cycle budget.
+            Matching registers at the same jump mean the last pass read
+            the same memory the next one would, so nothing changes until
+            an interrupt does. Skipping whole passes, timed from the
+            last two, leaves the rest of the budget to run as usual, so
+            the interrupt lands at the same point in the loop as it
+            would without skipping'''
+        state = self.state
+        def spin_operation():
+            jump_address = state.pc
+            length = operation()
+            if length or state.pc > jump_address \
+                    or self._spin_until is None:
+                return length
+            snapshot = (jump_address, state.a, state.bc, state.de,
+                        state.hl, state.sp, state.z, state.s, state.p,
+                        state.cy, state.ac)
+            if snapshot != self._spin_last:
+                self._spin_last = snapshot
+            elif self._is_spin_loop(state.pc, jump_address):
+                # the jump's own cycles aren't counted yet, and it must
+                # still start before the end of the budget, as it would
+                # have without skipping
+                period = state._cycles - self._spin_last_cycles
+                skipped = (self._spin_until - 1 - state._cycles) \
+                        // period * period
+                if skipped > 0:
+                    state._cycles += skipped
+                    self.spin_skips += 1
+                    self.spin_skipped_cycles += skipped
+            self._spin_last_cycles = state._cycles
+            return length
+        return spin_operation
+
+    def _is_spin_loop(self, start, jump_address):
+        '''True if the code from start to the jump at jump_address is a
+            short loop that only reads memory and changes registers,
+            with no branches leaving it'''
+        if jump_address - start > SPIN_LOOP_MAX_BYTES:
+            return False
+        memory = self.state._memory
+        address = start
+        while address < jump_address:
+            mnemonic, operation, operands, length, cycles, flags \
+                                    = opcode_spec_8080[memory[address]]
+            if operation == 'jmp_if':
+                target = memory[address + 1] | (memory[address + 2] << 8)
+                if not start <= target <= jump_address:
+                    return False
+            elif operation not in _spin_safe_operations:
+                return False
+            elif operation in _register_target_operations \
+                    and operands[0] == 'm':
+                return False
+            address += length
+        return address == jump_address
+
+    def add_trap(self, address):
+        '''run_until stops whenever PC reaches this address'''
+        self._traps.add(address & 0xffff)
+        if self._translator is not None:
+            # blocks must not run past a trap
+            self._translator.flush()
+
+    def remove_trap(self, address):
+        '''Removes an address added with add_trap'''
+        self._traps.discard(address & 0xffff)
+        if self._translator is not None:
+            self._translator.flush()
+
+    def emulate_operation(self):
+        '''Parse current instruction and call the relevant code, 
+            increasing the PC as appropriate for that instruction'''
+        state = self.state
+        if state.halted:
+            # a halted CPU runs nothing until an interrupt wakes it
+            state.add_cycles(HALTED_STEP_CYCLES)
+            return HLT_OPCODE
+        opcode = state.get_current_opcode()
+        # opcodes in dict that are yet to be defined exist as strings,
+        # which will crash the program (string cannot be executed error)
+        '''Pulling the instruction from dict as an index rather than
+            with dict.get() will crash if an invalid value is submitted
+            but benchmarking suggests performance increases up to 40%'''
+        operation = self.instruction_dict_8080[opcode]
+        #print("{:04x}\t".format(self.state.get_register_value('pc')) \
+        #    + "{:02x}\t".format(opcode), end=' ')
+        # call the function or partial from the instruction dictionary
+        instruction_length = operation()
+        state.add_cycles(instruction_cycles_8080[opcode])
+        '''The return value for some functions defines whether to
+            increment the PC at this point, because e.g. a True JMP_IF
+            shouldn't increase it (it affects the downstream value 
+            incorrectly) but a false JMP_IF should change. The correct
+            increase is returned by each operation to be used here'''
+        state.increase_pc(instruction_length)
+        return opcode
+
+    def run(self, instructions):
+        '''Emulates up to the given number of instructions, see
+            run_until for the other reasons it may stop early'''
+        return self.run_until(instructions = instructions)
+
+    def run_until(self, pc = None, cycles = None, instructions = None):
+        '''Emulates instructions in one loop until one of these happens,
+            returning the reason as a string:
+            'pc'           : PC reached the given address
+            'trap'         : PC reached an address added with add_trap
+            'cycles'       : the given number of cycles have passed
+            'instructions' : the given number of instructions have run
+            'halt'         : the CPU is halted. With a cycle limit, the
+                             cycle count first skips ahead to it since
+                             nothing can run until an interrupt
+            'io'           : an IN or OUT ran with no I/O handlers
+                             registered, PC is past it and the port
+                             number is the byte before PC
+            At least one instruction runs unless the CPU is halted'''
+        state = self.state
+        stops = set(self._traps)
+        if pc is not None:
+            stops.add(pc & 0xffff)
+        if cycles is None:
+            end_cycles = float('inf')
+        else:
+            end_cycles = state._cycles + cycles
+        # counts down to 0 if a limit is given, otherwise never reaches it
+        remaining = -1 if instructions is None else instructions
+        # a spin loop can be skipped as far as the end of the budget
+        self._spin_last = None
+        if cycles is not None:
+            self._spin_until = end_cycles
+        reason = None
+        if self._translator is not None and pc is None \
+                and instructions is None and self._ports_registered \
+                and not self.tracing:
+            self._run_blocks(end_cycles, stops)
+        elif self._decoded is not None and not self.tracing:
+            reason = self._run_decoded(end_cycles, stops, remaining)
+        else:
+            reason = self._run_interpreted(end_cycles, stops, remaining)
+        self._spin_until = None
+        if reason is not None:
+            return reason
+        elif state.halted:
+            return self._idle(end_cycles)
+        elif state.pc in stops:
+            return 'pc' if state.pc == pc else 'trap'
+        elif state._cycles >= end_cycles:
+            return 'cycles'
+        return 'instructions'
+
+    def _run_interpreted(self, end_cycles, stops, remaining):
+        '''The run_until loop running one instruction at a time through
+            the instruction dict. Returns 'io' if it stopped at I/O,
+            otherwise None and run_until works out why it stopped'''
+        state = self.state
+        memory = state._memory
+        handlers = self.instruction_dict_8080
+        cycle_table = instruction_cycles_8080
+        if not self._ports_registered:
+            stop_opcodes = (HLT_OPCODE, 0xd3, 0xdb)
+        else:
+            stop_opcodes = (HLT_OPCODE,)
+        while not state.halted:
+            opcode = memory[state.pc]
+            if opcode in stop_opcodes:
+                state.increase_pc(handlers[opcode]())
+                state._cycles += cycle_table[opcode]
+                if opcode != HLT_OPCODE:
+                    return 'io'
+                break
+            length = handlers[opcode]()
+            state.pc = (state.pc + length) & 0xffff
+            state._cycles += cycle_table[opcode]
+            remaining -= 1
+            if state.pc in stops or state._cycles >= end_cycles \
+                    or not remaining:
+                break
+        return None
+
+    def _run_decoded(self, end_cycles, stops, remaining):
+        '''The run_until loop when the decode cache is on. Instructions
+            that can't be cached are passed to _run_interpreted one at a
+            time. Returns the same as _run_interpreted'''
+        state = self.state
+        decoded = self._decoded
+        decode = self._decode
+        while not state.halted:
+            entry = decoded[state.pc]
+            if entry is None:
+                entry = decode(state.pc)
+            if entry is None:
+                reason = self._run_interpreted(end_cycles, stops, 1)
+                if reason is not None:
+                    return reason
+            else:
+                operation, data, length, cycles = entry
+                length = operation()
+                state.pc = (state.pc + length) & 0xffff
+                state._cycles += cycles
+            remaining -= 1
+            if state.pc in stops or state._cycles >= end_cycles \
+                    or not remaining:
+                break
+        return None
+
+    def _run_blocks(self, end_cycles, stops):
+        '''The run_until loop when the block translator is on. A block
+            only runs if the interpreter would have reached its last
+            instruction within the budget, otherwise single instructions
+            are interpreted, so interrupts land exactly where they would
+            without translation'''
+        state = self.state
+        memory = state._memory
+        handlers = self.instruction_dict_8080
+        cycle_table = instruction_cycles_8080
+        blocks = self._translator.blocks
+        translate = self._translator.translate
+        while not state.halted:
+            entry = blocks.get(state.pc)
+            if entry is None:
+                entry = translate(state.pc)
+            block, lead_cycles = entry
+            if block is not None and state._cycles + lead_cycles < end_cycles:
+                block()
+            else:
+                opcode = memory[state.pc]
+                length = handlers[opcode]()
+                state.pc = (state.pc + length) & 0xffff
+                state._cycles += cycle_table[opcode]
+            if state.pc in stops or state._cycles >= end_cycles:
+                break
+
+    def _idle(self, end_cycles):
+        '''Skips a halted CPU's cycle count ahead to end_cycles, since
+            nothing runs before the interrupt that wakes it'''
+        state = self.state
+        if end_cycles != float('inf') and state._cycles < end_cycles:
+            state._cycles = end_cycles
+        return 'halt'
+
+    def load_program(self, binary_data, start_address = 0):
+        '''Loads a program into memory from binary data, starting at 
+            start_address if provided'''
+        self.state.load_program(binary_data, start_address)
+
+    def impl_count(self):
+        '''Provides a count of implemented and unimplemented instructions
+            in the instruction dict'''
+        done = 0
+        notdone = 0
+        for element in self.instruction_dict_8080.values():
+            if type(element) is str:
+                done += 1
+            else:
+                notdone += 1
+        print("Blank instructions    : " + str(done))
+        print("Existing instructions : " + str(notdone))
+
+    def apply_read_data(self, data):
+        '''For use in IN operations, called externally to pass read data 
+            into the accumulator (register A)'''
+        self.state.set_register_value('a', data)
+
+    def get_write_data(self):
+        '''For use in OUT operations, returns data to be written out to
+            the external device'''
+        return self.state.get_register_value('a')
+
+    def interrupt(self, opcode):
+        '''Performs the given operation, typically a RST but can
+            theoretically be anything. Called externally, never from
+            within the emulator'''
+        state = self.state
+        if self.tracing:
+            dlog("INTERRUPT\t", opcode, state.interrupt_enabled)
+        if state.interrupt_enabled:
+            state.interrupt_enabled = False
+            state.halted = False
+            operation = self.instruction_dict_8080[opcode]
+            '''The opcode is jammed onto the bus in place of the one at
+                PC, which has not run yet. Handlers expect PC to point
+                at their own opcode, and RST pushes the address after
+                it, so step back one to make it push PC itself'''
+            state.pc = (state.pc - 1) & 0xffff
+            state.increase_pc(operation())
+            state.add_cycles(instruction_cycles_8080[opcode])
+
+
+'''Duration of each instruction in 8080 clock cycles (T-states), indexed
+    by opcode and taken from opcode_spec_8080. Conditional CALL/RET are
+    listed with their not-taken duration, the generated handlers add
+    codegen_8080.CONDITIONAL_TAKEN_CYCLES when the branch is taken.
+    Undocumented opcodes are treated as NOP by this emulator and are
+    timed as such'''
+instruction_cycles_8080 = [opcode_spec_8080[opcode][4]
+                                            for opcode in range(0x100)]
+
+
+'''Module-level API, kept for code written before Emulator8080
+    existed. These all act on a single default emulator'''
+_default_emulator = Emulator8080()
+state = _default_emulator.state
+# the dict in use at import, set_tracing() doesn't update this name
+instruction_dict_8080 = _default_emulator.instruction_dict_8080
+emulate_operation = _default_emulator.emulate_operation
+load_program = _default_emulator.load_program
+impl_count = _default_emulator.impl_count
+interrupt = _default_emulator.interrupt
+apply_read_data = _default_emulator.apply_read_data
+get_write_data = _default_emulator.get_write_data
+set_tracing = _default_emulator.set_tracing
+set_decode_cache = _default_emulator.set_decode_cache
+set_io_handlers = _default_emulator.set_io_handlers
+set_port_handlers = _default_emulator.set_port_handlers
+add_trap = _default_emulator.add_trap
+remove_trap = _default_emulator.remove_trap
+run = _default_emulator.run
+run_until = _default_emulator.run_until
@@ -19,12 +19,19 @@
 
 import abc
 import pygame
-import emu8080.emulator_8080 as emulator
+from emu8080.emulator_8080 import Emulator8080
+from emu8080.memory_map_8080 import MemoryMap
 from sys import exit
-from time import process_time
+from emu8080.render import Renderer, RenderWorker
 from functools import partial
-from multiprocessing import Process
-from data.precalculated import packed_monochrome_to_palette
+from time import perf_counter, sleep
+
+# How run() keeps time, see IOAbstract.pace_frame
+_pacing_modes = ('turbo', 'realtime')
+
+# How late (in seconds) pacing can fall before it stops trying to catch
+# up and starts counting from now again
+_max_lag = 0.25
 
 class IOAbstract():
     ''' Generic interface for creating a machine that can run on the
@@ -32,11 +39,12 @@ class IOAbstract():
         implementation:
         _system_info
         _binary_dict
+        _memory_map (optional)
         _read_ports
         _write_ports
         _keymap
-        write_device()
-        read_device()
+        port_writes()
+        port_reads() (optional)
     '''
 
     ''' Contains configuration info about this hardware '''
@@ -49,10 +57,25 @@ class IOAbstract():
         #'vram_start'    : 0x2400,
         #'vram_end'      : 0x3fff,
         #'framerate'     : 1.0/60.0,
+        #'clock_speed'   : 2000000, # 8080 clock in Hz
         #'palette'       : [(0,0,0), (255,255,255)],
         #'mid_vblank'    : True,
-        #'vblank_op'     : 0xcf,
-        #'mid_vblank_op' : 0xd7
+        #'vblank_op'     : 0xd7,
+        #'mid_vblank_op' : 0xcf,
+        #'spin_detection': True, # skip idle loops, see Emulator8080
+        #'decode_cache'  : True, # keep decoded instructions by address
+        #'jit'           : True, # translate ROM code into Python blocks
+        #'aot'           : True, # compile the ROM to a cached module
+        #'aot_cache_dir' : 'cache/aot',
+        #'numpy_render'  : True, # draw with NumPy if it is installed
+        #'dirty_tracking': True, # only redraw VRAM rows written to
+        #'scaling'       : 'integer', # see Renderer.open_screen
+        #'render_process': True, # draw in a process of its own
+        #'half_frames'   : True, # draw each half as the beam passes it
+        #'pacing'        : 'realtime', # or 'turbo', see pace_frame
+        #'report_slack'  : True, # print frame slack once a second
+        #'max_frameskip' : 4, # frames in a row skip_frame may skip
+        #'input_poll_cycles': 33333, # default once a frame, see run
     }
     
     ''' Dict with one entry for each program file to load into 
@@ -65,6 +88,21 @@ class IOAbstract():
         #0x1800 : "bin/invaders/invaders.e"
     }
     
+    ''' Dict describing the address space, in 256-byte pages. Each key
+        is an inclusive (start, end) address range and each value one
+        of 'rom', 'ram', ('mirror', base_start, base_end) or
+        ('device', name of a method taking the address and byte
+        written[, name of a method taking the address and returning the
+        byte read]). Pages not listed are RAM. ROM is write protected
+        once the binaries are loaded. Writes to RAM stay unwatched.
+        Declaring a mirror or a device read method makes every memory
+        read go through the map, see memory_map_8080 '''
+    _memory_map = { # sample data:
+        #(0x0000, 0x1fff) : 'rom',
+        #(0x2000, 0x3fff) : 'ram',
+        #(0x4000, 0xffff) : ('mirror', 0x2000, 0x3fff)
+    }
+
     _read_ports = {
     }
     
@@ -110,122 +148,362 @@ class IOAbstract():
         #'fleet4'        : 'sounds/invaders/fastinvader4.wav'
     }
 
-    def __init__(self):
+    def __init__(self, emulator = None):
         ''' Load program and sound files from disk into memory,
-            initialize pygame '''
+            initialize pygame. Each machine runs on its own emulator,
+            a new one is created unless one is provided '''
+        if emulator is None:
+            emulator = Emulator8080()
+        self.emulator = emulator
+        # IN and OUT go straight to this machine's devices as they run
+        self.emulator.set_port_handlers(self.port_reads(),
+                                        self.port_writes())
+        if self._system_info.get('spin_detection'):
+            self.emulator.set_spin_detection(True)
+        if self._system_info.get('decode_cache'):
+            self.emulator.set_decode_cache(True)
+        if self._system_info.get('jit'):
+            self.emulator.set_jit(True)
+        rom_ranges = []
         for address in self._binary_dict:
             with open(self._binary_dict[address], 'rb') as input_file:
-                emulator.load_program(input_file.read(), address)
+                program = input_file.read()
+            self.emulator.load_program(program, address)
+            rom_ranges.append((address, address + len(program) - 1))
+        if self._memory_map:
+            self.emulator.set_memory_map(self.build_memory_map())
+        if self._system_info.get('aot'):
+            self.emulator.load_precompiled_rom(rom_ranges,
+                    self._system_info.get('aot_cache_dir', 'cache/aot'))
+        self.renderer = Renderer(self._system_info)
+        # started by run() if 'render_process' is set
+        self._render_worker = None
+        self._pacing = self._system_info.get('pacing', 'turbo')
+        if self._pacing not in _pacing_modes:
+            raise ValueError("Unknown pacing: " + str(self._pacing))
+        poll_cycles = self._system_info.get('input_poll_cycles')
+        if poll_cycles is not None and (type(poll_cycles) is not int
+                                        or poll_cycles <= 0):
+            raise ValueError("input_poll_cycles must be a positive int: "
+                             + str(poll_cycles))
+        # seconds to spare at the end of the last frame, see pace_frame
+        self.frame_slack = 0.0
+        # frames drawn and skipped by run, see skip_frame
+        self.frames_rendered = 0
+        self.frames_skipped = 0
+        self._skipped_in_row = 0
+        if self._system_info.get('dirty_tracking'):
+            self.emulator.track_writes(
+                                self._system_info.get('vram_start'),
+                                self._system_info.get('vram_end'))
         pygame.init()
-        for sound in self._sound_dict:
-            # translate filename into Sound objects
-            self._sound_dict[sound] \
-                        = pygame.mixer.Sound(self._sound_dict[sound])
+        # translate filenames into Sound objects, leaving the class
+        # level dict of filenames untouched for other instances
+        self._sound_dict = {sound : pygame.mixer.Sound(filename)
+                        for sound, filename in self._sound_dict.items()}
+        self.reset_interrupt_schedule()
+        self.reset_pacing()
+
+    def build_memory_map(self):
+        ''' Returns a MemoryMap of the pages declared in _memory_map '''
+        memory_map = MemoryMap()
+        for (start, end), kind in self._memory_map.items():
+            if kind == 'rom':
+                memory_map.map_rom(start, end)
+            elif kind == 'ram':
+                memory_map.map_ram(start, end)
+            elif kind[0] == 'mirror':
+                memory_map.map_mirror(start, end, kind[1], kind[2])
+            elif kind[0] == 'device':
+                read = getattr(self, kind[2]) if len(kind) > 2 else None
+                memory_map.map_device(start, end, getattr(self, kind[1]),
+                                      read)
+            else:
+                raise ValueError("Unknown memory map entry: " + str(kind))
+        return memory_map
+
+    def reset_interrupt_schedule(self):
+        ''' Schedule interrupts from the current cycle count. A frame
+            lasts clock_speed * framerate cycles, the mid-screen
+            interrupt (if any) fires halfway through and the vblank
+            interrupt at the end of it '''
+        self._cycles_per_frame = int(self._system_info.get('clock_speed')
+                                     * self._system_info.get('framerate'))
+        # toggle for this because not all games have mid-vblank
+        self._do_midblank = self._system_info.get('mid_vblank_op') != None
+        self._frame_start = self.emulator.state.get_cycles()
+        self._schedule_next_interrupt()
+
+    def _schedule_next_interrupt(self):
+        ''' Sets the cycle count at which the next interrupt is due.
+            Boundaries are counted from the start of the frame rather
+            than from when the last interrupt fired, so that
+            instructions running past a boundary don't cause drift '''
+        if self._do_midblank:
+            self._next_is_mid = True
+            self._next_interrupt = self._frame_start \
+                                 + self._cycles_per_frame // 2
+        else:
+            self._next_is_mid = False
+            self._next_interrupt = self._frame_start \
+                                 + self._cycles_per_frame
+
+    def fire_scheduled_interrupt(self):
+        ''' Fires whichever interrupt is due and schedules the next
+            one. Returns True if it was the vblank interrupt '''
+        if self._next_is_mid:
+            self.emulator.interrupt(self._system_info['mid_vblank_op'])
+            self._next_is_mid = False
+            self._next_interrupt = self._frame_start \
+                                 + self._cycles_per_frame
+            return False
+        self.emulator.interrupt(self._system_info['vblank_op'])
+        self._frame_start += self._cycles_per_frame
+        self._schedule_next_interrupt()
+        return True
     
     def handle_events(self):
         ''' Processes input events accoring to the _keymap.
-            Returns True if QUIT event occurs '''
-        events = pygame.event.get()
-        for event in events:
-            if event.type == pygame.KEYDOWN:
-                keydata = self._keymap.get(event.key)
+            Returns True if QUIT event occurs. With a render process
+            the window is its, so the events come from there '''
+        if self._render_worker is not None:
+            events = self._render_worker.events()
+        else:
+            events = [(event.type, getattr(event, 'key', None))
+                      for event in pygame.event.get()]
+        for event_type, key in events:
+            if event_type == pygame.KEYDOWN:
+                keydata = self._keymap.get(key)
                 if keydata != None:
                     self.set_read_bit(*keydata, True)
-            elif event.type == pygame.KEYUP:
-                keydata = self._keymap.get(event.key)
+            elif event_type == pygame.KEYUP:
+                keydata = self._keymap.get(key)
                 if keydata != None:
                     self.set_read_bit(*keydata, False)
-            elif event.type == pygame.QUIT:
+            elif event_type == pygame.QUIT:
                 return True
         return False
 
     @abc.abstractmethod
-    def write_device(self, port_num):
-        ''' Takes output from the program and simulates the 
-            appropriate hardware interaction. This function should
-            describe the path to take for each port written by
-            the 8080 program '''
-        return
+    def port_writes(self):
+        ''' Returns a dict of {port : function} simulating the hardware
+            behind each port written by the 8080 program. OUT calls the
+            port's function with the byte written. Unlisted ports are
+            ignored '''
+        return {}
 
-    @abc.abstractmethod
-    def read_device(self, port_num):
-        ''' Passes I/O data into emulator state. This function
-            should formulate and retrieve the data for each port
-            read by the 8080 program, and pass it into the emulator
-            via `emulator.apply_read_data(data) '''
-        data = None
-        emulator.apply_read_data(data)
-
-    def draw_screen(self, screen, rawimage):
+    def port_reads(self):
+        ''' Returns a dict of {port : function} producing the byte for
+            each port read by the 8080 program, which IN loads into A.
+            By default every port in _read_ports reads its current
+            value there, machines with other devices add their own '''
+        return {port : partial(self._read_ports.get, port)
+                                            for port in self._read_ports}
+
+    def draw_screen(self, screen, rawimage, band = None):
         ''' Pull image data from the emulator state and display it 
-            via PyGame '''
-        image_buffer = []
-        for byte in rawimage:
-            image_buffer += packed_monochrome_to_palette.get(byte)
-        image_buffer = bytes(image_buffer)
-        image = pygame.image.frombuffer(image_buffer,
-                            (self._system_info.get('orig_width'),
-                             self._system_info.get('orig_height')),
-                            "P")
-        image.set_palette(self._system_info.get('palette'))
-        image = image.convert()
-        image = pygame.transform.rotate(image,
-                            self._system_info.get('rotate_ccw_deg'))
-        pygame.transform.scale(image,
-                    (self._system_info.get('target_width'),
-                     self._system_info.get('target_height')),
-                    screen)
-        pygame.display.flip()
+            via PyGame. band limits drawing to a (first row, row after
+            the last) range of VRAM rows, see run. With 'dirty_tracking'
+            on, only the rows of VRAM written since the last frame are
+            redrawn, and the display is left alone if there are none.
+            With a render process the frame is handed to it instead and
+            screen is unused '''
+        if band is None:
+            rows = self.changed_rows()
+        else:
+            rows = self.changed_rows(*band)
+        if rows is not None and not rows:
+            return
+        if self._render_worker is not None:
+            self._render_worker.submit(rawimage, rows, band)
+        else:
+            self.renderer.draw(screen, rawimage, rows, band)
+
+    def changed_rows(self, first = 0, end = None):
+        ''' Returns the VRAM rows from first up to end (by default all
+            of them) written since they were last asked about, as a list
+            of (first row, row after the last) runs, or None if writes
+            are not being tracked '''
+        state = self.emulator.state
+        if state._written is None:
+            return None
+        row_bytes = self._system_info.get('orig_width') // 8
+        if end is None:
+            end = len(state._written) // row_bytes
+        written = state.take_written(first * row_bytes, end * row_bytes)
+        runs = []
+        start = None
+        for row in range(first, end):
+            offset = (row - first) * row_bytes
+            if any(written[offset:offset + row_bytes]):
+                if start is None:
+                    start = row
+            elif start is not None:
+                runs.append((start, row))
+                start = None
+        if start is not None:
+            runs.append((start, end))
+        return runs
+
+    def reset_pacing(self):
+        ''' Starts timing frames from now '''
+        self._frame_deadline = perf_counter() \
+                             + self._system_info.get('framerate')
+        self._slack_report = []
+
+    def pace_frame(self):
+        ''' Called once a frame has been emulated and drawn. In
+            'realtime' pacing this sleeps until the wall clock reaches
+            the end of the frame, rather than spinning. Deadlines are
+            counted on from the last deadline rather than from when the
+            sleep ended, so oversleeping one frame is made up in the
+            next. Falling more than _max_lag behind starts the count
+            again from now, instead of racing to catch up. 'turbo'
+            never sleeps, running as fast as the host allows, and
+            times each frame from the end of the last one.
+            Returns, and keeps in frame_slack, how many seconds were
+            left before the deadline, negative if the frame was late '''
+        now = perf_counter()
+        slack = self._frame_deadline - now
+        if self._pacing == 'realtime' and slack > 0:
+            sleep(slack)
+        framerate = self._system_info.get('framerate')
+        if self._pacing == 'turbo' or slack < -_max_lag:
+            self._frame_deadline = now + framerate
+        else:
+            self._frame_deadline += framerate
+        self.frame_slack = slack
+        if self._system_info.get('report_slack'):
+            self.report_slack(slack)
+        return slack
+
+    def report_slack(self, slack):
+        ''' Prints the least and average slack of the frames over each
+            second, how many of them were late, and the running count
+            of frames drawn and skipped '''
+        self._slack_report.append(slack)
+        if len(self._slack_report) \
+                < 1.0 / self._system_info.get('framerate'):
+            return
+        report = self._slack_report
+        print("frame slack ms: min %.2f avg %.2f, %d of %d late, "
+              "%d drawn %d skipped"
+              % (min(report) * 1000, sum(report) / len(report) * 1000,
+                 sum(1 for slack in report if slack < 0), len(report),
+                 self.frames_rendered, self.frames_skipped))
+        self._slack_report = []
+
+    def skip_frame(self):
+        ''' Adaptive frameskip, asked at each vblank about the frame to
+            come. While frames are finishing late, drawing is skipped
+            for up to max_frameskip frames in a row (none by default),
+            so the screen still moves on a host that can never keep up.
+            Interrupts are delivered as usual, and VRAM written during
+            skipped frames is drawn with the next frame that isn't.
+            Returns True if the next frame shouldn't be drawn '''
+        if self.frame_slack < 0 and self._skipped_in_row \
+                < self._system_info.get('max_frameskip', 0):
+            self._skipped_in_row += 1
+            return True
+        self._skipped_in_row = 0
+        return False
+
+    def step(self):
+        ''' Emulate a single instruction, firing an interrupt if its
+            cycle count has been reached. Any I/O it performs goes to
+            the machine through port_reads/port_writes. Returns True
+            if vblank occurred '''
+        self.emulator.emulate_operation()
+        if self.emulator.state.get_cycles() >= self._next_interrupt:
+            return self.fire_scheduled_interrupt()
+        return False
+
+    def run_until_interrupt(self):
+        ''' Emulate up to the next scheduled interrupt in one batch and
+            fire it. Returns True if it was the vblank interrupt '''
+        state = self.emulator.state
+        remaining = self._next_interrupt - state.get_cycles()
+        if remaining > 0:
+            self.emulator.run_until(cycles = remaining)
+        if state.get_cycles() >= self._next_interrupt:
+            return self.fire_scheduled_interrupt()
+        return False
+
+    def run_cycles(self, cycles):
+        ''' Emulate for (at least) the given number of clock cycles,
+            firing the mid-screen and vblank interrupts as their cycle
+            counts are reached. Returns the number of vblanks that
+            occurred. Does not draw or process input events '''
+        state = self.emulator.state
+        target = state.get_cycles() + cycles
+        vblank_count = 0
+        while state.get_cycles() < target:
+            if self._next_interrupt <= target:
+                if self.run_until_interrupt():
+                    vblank_count += 1
+            else:
+                self.emulator.run_until(
+                                    cycles = target - state.get_cycles())
+        return vblank_count
 
     def run(self):
         ''' Begin emulation '''
-        instruction_count = 0
-        width = self._system_info.get('target_width')
-        height = self._system_info.get('target_height')
-        screen = pygame.display.set_mode((width, height))
-        last_vblank = process_time()
-        # toggle for this because not all games have mid-vblank
-        do_midblank = self._system_info.get('mid_vblank_op') != None
-        # mid-screen is roughly half a frame ahead
-        last_mid = last_vblank - (self._system_info.get('framerate')/2)
-        current_frame = 0
-        #op_tracker = [0]*2**16 # stores ops/frame for metrics
-        while True:
-            do_quit = self.handle_events()
-            if do_quit:
-                break
-            
-            current_time = process_time()
-            if current_time - last_vblank \
-                            >= self._system_info.get('framerate'):
-                emulator.interrupt(self._system_info['vblank_op'])
-                last_vblank = current_time
-                vram = emulator.state.get_memory_slice(
+        if self._system_info.get('render_process'):
+            self._render_worker = RenderWorker(self._system_info)
+            screen = None
+        else:
+            screen = self.renderer.open_screen()
+        self.reset_interrupt_schedule()
+        # a view, so it always shows the current VRAM
+        vram = self.emulator.state.get_memory_slice(
                             self._system_info.get('vram_start'),
                             self._system_info.get('vram_end'))
-                self.draw_screen(screen, vram)
-                #if current_frame % 60 == 0:
-                #    print(sum( \
-                #        op_tracker[current_frame-59:current_frame+1]))
-                current_frame += 1
-            elif do_midblank and current_time - last_mid \
-                            >= self._system_info.get('framerate'):
-                last_mid = current_time
-                emulator.interrupt(self._system_info['mid_vblank_op'])
-            opcode = emulator.emulate_operation()
-            #op_tracker[current_frame] += 1
-            ''' Handling the write/read like this is a bit messy,
-                especially with having to access the internal state
-                directly. Should reconsider how to implement this 
-                but it works for now.Note that offset is -1 because
-                emulate_operation has already increased the PC past
-                the data at this point '''
-            if opcode == 0xd3: # OUT operation
-                self.write_device( \
-                            emulator.state.get_memory_by_offset(-1))
-            elif opcode == 0xdb: # IN operation
-                self.read_device( \
-                            emulator.state.get_memory_by_offset(-1))
-            instruction_count += 1
+        # the screen is scanned top to bottom over the frame, so by the
+        # mid-screen interrupt the upper half of VRAM has been shown and
+        # by vblank the lower half. Drawing each half then matches what
+        # the hardware displayed, even where the game changes it halfway
+        # through the frame
+        half_frames = self._do_midblank \
+                        and self._system_info.get('half_frames')
+        middle = self._system_info.get('orig_height') // 2
+        lower = (middle, self._system_info.get('orig_height'))
+        self.reset_pacing()
+        skip = False
+        # input is sampled every input_poll_cycles, by default once a
+        # frame just after vblank. Key states only change in the
+        # _read_ports bytes then, so the game reads the same values
+        # until the next sample
+        state = self.emulator.state
+        poll_cycles = self._system_info.get('input_poll_cycles',
+                                            self._cycles_per_frame)
+        next_poll = state.get_cycles()
+        while True:
+            if state.get_cycles() >= next_poll:
+                do_quit = self.handle_events()
+                if do_quit:
+                    break
+                # keep to the schedule, skipping samples already missed
+                next_poll += poll_cycles * (1 + (state.get_cycles()
+                                            - next_poll) // poll_cycles)
+            if next_poll < self._next_interrupt:
+                self.emulator.run_until(
+                                cycles = next_poll - state.get_cycles())
+                continue
+            mid_due = self._next_is_mid
+            if self.run_until_interrupt():
+                if skip:
+                    self.frames_skipped += 1
+                else:
+                    self.draw_screen(screen, vram,
+                                     lower if half_frames else None)
+                    self.frames_rendered += 1
+                self.pace_frame()
+                skip = self.skip_frame()
+            elif half_frames and mid_due and not self._next_is_mid \
+                    and not skip:
+                self.draw_screen(screen, vram, (0, middle))
+        if self._render_worker is not None:
+            self._render_worker.stop()
+            self._render_worker = None
         pygame.quit()
         exit()
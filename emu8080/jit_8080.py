@@ -0,0 +1,356 @@
+'''
+    python8080, an 8080 emulator designed for arcade games.
+    Copyright (C) 2019  Jacob Gray
+
+    This program is free software: you can redistribute it and/or
+    modify it under the terms of the GNU General Public License as
+    published by the Free Software Foundation, either version 3 of
+    the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.
+    If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import linecache
+import re
+from emu8080.opcode_spec_8080 import opcode_spec_8080
+from emu8080.codegen_8080 import instruction_body
+from data.precalculated import zsp_flags
+from data.precalculated import inr_aux_carry
+from data.precalculated import dcr_aux_carry
+
+''' Translates straight-line runs of 8080 code (basic blocks) into
+    Python functions, so that a block the program runs over and over is
+    decoded once instead of on every pass. Each block keeps the
+    registers it uses in local variables, has its immediate data
+    written in as constants and ends with the instruction that leaves
+    it (a jump, call, return, I/O...), which runs through the
+    emulator's normal handler so it behaves exactly as it would in the
+    interpreter. Anything that cannot be translated is left to the
+    interpreter '''
+
+# Longest block, in instructions, before it is cut off
+MAX_BLOCK_INSTRUCTIONS = 32
+
+# Operations that are translated into the body of a block. Everything
+# else ends the block and runs through the emulator's handler
+_inline_operations = {
+    'nop', 'mov', 'mvi', 'lxi', 'stax', 'ldax', 'inx', 'dcx', 'inr', 'dcr',
+    'rlc', 'rrc', 'ral', 'rar', 'dad', 'shld', 'lhld', 'sta', 'lda', 'daa',
+    'cma', 'stc', 'cmc', 'add', 'adc', 'sub', 'sbb', 'ana', 'xra', 'ora',
+    'cmp', 'push', 'pop', 'xthl', 'sphl', 'xchg'
+}
+
+_register = re.compile(r"state\.(a|bc|de|hl|sp|z|s|p|cy|ac)\b")
+_local_register = re.compile(r"\br_(a|bc|de|hl|sp|z|s|p|cy|ac)\b")
+_watched_store = re.compile(r"^(\s*)watched_write\(written\)$")
+_flag_names = ('z', 's', 'p', 'cy', 'ac')
+_flag = re.compile(r"\br_(z|s|p|cy|ac)\b")
+# a line setting only flags, outside any if
+_flag_assignment = re.compile(
+            r"^(r_(?:z|s|p|cy|ac)(?:, r_(?:z|s|p|cy|ac))*) = (.*[^\\])$")
+
+def _inline_lines(memory, opcode, address, mapped = False):
+    '''The handler body of one instruction, with the immediate data
+        written in as constants and registers as local variables'''
+    body = instruction_body(opcode, watched = True,
+                            mapped = mapped)
+    # the handler's final line returns its length, not needed here
+    body = body[:-1]
+    source = "\n".join(body)
+    source = source.replace("mem[state.pc + 1]",
+                            "0x%02x" % memory[(address + 1) & 0xffff])
+    source = source.replace("mem[state.pc + 2]",
+                            "0x%02x" % memory[(address + 2) & 0xffff])
+    source = _register.sub(r"r_\1", source)
+    return source.split("\n")
+
+def scan_block(memory, pc, traps = (), mapped = False):
+    '''Decodes the block starting at pc, stopping before any address in
+        traps and reading through the memory map if mapped is set.
+        Returns None if it has no instructions worth translating,
+        otherwise a tuple of:
+        lines        : translated source of the straight-line code
+        exit_address : address of the terminator, or of the next block
+                       if the block was cut off
+        inline_cycles: cycles of the straight-line code
+        lead_cycles  : cycles of every instruction except the last, so
+                       the block is run only when the interpreter would
+                       also have started its last instruction within
+                       the cycle budget
+        terminator   : opcode of the instruction ending the block, which
+                       runs through the emulator's handler, or None
+        end          : address just past the block's code'''
+    # (address, mnemonic, length, cycles, translated lines)
+    instructions = []
+    address = pc
+    inline_cycles = 0
+    last_cycles = 0
+    terminator = None
+    while len(instructions) < MAX_BLOCK_INSTRUCTIONS:
+        if address > 0xffff:
+            # PC wraps to 0 here, which starts another block
+            break
+        if address != pc and address in traps:
+            break
+        opcode = memory[address]
+        mnemonic, operation, operands, length, cycles, flags \
+                                            = opcode_spec_8080[opcode]
+        if address + length > 0x10000:
+            break
+        if operation not in _inline_operations:
+            if operation != 'unimplemented':
+                terminator = opcode
+            break
+        instructions.append((address, mnemonic, length, cycles,
+                             _inline_lines(memory, opcode, address,
+                                           mapped)))
+        inline_cycles += cycles
+        last_cycles = cycles
+        address += length
+    if not instructions:
+        # a lone jump/call/etc gains nothing from being translated
+        return None
+    if terminator is None:
+        end = address
+        lead_cycles = inline_cycles - last_cycles
+    else:
+        end = address + opcode_spec_8080[terminator][3]
+        lead_cycles = inline_cycles
+    return (_block_lines(_drop_dead_flags(instructions), pc, end),
+            address, inline_cycles, lead_cycles, terminator, end)
+
+def _drop_dead_flags(instructions):
+    '''Leaves out the lines setting flags that a later instruction in
+        the block sets again before anything reads them. Every flag is
+        kept where the block can be left: at its end, for the
+        terminator and whatever runs next, and after any store, which
+        ends the block if it writes into the block's own code'''
+    live = set(_flag_names)
+    kept = []
+    for address, mnemonic, length, cycles, body in reversed(instructions):
+        if any(_watched_store.match(line) for line in body):
+            live = set(_flag_names)
+        lines = []
+        for line in reversed(body):
+            assignment = _flag_assignment.match(line)
+            if assignment is None:
+                live.update(_flag.findall(line))
+            else:
+                targets = set(_flag.findall(assignment.group(1)))
+                if not targets & live:
+                    continue
+                live -= targets
+                live.update(_flag.findall(assignment.group(2)))
+            lines.append(line)
+        lines.reverse()
+        kept.append((address, mnemonic, length, cycles, lines))
+    kept.reverse()
+    return kept
+
+def _block_lines(instructions, pc, end):
+    '''Joins the translated instructions of a block from pc to end.
+        An instruction storing into the block's own code ends the block
+        straight after it, with the registers written back, PC on the
+        instruction that follows it and its cycles counted, so nothing
+        runs from the old translation once its code has changed'''
+    registers = _registers([line for instruction in instructions
+                                 for line in instruction[4]])
+    lines = []
+    stores = False
+    cycles_run = 0
+    for address, mnemonic, length, cycles, body in instructions:
+        cycles_run += cycles
+        lines.append("# 0x%04x %s" % (address, mnemonic))
+        checked = []
+        for line in body:
+            checked.append(line)
+            store = _watched_store.match(line)
+            if store is not None:
+                indent = store.group(1)
+                checked += [indent + "if 0x%04x <= written < 0x%04x:"
+                                                        % (pc, end),
+                            indent + "    self_written = True"]
+        lines += checked
+        if len(checked) != len(body):
+            stores = True
+            exit_lines = _store_registers(registers) \
+                       + ["state._cycles += %d" % cycles_run,
+                          "state.pc = 0x%04x" % ((address + length) & 0xffff),
+                          "return"]
+            lines.append("if self_written:")
+            lines += ["    " + line for line in exit_lines]
+    if stores:
+        lines.insert(0, "self_written = False")
+    return lines
+
+def _registers(lines):
+    '''The registers translated lines keep in local variables'''
+    return sorted(set(_local_register.findall("\n".join(lines))))
+
+def _store_registers(registers):
+    '''Lines writing registers held in local variables back to the
+        state'''
+    return ["state.%s = r_%s" % (register, register)
+                                        for register in registers]
+
+def block_source(pc, block):
+    '''Returns the source of build_block_XXXX(), which creates the
+        function for a block from scan_block bound to one state and the
+        handler of its terminator'''
+    lines, exit_address, inline_cycles, lead_cycles, terminator, end \
+                                                                = block
+    registers = _registers(lines)
+    body = ["r_%s = state.%s" % (register, register)
+                                        for register in registers]
+    body += lines
+    body += _store_registers(registers)
+    body.append("state._cycles += %d" % inline_cycles)
+    body.append("state.pc = 0x%04x" % (exit_address & 0xffff))
+    if terminator is not None:
+        mnemonic, operation, operands, length, cycles, flags \
+                                        = opcode_spec_8080[terminator]
+        body += ["# 0x%04x %s" % (exit_address & 0xffff, mnemonic),
+                 "length = terminator()",
+                 "state.pc = (state.pc + length) & 0xffff",
+                 "state._cycles += %d" % cycles]
+    return "\n".join(
+        ["def build_block_%04x(state, mem, watch, watched_write," % pc,
+         "                     zsp_flags, inr_aux_carry, dcr_aux_carry,",
+         "                     read_memory, terminator):",
+         "    def block_%04x():" % pc]
+        + ["        " + line for line in body]
+        + ["    return block_%04x" % pc]) + "\n"
+
+class BlockTranslator():
+    '''Translates and caches the blocks for one emulator. Blocks are
+        keyed by their entry address and dropped as soon as anything
+        writes to the memory they were translated from'''
+
+    def __init__(self, emulator):
+        '''Attaches to the emulator's state to hear about writes to
+            translated memory'''
+        self.emulator = emulator
+        self.state = emulator.state
+        # entry address : (block function, lead cycles), see translate
+        self.blocks = {}
+        # address : entry addresses of the blocks translated from it
+        self._covering = {}
+        # entry address : address just past the block's code
+        self._block_ends = {}
+        # entry address : (build_block, lead cycles, terminator, end)
+        # for blocks compiled ahead of time, see aot_8080
+        self._precompiled = {}
+        # address : entry addresses of the precompiled blocks covering it
+        self._precompiled_covering = {}
+        self.translated_count = 0
+        self.invalidated_count = 0
+        self.state.add_write_watcher(self.invalidate)
+
+    def add_precompiled(self, blocks):
+        '''Makes blocks compiled ahead of time available, keyed by entry
+            address. They are bound to the emulator the first time they
+            are needed, like any other block, but never translated'''
+        self._precompiled.update(blocks)
+        for pc, (build_block, lead_cycles, terminator, end) \
+                                                    in blocks.items():
+            self.state.watch_memory(pc, end - 1)
+            for covered in range(pc, end):
+                self._precompiled_covering.setdefault(covered,
+                                                      set()).add(pc)
+
+    def watch_precompiled(self):
+        '''Marks the memory of every precompiled block in the state's
+            write watch table again, e.g. after it was cleared'''
+        for pc, (build_block, lead_cycles, terminator, end) \
+                                        in self._precompiled.items():
+            self.state.watch_memory(pc, end - 1)
+
+    def drop_precompiled(self):
+        '''Drops every block added with add_precompiled, e.g. when they
+            were compiled for handlers the emulator no longer uses'''
+        self._precompiled.clear()
+        self._precompiled_covering.clear()
+
+    def close(self):
+        '''Detaches from the state and drops every block'''
+        self.state.remove_write_watcher(self.invalidate)
+        self.flush()
+
+    def flush(self):
+        '''Drops every block, e.g. after the emulator's instruction
+            dict or traps have changed'''
+        self.blocks.clear()
+        self._covering.clear()
+        self._block_ends.clear()
+
+    def invalidate(self, address):
+        '''Drops the blocks translated from a written address'''
+        for pc in self._precompiled_covering.pop(address, ()):
+            self._precompiled.pop(pc, None)
+        entries = self._covering.pop(address, None)
+        if entries is None:
+            return
+        for entry in entries:
+            if self.blocks.pop(entry, None) is not None:
+                self.invalidated_count += 1
+            end = self._block_ends.pop(entry, entry)
+            for covered in range(entry, end):
+                covering = self._covering.get(covered)
+                if covering is not None:
+                    covering.discard(entry)
+
+    def translate(self, pc):
+        '''Translates the block starting at pc and caches it, returning
+            (function, lead cycles), see scan_block. The function is None
+            if there is nothing worth translating at pc'''
+        precompiled = self._precompiled.get(pc)
+        if precompiled is not None:
+            build_block, lead_cycles, terminator, end = precompiled
+            traps = self.emulator._traps
+            if not any(pc < trap < end for trap in traps):
+                return self._add_block(pc, *precompiled)
+        block = scan_block(self.state._memory, pc, self.emulator._traps,
+                           self.state._read_memory is not None)
+        if block is None:
+            entry = (None, 0)
+            self.blocks[pc] = entry
+            return entry
+        source = block_source(pc, block)
+        filename = "<8080 block 0x%04x>" % pc
+        # register the source so tracebacks can show generated lines
+        linecache.cache[filename] = (len(source), None,
+                                     source.splitlines(True), filename)
+        namespace = {}
+        exec(compile(source, filename, 'exec'), namespace)
+        build_block = namespace['build_block_%04x' % pc]
+        lines, exit_address, inline_cycles, lead_cycles, terminator, end \
+                                                                = block
+        self.translated_count += 1
+        return self._add_block(pc, build_block, lead_cycles, terminator,
+                               end)
+
+    def _add_block(self, pc, build_block, lead_cycles, terminator, end):
+        '''Binds a block to this emulator, caches it and watches the
+            memory it was translated from'''
+        handler = None
+        if terminator is not None:
+            handler = self.emulator.instruction_dict_8080[terminator]
+        state = self.state
+        function = build_block(state, state._memory, state._write_watch,
+                               state.watched_write, zsp_flags,
+                               inr_aux_carry, dcr_aux_carry,
+                               state._read_memory, handler)
+        entry = (function, lead_cycles)
+        self.blocks[pc] = entry
+        self._block_ends[pc] = end
+        state.watch_memory(pc, end - 1)
+        for covered in range(pc, end):
+            self._covering.setdefault(covered, set()).add(pc)
+        return entry
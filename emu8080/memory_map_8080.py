@@ -0,0 +1,174 @@
+'''
+    python8080, an 8080 emulator designed for arcade games.
+    Copyright (C) 2019  Jacob Gray
+
+    This program is free software: you can redistribute it and/or
+    modify it under the terms of the GNU General Public License as
+    published by the Free Software Foundation, either version 3 of
+    the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.
+    If not, see <https://www.gnu.org/licenses/>.
+'''
+
+''' Describes what lies behind each 256-byte page of the address space:
+    RAM, ROM, a mirror of other memory or a memory-mapped device. Memory
+    itself stays one flat bytearray that the instruction handlers index
+    directly, so RAM pages cost nothing. Every other page is marked in
+    the state's write watch table, and a write to it is passed to the
+    handler for its page straight after it lands:
+    ROM     : the original byte is put back before any other write
+              watcher hears of it, so nothing treats it as changed
+    mirror  : the byte is copied to the memory it mirrors
+    device  : the device's write function is called with the address
+              and byte
+
+    Reads are plain indexing unless a page has a read handler: a mirror,
+    which reads the memory it repeats, or a device given a read
+    function. Only then does the emulator switch to handlers reading
+    every data byte through the map's read function, which costs a
+    call per read, so a machine should only declare mirrors it needs.
+    Instructions are always fetched by plain indexing, so code cannot
+    be run from a mirror or device page '''
+
+PAGE_SHIFT = 8
+PAGE_SIZE = 1 << PAGE_SHIFT
+PAGE_COUNT = 0x10000 >> PAGE_SHIFT
+
+class MemoryMap():
+    '''Page table for one machine. Declare the pages with the map_*
+        methods, then attach it to an emulator once the ROM is loaded,
+        with attach or Emulator8080.set_memory_map'''
+
+    def __init__(self):
+        '''Every page starts out as RAM'''
+        # page : function(address) called after a write to the page,
+        # or None for RAM
+        self._write_handlers = [None] * PAGE_COUNT
+        # page : function(address) returning the byte read there, or
+        # None to read memory as it is
+        self._read_handlers = [None] * PAGE_COUNT
+        self._emulator = None
+        self._state = None
+        self._rom_image = None
+
+    def _pages(self, start, end):
+        '''Pages covering an inclusive address range, which must start
+            and end on page boundaries'''
+        if start % PAGE_SIZE or (end + 1) % PAGE_SIZE:
+            raise ValueError("Memory map range 0x%04x-0x%04x is not "
+                             "page aligned" % (start, end))
+        return range(start // PAGE_SIZE, (end + 1) // PAGE_SIZE)
+
+    def _set_pages(self, start, end, write, read = None):
+        '''Sets the write and read handlers of every page in a range'''
+        if self._state is not None:
+            raise RuntimeError("Memory map changed while attached")
+        for page in self._pages(start, end):
+            self._write_handlers[page] = write
+            self._read_handlers[page] = read
+
+    def map_ram(self, start, end):
+        '''Plain read/write memory, the default'''
+        self._set_pages(start, end, None)
+
+    def map_rom(self, start, end):
+        '''Read-only memory, writes are undone'''
+        self._set_pages(start, end, self._write_rom)
+
+    def map_mirror(self, start, end, base_start, base_end):
+        '''Memory that repeats base_start-base_end, reads come from and
+            writes go through to the mirrored address'''
+        size = base_end + 1 - base_start
+        def base(address):
+            return base_start + (address - start) % size
+        def write_mirror(address):
+            memory = self._state._memory
+            memory[base(address)] = memory[address]
+            if self._state._write_watch[base(address)]:
+                self._state.watched_write(base(address))
+        def read_mirror(address):
+            return self._state._memory[base(address)]
+        self._set_pages(start, end, write_mirror, read_mirror)
+
+    def map_device(self, start, end, write, read = None):
+        '''Memory-mapped device, write(address, value) is called for
+            every write to it and, if given, read(address) returns the
+            byte for every read from it'''
+        def write_device(address):
+            write(address, self._state._memory[address])
+        self._set_pages(start, end, write_device, read)
+
+    def reads_mapped(self):
+        '''True if any page has a read handler, so the handlers must
+            read through read_memory'''
+        return any(handler is not None for handler in self._read_handlers)
+
+    def attach(self, emulator):
+        '''Starts enforcing the map on an emulator, detaching any map it
+            had. ROM pages are protected with the contents they have
+            now'''
+        if emulator._memory_map is not None:
+            emulator._memory_map.detach()
+        self._emulator = emulator
+        self._state = state = emulator.state
+        self._rom_image = bytes(state._memory)
+        if self.reads_mapped():
+            state._read_memory = self._read_function()
+        # first, so a write it undoes goes no further
+        state.add_write_watcher(self._write, first = True)
+        emulator._memory_map = self
+        emulator._memory_map_changed()
+
+    def detach(self):
+        '''Stops enforcing the map, memory becomes flat RAM again and
+            the emulator goes back to handlers reading it directly'''
+        emulator = self._emulator
+        self._state.remove_write_watcher(self._write)
+        self._state._read_memory = None
+        self._emulator = None
+        self._state = None
+        self._rom_image = None
+        emulator._memory_map = None
+        emulator._memory_map_changed()
+
+    def _watch_pages(self):
+        '''Marks every page with a write handler in the state's write
+            watch table'''
+        for page in range(PAGE_COUNT):
+            if self._write_handlers[page] is not None:
+                self._state.watch_memory(page * PAGE_SIZE,
+                                         page * PAGE_SIZE + PAGE_SIZE - 1)
+
+    def _read_function(self):
+        '''Returns read_memory(address) for the handlers, which looks
+            up the page's read handler and indexes memory if it has
+            none'''
+        memory = self._state._memory
+        read_handlers = self._read_handlers
+        def read_memory(address):
+            handler = read_handlers[address >> PAGE_SHIFT]
+            if handler is None:
+                return memory[address]
+            return handler(address)
+        return read_memory
+
+    def _write(self, address):
+        '''Write watcher, passes the write to its page's handler.
+            Returns True for a write to ROM, which has been undone, so
+            the watchers after it are not told'''
+        handler = self._write_handlers[address >> PAGE_SHIFT]
+        if handler is None:
+            return False
+        handler(address)
+        return handler == self._write_rom
+
+    def _write_rom(self, address):
+        '''Puts back the ROM byte a write replaced'''
+        self._state._memory[address] = self._rom_image[address]
@@ -0,0 +1,297 @@
+''' 
+    python8080, an 8080 emulator designed for arcade games.
+    Copyright (C) 2019  Jacob Gray
+
+    This program is free software: you can redistribute it and/or
+    modify it under the terms of the GNU General Public License as
+    published by the Free Software Foundation, either version 3 of
+    the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  
+    If not, see <https://www.gnu.org/licenses/>.
+'''
+
+'''Declarative description of the 8080 instruction set, one entry per
+    opcode. The instruction handlers are generated from this table by
+    codegen_8080, so changing how an instruction behaves means changing
+    its template there, not writing a new function here.
+
+    opcode : (mnemonic, operation, operands, length, cycles, flags)
+
+    mnemonic   : assembly text, logged by the traced handlers and
+                 written into the JIT's translated blocks as comments
+    operation  : name of the codegen_8080 template that implements it
+    operands   : 8-bit registers ('m' is the memory byte addressed by
+                 HL, 'd8' the immediate byte), register pairs ('bc',
+                 'de', 'hl', 'sp', 'psw'), conditions ('nz', 'c', ...)
+                 or a constant such as the RST target address
+    length     : instruction size in bytes
+    cycles     : duration in clock cycles. Conditional CALL/RET take 6
+                 more than listed when the branch is taken
+    flags      : the flags the instruction writes. codegen_8080 checks
+                 each generated handler sets exactly these
+'''
+opcode_spec_8080 = {
+    0x00 : ("NOP",        'nop',           (),           1,  4, ''),
+    0x01 : ("LXI B,D16",  'lxi',           ('bc',),      3, 10, ''),
+    0x02 : ("STAX B",     'stax',          ('bc',),      1,  7, ''),
+    0x03 : ("INX B",      'inx',           ('bc',),      1,  5, ''),
+    0x04 : ("INR B",      'inr',           ('b',),       1,  5, 'z s p ac'),
+    0x05 : ("DCR B",      'dcr',           ('b',),       1,  5, 'z s p ac'),
+    0x06 : ("MVI B,D8",   'mvi',           ('b',),       2,  7, ''),
+    0x07 : ("RLC",        'rlc',           (),           1,  4, 'cy'),
+    0x08 : ("---",        'nop',           (),           1,  4, ''),
+    0x09 : ("DAD B",      'dad',           ('bc',),      1, 10, 'cy'),
+    0x0a : ("LDAX B",     'ldax',          ('bc',),      1,  7, ''),
+    0x0b : ("DCX B",      'dcx',           ('bc',),      1,  5, ''),
+    0x0c : ("INR C",      'inr',           ('c',),       1,  5, 'z s p ac'),
+    0x0d : ("DCR C",      'dcr',           ('c',),       1,  5, 'z s p ac'),
+    0x0e : ("MVI C,D8",   'mvi',           ('c',),       2,  7, ''),
+    0x0f : ("RRC",        'rrc',           (),           1,  4, 'cy'),
+    0x10 : ("---",        'nop',           (),           1,  4, ''),
+    0x11 : ("LXI D,D16",  'lxi',           ('de',),      3, 10, ''),
+    0x12 : ("STAX D",     'stax',          ('de',),      1,  7, ''),
+    0x13 : ("INX D",      'inx',           ('de',),      1,  5, ''),
+    0x14 : ("INR D",      'inr',           ('d',),       1,  5, 'z s p ac'),
+    0x15 : ("DCR D",      'dcr',           ('d',),       1,  5, 'z s p ac'),
+    0x16 : ("MVI D,D8",   'mvi',           ('d',),       2,  7, ''),
+    0x17 : ("RAL",        'ral',           (),           1,  4, 'cy'),
+    0x18 : ("---",        'nop',           (),           1,  4, ''),
+    0x19 : ("DAD D",      'dad',           ('de',),      1, 10, 'cy'),
+    0x1a : ("LDAX D",     'ldax',          ('de',),      1,  7, ''),
+    0x1b : ("DCX D",      'dcx',           ('de',),      1,  5, ''),
+    0x1c : ("INR E",      'inr',           ('e',),       1,  5, 'z s p ac'),
+    0x1d : ("DCR E",      'dcr',           ('e',),       1,  5, 'z s p ac'),
+    0x1e : ("MVI E,D8",   'mvi',           ('e',),       2,  7, ''),
+    0x1f : ("RAR",        'rar',           (),           1,  4, 'cy'),
+    0x20 : ("RIM",        'unimplemented', (),           1,  4, ''),
+    0x21 : ("LXI H,D16",  'lxi',           ('hl',),      3, 10, ''),
+    0x22 : ("SHLD adr",   'shld',          (),           3, 16, ''),
+    0x23 : ("INX H",      'inx',           ('hl',),      1,  5, ''),
+    0x24 : ("INR H",      'inr',           ('h',),       1,  5, 'z s p ac'),
+    0x25 : ("DCR H",      'dcr',           ('h',),       1,  5, 'z s p ac'),
+    0x26 : ("MVI H,D8",   'mvi',           ('h',),       2,  7, ''),
+    0x27 : ("DAA",        'daa',           (),           1,  4, 'z s p cy ac'),
+    0x28 : ("---",        'nop',           (),           1,  4, ''),
+    0x29 : ("DAD H",      'dad',           ('hl',),      1, 10, 'cy'),
+    0x2a : ("LHLD adr",   'lhld',          (),           3, 16, ''),
+    0x2b : ("DCX H",      'dcx',           ('hl',),      1,  5, ''),
+    0x2c : ("INR L",      'inr',           ('l',),       1,  5, 'z s p ac'),
+    0x2d : ("DCR L",      'dcr',           ('l',),       1,  5, 'z s p ac'),
+    0x2e : ("MVI L,D8",   'mvi',           ('l',),       2,  7, ''),
+    0x2f : ("CMA",        'cma',           (),           1,  4, ''),
+    0x30 : ("SIM",        'unimplemented', (),           1,  4, ''),
+    0x31 : ("LXI SP,D16", 'lxi',           ('sp',),      3, 10, ''),
+    0x32 : ("STA adr",    'sta',           (),           3, 13, ''),
+    0x33 : ("INX SP",     'inx',           ('sp',),      1,  5, ''),
+    0x34 : ("INR M",      'inr',           ('m',),       1, 10, 'z s p ac'),
+    0x35 : ("DCR M",      'dcr',           ('m',),       1, 10, 'z s p ac'),
+    0x36 : ("MVI M,D8",   'mvi',           ('m',),       2, 10, ''),
+    0x37 : ("STC",        'stc',           (),           1,  4, 'cy'),
+    0x38 : ("---",        'nop',           (),           1,  4, ''),
+    0x39 : ("DAD SP",     'dad',           ('sp',),      1, 10, 'cy'),
+    0x3a : ("LDA adr",    'lda',           (),           3, 13, ''),
+    0x3b : ("DCX SP",     'dcx',           ('sp',),      1,  5, ''),
+    0x3c : ("INR A",      'inr',           ('a',),       1,  5, 'z s p ac'),
+    0x3d : ("DCR A",      'dcr',           ('a',),       1,  5, 'z s p ac'),
+    0x3e : ("MVI A,D8",   'mvi',           ('a',),       2,  7, ''),
+    0x3f : ("CMC",        'cmc',           (),           1,  4, 'cy'),
+    0x40 : ("MOV B,B",    'mov',           ('b', 'b'),   1,  5, ''),
+    0x41 : ("MOV B,C",    'mov',           ('b', 'c'),   1,  5, ''),
+    0x42 : ("MOV B,D",    'mov',           ('b', 'd'),   1,  5, ''),
+    0x43 : ("MOV B,E",    'mov',           ('b', 'e'),   1,  5, ''),
+    0x44 : ("MOV B,H",    'mov',           ('b', 'h'),   1,  5, ''),
+    0x45 : ("MOV B,L",    'mov',           ('b', 'l'),   1,  5, ''),
+    0x46 : ("MOV B,M",    'mov',           ('b', 'm'),   1,  7, ''),
+    0x47 : ("MOV B,A",    'mov',           ('b', 'a'),   1,  5, ''),
+    0x48 : ("MOV C,B",    'mov',           ('c', 'b'),   1,  5, ''),
+    0x49 : ("MOV C,C",    'mov',           ('c', 'c'),   1,  5, ''),
+    0x4a : ("MOV C,D",    'mov',           ('c', 'd'),   1,  5, ''),
+    0x4b : ("MOV C,E",    'mov',           ('c', 'e'),   1,  5, ''),
+    0x4c : ("MOV C,H",    'mov',           ('c', 'h'),   1,  5, ''),
+    0x4d : ("MOV C,L",    'mov',           ('c', 'l'),   1,  5, ''),
+    0x4e : ("MOV C,M",    'mov',           ('c', 'm'),   1,  7, ''),
+    0x4f : ("MOV C,A",    'mov',           ('c', 'a'),   1,  5, ''),
+    0x50 : ("MOV D,B",    'mov',           ('d', 'b'),   1,  5, ''),
+    0x51 : ("MOV D,C",    'mov',           ('d', 'c'),   1,  5, ''),
+    0x52 : ("MOV D,D",    'mov',           ('d', 'd'),   1,  5, ''),
+    0x53 : ("MOV D,E",    'mov',           ('d', 'e'),   1,  5, ''),
+    0x54 : ("MOV D,H",    'mov',           ('d', 'h'),   1,  5, ''),
+    0x55 : ("MOV D,L",    'mov',           ('d', 'l'),   1,  5, ''),
+    0x56 : ("MOV D,M",    'mov',           ('d', 'm'),   1,  7, ''),
+    0x57 : ("MOV D,A",    'mov',           ('d', 'a'),   1,  5, ''),
+    0x58 : ("MOV E,B",    'mov',           ('e', 'b'),   1,  5, ''),
+    0x59 : ("MOV E,C",    'mov',           ('e', 'c'),   1,  5, ''),
+    0x5a : ("MOV E,D",    'mov',           ('e', 'd'),   1,  5, ''),
+    0x5b : ("MOV E,E",    'mov',           ('e', 'e'),   1,  5, ''),
+    0x5c : ("MOV E,H",    'mov',           ('e', 'h'),   1,  5, ''),
+    0x5d : ("MOV E,L",    'mov',           ('e', 'l'),   1,  5, ''),
+    0x5e : ("MOV E,M",    'mov',           ('e', 'm'),   1,  7, ''),
+    0x5f : ("MOV E,A",    'mov',           ('e', 'a'),   1,  5, ''),
+    0x60 : ("MOV H,B",    'mov',           ('h', 'b'),   1,  5, ''),
+    0x61 : ("MOV H,C",    'mov',           ('h', 'c'),   1,  5, ''),
+    0x62 : ("MOV H,D",    'mov',           ('h', 'd'),   1,  5, ''),
+    0x63 : ("MOV H,E",    'mov',           ('h', 'e'),   1,  5, ''),
+    0x64 : ("MOV H,H",    'mov',           ('h', 'h'),   1,  5, ''),
+    0x65 : ("MOV H,L",    'mov',           ('h', 'l'),   1,  5, ''),
+    0x66 : ("MOV H,M",    'mov',           ('h', 'm'),   1,  7, ''),
+    0x67 : ("MOV H,A",    'mov',           ('h', 'a'),   1,  5, ''),
+    0x68 : ("MOV L,B",    'mov',           ('l', 'b'),   1,  5, ''),
+    0x69 : ("MOV L,C",    'mov',           ('l', 'c'),   1,  5, ''),
+    0x6a : ("MOV L,D",    'mov',           ('l', 'd'),   1,  5, ''),
+    0x6b : ("MOV L,E",    'mov',           ('l', 'e'),   1,  5, ''),
+    0x6c : ("MOV L,H",    'mov',           ('l', 'h'),   1,  5, ''),
+    0x6d : ("MOV L,L",    'mov',           ('l', 'l'),   1,  5, ''),
+    0x6e : ("MOV L,M",    'mov',           ('l', 'm'),   1,  7, ''),
+    0x6f : ("MOV L,A",    'mov',           ('l', 'a'),   1,  5, ''),
+    0x70 : ("MOV M,B",    'mov',           ('m', 'b'),   1,  7, ''),
+    0x71 : ("MOV M,C",    'mov',           ('m', 'c'),   1,  7, ''),
+    0x72 : ("MOV M,D",    'mov',           ('m', 'd'),   1,  7, ''),
+    0x73 : ("MOV M,E",    'mov',           ('m', 'e'),   1,  7, ''),
+    0x74 : ("MOV M,H",    'mov',           ('m', 'h'),   1,  7, ''),
+    0x75 : ("MOV M,L",    'mov',           ('m', 'l'),   1,  7, ''),
+    0x76 : ("HLT",        'hlt',           (),           1,  7, ''),
+    0x77 : ("MOV M,A",    'mov',           ('m', 'a'),   1,  7, ''),
+    0x78 : ("MOV A,B",    'mov',           ('a', 'b'),   1,  5, ''),
+    0x79 : ("MOV A,C",    'mov',           ('a', 'c'),   1,  5, ''),
+    0x7a : ("MOV A,D",    'mov',           ('a', 'd'),   1,  5, ''),
+    0x7b : ("MOV A,E",    'mov',           ('a', 'e'),   1,  5, ''),
+    0x7c : ("MOV A,H",    'mov',           ('a', 'h'),   1,  5, ''),
+    0x7d : ("MOV A,L",    'mov',           ('a', 'l'),   1,  5, ''),
+    0x7e : ("MOV A,M",    'mov',           ('a', 'm'),   1,  7, ''),
+    0x7f : ("MOV A,A",    'mov',           ('a', 'a'),   1,  5, ''),
+    0x80 : ("ADD B",      'add',           ('b',),       1,  4, 'z s p cy ac'),
+    0x81 : ("ADD C",      'add',           ('c',),       1,  4, 'z s p cy ac'),
+    0x82 : ("ADD D",      'add',           ('d',),       1,  4, 'z s p cy ac'),
+    0x83 : ("ADD E",      'add',           ('e',),       1,  4, 'z s p cy ac'),
+    0x84 : ("ADD H",      'add',           ('h',),       1,  4, 'z s p cy ac'),
+    0x85 : ("ADD L",      'add',           ('l',),       1,  4, 'z s p cy ac'),
+    0x86 : ("ADD M",      'add',           ('m',),       1,  7, 'z s p cy ac'),
+    0x87 : ("ADD A",      'add',           ('a',),       1,  4, 'z s p cy ac'),
+    0x88 : ("ADC B",      'adc',           ('b',),       1,  4, 'z s p cy ac'),
+    0x89 : ("ADC C",      'adc',           ('c',),       1,  4, 'z s p cy ac'),
+    0x8a : ("ADC D",      'adc',           ('d',),       1,  4, 'z s p cy ac'),
+    0x8b : ("ADC E",      'adc',           ('e',),       1,  4, 'z s p cy ac'),
+    0x8c : ("ADC H",      'adc',           ('h',),       1,  4, 'z s p cy ac'),
+    0x8d : ("ADC L",      'adc',           ('l',),       1,  4, 'z s p cy ac'),
+    0x8e : ("ADC M",      'adc',           ('m',),       1,  7, 'z s p cy ac'),
+    0x8f : ("ADC A",      'adc',           ('a',),       1,  4, 'z s p cy ac'),
+    0x90 : ("SUB B",      'sub',           ('b',),       1,  4, 'z s p cy ac'),
+    0x91 : ("SUB C",      'sub',           ('c',),       1,  4, 'z s p cy ac'),
+    0x92 : ("SUB D",      'sub',           ('d',),       1,  4, 'z s p cy ac'),
+    0x93 : ("SUB E",      'sub',           ('e',),       1,  4, 'z s p cy ac'),
+    0x94 : ("SUB H",      'sub',           ('h',),       1,  4, 'z s p cy ac'),
+    0x95 : ("SUB L",      'sub',           ('l',),       1,  4, 'z s p cy ac'),
+    0x96 : ("SUB M",      'sub',           ('m',),       1,  7, 'z s p cy ac'),
+    0x97 : ("SUB A",      'sub',           ('a',),       1,  4, 'z s p cy ac'),
+    0x98 : ("SBB B",      'sbb',           ('b',),       1,  4, 'z s p cy ac'),
+    0x99 : ("SBB C",      'sbb',           ('c',),       1,  4, 'z s p cy ac'),
+    0x9a : ("SBB D",      'sbb',           ('d',),       1,  4, 'z s p cy ac'),
+    0x9b : ("SBB E",      'sbb',           ('e',),       1,  4, 'z s p cy ac'),
+    0x9c : ("SBB H",      'sbb',           ('h',),       1,  4, 'z s p cy ac'),
+    0x9d : ("SBB L",      'sbb',           ('l',),       1,  4, 'z s p cy ac'),
+    0x9e : ("SBB M",      'sbb',           ('m',),       1,  7, 'z s p cy ac'),
+    0x9f : ("SBB A",      'sbb',           ('a',),       1,  4, 'z s p cy ac'),
+    0xa0 : ("ANA B",      'ana',           ('b',),       1,  4, 'z s p cy ac'),
+    0xa1 : ("ANA C",      'ana',           ('c',),       1,  4, 'z s p cy ac'),
+    0xa2 : ("ANA D",      'ana',           ('d',),       1,  4, 'z s p cy ac'),
+    0xa3 : ("ANA E",      'ana',           ('e',),       1,  4, 'z s p cy ac'),
+    0xa4 : ("ANA H",      'ana',           ('h',),       1,  4, 'z s p cy ac'),
+    0xa5 : ("ANA L",      'ana',           ('l',),       1,  4, 'z s p cy ac'),
+    0xa6 : ("ANA M",      'ana',           ('m',),       1,  7, 'z s p cy ac'),
+    0xa7 : ("ANA A",      'ana',           ('a',),       1,  4, 'z s p cy ac'),
+    0xa8 : ("XRA B",      'xra',           ('b',),       1,  4, 'z s p cy ac'),
+    0xa9 : ("XRA C",      'xra',           ('c',),       1,  4, 'z s p cy ac'),
+    0xaa : ("XRA D",      'xra',           ('d',),       1,  4, 'z s p cy ac'),
+    0xab : ("XRA E",      'xra',           ('e',),       1,  4, 'z s p cy ac'),
+    0xac : ("XRA H",      'xra',           ('h',),       1,  4, 'z s p cy ac'),
+    0xad : ("XRA L",      'xra',           ('l',),       1,  4, 'z s p cy ac'),
+    0xae : ("XRA M",      'xra',           ('m',),       1,  7, 'z s p cy ac'),
+    0xaf : ("XRA A",      'xra',           ('a',),       1,  4, 'z s p cy ac'),
+    0xb0 : ("ORA B",      'ora',           ('b',),       1,  4, 'z s p cy ac'),
+    0xb1 : ("ORA C",      'ora',           ('c',),       1,  4, 'z s p cy ac'),
+    0xb2 : ("ORA D",      'ora',           ('d',),       1,  4, 'z s p cy ac'),
+    0xb3 : ("ORA E",      'ora',           ('e',),       1,  4, 'z s p cy ac'),
+    0xb4 : ("ORA H",      'ora',           ('h',),       1,  4, 'z s p cy ac'),
+    0xb5 : ("ORA L",      'ora',           ('l',),       1,  4, 'z s p cy ac'),
+    0xb6 : ("ORA M",      'ora',           ('m',),       1,  7, 'z s p cy ac'),
+    0xb7 : ("ORA A",      'ora',           ('a',),       1,  4, 'z s p cy ac'),
+    0xb8 : ("CMP B",      'cmp',           ('b',),       1,  4, 'z s p cy ac'),
+    0xb9 : ("CMP C",      'cmp',           ('c',),       1,  4, 'z s p cy ac'),
+    0xba : ("CMP D",      'cmp',           ('d',),       1,  4, 'z s p cy ac'),
+    0xbb : ("CMP E",      'cmp',           ('e',),       1,  4, 'z s p cy ac'),
+    0xbc : ("CMP H",      'cmp',           ('h',),       1,  4, 'z s p cy ac'),
+    0xbd : ("CMP L",      'cmp',           ('l',),       1,  4, 'z s p cy ac'),
+    0xbe : ("CMP M",      'cmp',           ('m',),       1,  7, 'z s p cy ac'),
+    0xbf : ("CMP A",      'cmp',           ('a',),       1,  4, 'z s p cy ac'),
+    0xc0 : ("RNZ",        'ret_if',        ('nz',),      1,  5, ''),
+    0xc1 : ("POP B",      'pop',           ('bc',),      1, 10, ''),
+    0xc2 : ("JNZ adr",    'jmp_if',        ('nz',),      3, 10, ''),
+    0xc3 : ("JMP adr",    'jmp',           (),           3, 10, ''),
+    0xc4 : ("CNZ adr",    'call_if',       ('nz',),      3, 11, ''),
+    0xc5 : ("PUSH B",     'push',          ('bc',),      1, 11, ''),
+    0xc6 : ("ADI D8",     'add',           ('d8',),      2,  7, 'z s p cy ac'),
+    0xc7 : ("RST 0",      'rst',           (0x00,),      1, 11, ''),
+    0xc8 : ("RZ",         'ret_if',        ('z',),       1,  5, ''),
+    0xc9 : ("RET",        'ret',           (),           1, 10, ''),
+    0xca : ("JZ adr",     'jmp_if',        ('z',),       3, 10, ''),
+    0xcb : ("---",        'nop',           (),           1,  4, ''),
+    0xcc : ("CZ adr",     'call_if',       ('z',),       3, 11, ''),
+    0xcd : ("CALL adr",   'call',          (),           3, 17, ''),
+    0xce : ("ACI D8",     'adc',           ('d8',),      2,  7, 'z s p cy ac'),
+    0xcf : ("RST 1",      'rst',           (0x08,),      1, 11, ''),
+    0xd0 : ("RNC",        'ret_if',        ('nc',),      1,  5, ''),
+    0xd1 : ("POP D",      'pop',           ('de',),      1, 10, ''),
+    0xd2 : ("JNC adr",    'jmp_if',        ('nc',),      3, 10, ''),
+    0xd3 : ("OUT D8",     'out',           (),           2, 10, ''),
+    0xd4 : ("CNC adr",    'call_if',       ('nc',),      3, 11, ''),
+    0xd5 : ("PUSH D",     'push',          ('de',),      1, 11, ''),
+    0xd6 : ("SUI D8",     'sub',           ('d8',),      2,  7, 'z s p cy ac'),
+    0xd7 : ("RST 2",      'rst',           (0x10,),      1, 11, ''),
+    0xd8 : ("RC",         'ret_if',        ('c',),       1,  5, ''),
+    0xd9 : ("---",        'nop',           (),           1,  4, ''),
+    0xda : ("JC adr",     'jmp_if',        ('c',),       3, 10, ''),
+    0xdb : ("IN D8",      'in',            (),           2, 10, ''),
+    0xdc : ("CC adr",     'call_if',       ('c',),       3, 11, ''),
+    0xdd : ("---",        'nop',           (),           1,  4, ''),
+    0xde : ("SBI D8",     'sbb',           ('d8',),      2,  7, 'z s p cy ac'),
+    0xdf : ("RST 3",      'rst',           (0x18,),      1, 11, ''),
+    0xe0 : ("RPO",        'ret_if',        ('po',),      1,  5, ''),
+    0xe1 : ("POP H",      'pop',           ('hl',),      1, 10, ''),
+    0xe2 : ("JPO adr",    'jmp_if',        ('po',),      3, 10, ''),
+    0xe3 : ("XTHL",       'xthl',          (),           1, 18, ''),
+    0xe4 : ("CPO adr",    'call_if',       ('po',),      3, 11, ''),
+    0xe5 : ("PUSH H",     'push',          ('hl',),      1, 11, ''),
+    0xe6 : ("ANI D8",     'ana',           ('d8',),      2,  7, 'z s p cy ac'),
+    0xe7 : ("RST 4",      'rst',           (0x20,),      1, 11, ''),
+    0xe8 : ("RPE",        'ret_if',        ('pe',),      1,  5, ''),
+    0xe9 : ("PCHL",       'pchl',          (),           1,  5, ''),
+    0xea : ("JPE adr",    'jmp_if',        ('pe',),      3, 10, ''),
+    0xeb : ("XCHG",       'xchg',          (),           1,  4, ''),
+    0xec : ("CPE adr",    'call_if',       ('pe',),      3, 11, ''),
+    0xed : ("---",        'nop',           (),           1,  4, ''),
+    0xee : ("XRI D8",     'xra',           ('d8',),      2,  7, 'z s p cy ac'),
+    0xef : ("RST 5:",     'rst',           (0x28,),      1, 11, ''),
+    0xf0 : ("RP",         'ret_if',        ('p',),       1,  5, ''),
+    0xf1 : ("POP PSW",    'pop',           ('psw',),     1, 10, 'z s p cy ac'),
+    0xf2 : ("JP adr",     'jmp_if',        ('p',),       3, 10, ''),
+    0xf3 : ("DI",         'di',            (),           1,  4, ''),
+    0xf4 : ("CP adr",     'call_if',       ('p',),       3, 11, ''),
+    0xf5 : ("PUSH PSW",   'push',          ('psw',),     1, 11, ''),
+    0xf6 : ("ORI D8",     'ora',           ('d8',),      2,  7, 'z s p cy ac'),
+    0xf7 : ("RST 6",      'rst',           (0x30,),      1, 11, ''),
+    0xf8 : ("RM",         'ret_if',        ('m',),       1,  5, ''),
+    0xf9 : ("SPHL",       'sphl',          (),           1,  5, ''),
+    0xfa : ("JM adr",     'jmp_if',        ('m',),       3, 10, ''),
+    0xfb : ("EI",         'ei',            (),           1,  4, ''),
+    0xfc : ("CM adr",     'call_if',       ('m',),       3, 11, ''),
+    0xfd : ("---",        'nop',           (),           1,  4, ''),
+    0xfe : ("CPI D8",     'cmp',           ('d8',),      2,  7, 'z s p cy ac'),
+    0xff : ("RST 7",      'rst',           (0x38,),      1, 11, ''),
+}
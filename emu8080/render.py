@@ -0,0 +1,423 @@
+''' 
+    python8080, an 8080 emulator designed for arcade games.
+    Copyright (C) 2019  Jacob Gray
+
+    This program is free software: you can redistribute it and/or
+    modify it under the terms of the GNU General Public License as
+    published by the Free Software Foundation, either version 3 of
+    the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  
+    If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import multiprocessing
+import pygame
+try:
+    import numpy
+except ImportError:
+    # optional, only used to speed up drawing
+    numpy = None
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python 3.8 and later, only needed for a render process
+    shared_memory = None
+from data.precalculated import packed_monochrome_to_palette
+
+''' Turns VRAM into frames on the screen. A Renderer builds the
+    rotated image from the packed monochrome VRAM bytes and scales it
+    onto the screen. It only needs a machine's _system_info, so it can
+    run in the emulator's process or in a render process of its own.
+
+    With _system_info['render_process'] set, a RenderWorker starts that
+    process. At each vblank the emulator copies VRAM into one half of a
+    shared memory block and carries on; the process converts, scales and
+    presents the frame from it while the emulation continues, and sends
+    back the input events from its window. Only one frame is ever out
+    with the process, so while it is busy the next one is copied into
+    the other half, replacing any frame already waiting there, and the
+    emulator never waits on the display '''
+
+# Ways of getting the frame onto the screen, see Renderer.open_screen
+_scaling_modes = ('software', 'integer', 'display', 'native', 'headless')
+
+# Seconds RenderWorker.stop waits for the process to end by itself
+_stop_timeout = 2.0
+
+class Renderer():
+    ''' Draws frames for one machine, as described by its _system_info '''
+
+    def __init__(self, system_info):
+        self._system_info = system_info
+        # frame surface the NumPy drawing path reuses, see numpy_frame
+        self._frame = None
+        self._numpy_render = numpy is not None \
+                                and system_info.get('numpy_render')
+        self._scaling = system_info.get('scaling', 'software')
+        if self._scaling not in _scaling_modes:
+            raise ValueError("Unknown scaling: " + str(self._scaling))
+
+    def draw(self, screen, rawimage, rows = None, band = None):
+        ''' Draws a frame of VRAM onto the screen and presents it. band
+            is the (first row, row after the last) range of VRAM rows to
+            draw, or None for all of them. rows is a list of runs of
+            rows within the band from IOAbstract.changed_rows, or None
+            for all of it. Only those rows are converted and redrawn,
+            the rest of the frame is kept as earlier calls left it '''
+        if band is None:
+            band = (0, self._system_info.get('orig_height'))
+        elif rows is None:
+            rows = [band]
+        if self._numpy_render:
+            build_frame = self.numpy_frame
+        else:
+            build_frame = self.table_frame
+        for first, end in rows if rows is not None else [band]:
+            build_frame(rawimage, first, end)
+        image = self.frame_surface()
+        if rows is not None and self.draw_rows(screen, image, rows):
+            return
+        self.blit_scaled(screen, image, image.get_rect())
+        if self._scaling != 'headless':
+            pygame.display.flip()
+
+    def open_screen(self):
+        ''' Returns the surface frames are drawn to, according to
+            _system_info['scaling']:
+            'software' : a target_width x target_height window, scaled
+                         into with pygame.transform.scale (the default)
+            'integer'  : the same window, scaled into by repeating each
+                         pixel with NumPy when the target is a whole
+                         multiple of the image, otherwise as 'software'
+            'display'  : a native size window in pygame's SCALED mode,
+                         so SDL scales it to the desktop, usually on the
+                         GPU, and the emulator does no scaling
+            'native'   : a native size window, nothing is scaled
+            'headless' : a native size surface and no window at all '''
+        if self._scaling == 'headless':
+            return pygame.Surface(self.frame_size())
+        elif self._scaling == 'display':
+            return pygame.display.set_mode(self.frame_size(), pygame.SCALED)
+        elif self._scaling == 'native':
+            return pygame.display.set_mode(self.frame_size())
+        return pygame.display.set_mode(
+                                (self._system_info.get('target_width'),
+                                 self._system_info.get('target_height')))
+
+    def blit_scaled(self, screen, image, area):
+        ''' Draws a Rect area of the (already rotated) image onto the
+            screen, scaled to fit the screen. Returns the rect of the
+            screen it covered '''
+        width, height = image.get_size()
+        screen_width, screen_height = screen.get_size()
+        if (screen_width, screen_height) == (width, height):
+            return screen.blit(image, area.topleft, area)
+        if area.size == (width, height):
+            rect = screen.get_rect()
+        else:
+            x_scale = screen_width // width
+            y_scale = screen_height // height
+            rect = pygame.Rect(area.x * x_scale, area.y * y_scale,
+                               area.width * x_scale, area.height * y_scale)
+        if self._scaling == 'integer' and numpy is not None \
+                and screen.get_bytesize() == 4 \
+                and screen_width % width == 0 \
+                and screen_height % height == 0:
+            self.replicate_pixels(screen, image, area, rect)
+        else:
+            pygame.transform.scale(image.subsurface(area).convert(),
+                                   rect.size, screen.subsurface(rect))
+        return rect
+
+    def replicate_pixels(self, screen, image, area, rect):
+        ''' Scales an area of the palette image by a whole number by
+            writing each pixel's screen color straight into a block of
+            the screen's pixels, with no surface in between '''
+        x_scale = rect.width // area.width
+        y_scale = rect.height // area.height
+        colors = numpy.array([screen.map_rgb(color)
+                              for color in image.get_palette()],
+                             numpy.uint32)
+        indices = pygame.surfarray.pixels2d(image)[area.left:area.right,
+                                                   area.top:area.bottom]
+        block = colors[indices]
+        del indices # unlocks the image
+        pixels = pygame.surfarray.pixels2d(screen)
+        target = pixels[rect.left:rect.right, rect.top:rect.bottom]
+        # one strided copy per position within the block, rather than
+        # building the scaled image in between
+        for x in range(x_scale):
+            for y in range(y_scale):
+                target[x::x_scale, y::y_scale] = block
+        del target, pixels # unlocks the screen
+
+    def rotation(self):
+        ''' Returns rotate_ccw_deg as 0, 90, 180 or 270, the turns of
+            the image the frame builders can do as they lay out pixels '''
+        angle = self._system_info.get('rotate_ccw_deg', 0) % 360
+        if angle % 90:
+            raise ValueError("rotate_ccw_deg must be a multiple of 90")
+        return angle
+
+    def frame_size(self):
+        ''' Returns the (width, height) of the image once rotated '''
+        width = self._system_info.get('orig_width')
+        height = self._system_info.get('orig_height')
+        if self.rotation() in (90, 270):
+            return height, width
+        return width, height
+
+    def strip(self, first, end):
+        ''' Returns the Rect of the rotated image that VRAM rows first up
+            to end are drawn in '''
+        width, height = self.frame_size()
+        rows_high = self._system_info.get('orig_height')
+        angle = self.rotation()
+        if angle == 0:
+            return pygame.Rect(0, first, width, end - first)
+        elif angle == 90:
+            return pygame.Rect(first, 0, end - first, height)
+        elif angle == 180:
+            return pygame.Rect(0, rows_high - end, width, end - first)
+        return pygame.Rect(rows_high - end, 0, end - first, height)
+
+    def draw_rows(self, screen, image, rows):
+        ''' Redraws runs of rows passed to draw, scaling only those
+            strips of the (already rotated) image into place on the
+            screen. Returns False, drawing nothing, if the scaling isn't
+            by a whole number, since strips scaled separately could then
+            differ from scaling the whole image '''
+        width, height = image.get_size()
+        screen_width, screen_height = screen.get_size()
+        if screen_width % width or screen_height % height:
+            return False
+        rects = [self.blit_scaled(screen, image, self.strip(start, end))
+                 for start, end in rows]
+        if self._scaling != 'headless':
+            pygame.display.update(rects)
+        return True
+
+    def frame_surface(self):
+        ''' Returns the palette surface the frame builders draw into,
+            kept between frames so a band of rows can be redrawn on its
+            own '''
+        if self._frame is None:
+            self._frame = pygame.Surface(self.frame_size(), depth = 8)
+            self._frame.set_palette(self._system_info.get('palette'))
+        return self._frame
+
+    def table_frame(self, rawimage, first = 0, end = None):
+        ''' Returns the palette surface draw converts, with VRAM rows
+            first up to end (by default all of them) rebuilt from
+            packed_monochrome_to_palette and turned by rotate_ccw_deg.
+            The pixels are laid out row by row, so each row of the
+            rotated image is a strided slice through them '''
+        width = self._system_info.get('orig_width')
+        if end is None:
+            end = self._system_info.get('orig_height')
+        row_bytes = width // 8
+        image_buffer = []
+        for byte in rawimage[first * row_bytes:end * row_bytes]:
+            image_buffer += packed_monochrome_to_palette.get(byte)
+        image_buffer = bytes(image_buffer)
+        angle = self.rotation()
+        if angle == 90:
+            image_buffer = b''.join(image_buffer[width - 1 - column::width]
+                                    for column in range(width))
+        elif angle == 180:
+            image_buffer = image_buffer[::-1]
+        elif angle == 270:
+            image_buffer = b''.join(image_buffer[column::width][::-1]
+                                    for column in range(width))
+        strip = self.strip(first, end)
+        image = pygame.image.frombuffer(image_buffer, strip.size, "P")
+        image.set_palette(self._system_info.get('palette'))
+        frame = self.frame_surface()
+        frame.blit(image, strip)
+        return frame
+
+    def numpy_frame(self, rawimage, first = 0, end = None):
+        ''' Returns the palette surface draw converts, built with
+            NumPy instead of one list per byte. VRAM rows first up to
+            end (by default all of them) are read in place, each byte
+            expanded to 8 pixels lowest bit first (the order
+            packed_monochrome_to_palette uses) and the pixels copied,
+            turned by rotate_ccw_deg, into the frame surface, whose
+            palette colors them as they are converted '''
+        width = self._system_info.get('orig_width')
+        if end is None:
+            end = self._system_info.get('orig_height')
+        row_bytes = width // 8
+        frame = self.frame_surface()
+        pixels = numpy.unpackbits(numpy.frombuffer(rawimage, numpy.uint8)
+                                  [first * row_bytes:end * row_bytes],
+                                  bitorder = 'little')
+        # indexed [y, x], where surfarray takes [x, y] of the rotated
+        # image. The slicing below is a view, blit_array does the copy
+        pixels = pixels.reshape(end - first, width)
+        angle = self.rotation()
+        if angle == 0:
+            pixels = pixels.T
+        elif angle == 90:
+            pixels = pixels[:, ::-1]
+        elif angle == 180:
+            pixels = pixels[::-1, ::-1].T
+        else:
+            pixels = pixels[::-1, :]
+        pygame.surfarray.blit_array(frame.subsurface(self.strip(first, end)),
+                                    pixels)
+        return frame
+
+class RenderWorker():
+    ''' The emulator's end of a render process, see the module notes '''
+
+    def __init__(self, system_info):
+        ''' Starts the render process, which opens the window. The
+            process is spawned rather than forked so it starts without
+            the emulator's pygame and SDL state '''
+        if shared_memory is None:
+            raise RuntimeError("A render process needs Python 3.8 or "
+                               "later")
+        self._size = system_info.get('vram_end') + 1 \
+                   - system_info.get('vram_start')
+        # two VRAM sized halves, one for the process to draw from while
+        # the other is filled
+        self._memory = shared_memory.SharedMemory(create = True,
+                                                  size = 2 * self._size)
+        context = multiprocessing.get_context('spawn')
+        self._connection, worker_connection = context.Pipe()
+        self._process = context.Process(target = render_process,
+                                        args = (system_info,
+                                                self._memory.name,
+                                                worker_connection),
+                                        daemon = True)
+        self._process.start()
+        worker_connection.close()
+        self._slot = 0 # the half the next frame is copied into
+        self._busy = False # a frame is out with the process
+        self._waiting = False # a frame is in _slot, not yet sent
+        self._waiting_frame = None # its (rows, band)
+        self._events = []
+
+    def submit(self, rawimage, rows = None, band = None):
+        ''' Copies a frame of VRAM into the free half of the shared block
+            and sends it to the process, or leaves it there to go once
+            the process is done with the frame it has. rows and band are
+            as taken by Renderer.draw '''
+        self._receive()
+        start = self._slot * self._size
+        self._memory.buf[start:start + self._size] = rawimage
+        if rows is None and band is not None:
+            rows = [band]
+        if self._waiting:
+            # what the replaced frame changed still has to be drawn
+            waiting_rows, waiting_band = self._waiting_frame
+            if rows is not None and waiting_rows is not None:
+                rows = waiting_rows + rows
+            else:
+                rows = None
+            if band is not None and waiting_band is not None:
+                band = (min(band[0], waiting_band[0]),
+                        max(band[1], waiting_band[1]))
+            else:
+                band = None
+        self._waiting = True
+        self._waiting_frame = (rows, band)
+        self._send()
+
+    def events(self):
+        ''' Returns the (event type, key) pairs sent from the window
+            since the last call, with key None for events without one.
+            A lost process reads as a QUIT event '''
+        self._receive()
+        events = self._events
+        self._events = []
+        return events
+
+    def stop(self):
+        ''' Ends the render process and frees the shared block. A
+            process that is stuck, or never gets the request to end, is
+            terminated after _stop_timeout seconds '''
+        if self._process.is_alive():
+            try:
+                self._connection.send(None)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+        self._process.join(_stop_timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._connection.close()
+        self._memory.close()
+        self._memory.unlink()
+
+    def _send(self):
+        ''' Sends the waiting frame if the process is free for it '''
+        if self._busy or not self._waiting:
+            return
+        try:
+            self._connection.send((self._slot,) + self._waiting_frame)
+        except (BrokenPipeError, ConnectionResetError):
+            self._events.append((pygame.QUIT, None))
+            return
+        self._busy = True
+        self._waiting = False
+        self._slot ^= 1
+
+    def _receive(self):
+        ''' Takes in everything the process has sent, without waiting '''
+        try:
+            while self._connection.poll():
+                message = self._connection.recv()
+                if message is None:
+                    # finished drawing the frame it had
+                    self._busy = False
+                    self._send()
+                else:
+                    self._events.append(message)
+        except (EOFError, ConnectionResetError):
+            self._events.append((pygame.QUIT, None))
+
+def render_process(system_info, memory_name, connection):
+    ''' Body of the render process. Draws each frame it is sent from the
+        shared block, answering None when done so the emulator can send
+        the next, and passes input events from the window back until it
+        is sent None '''
+    pygame.display.init()
+    memory = shared_memory.SharedMemory(name = memory_name)
+    size = len(memory.buf) // 2
+    renderer = Renderer(system_info)
+    screen = renderer.open_screen()
+    # wait no longer than a frame for the next one, so events keep
+    # flowing while the emulator has nothing to draw
+    timeout = system_info.get('framerate')
+    try:
+        while True:
+            for event in pygame.event.get():
+                if event.type in (pygame.KEYDOWN, pygame.KEYUP):
+                    connection.send((event.type, event.key))
+                elif event.type == pygame.QUIT:
+                    connection.send((event.type, None))
+            if not connection.poll(timeout):
+                continue
+            message = connection.recv()
+            if message is None:
+                break
+            slot, rows, band = message
+            frame = memory.buf[slot * size:(slot + 1) * size]
+            renderer.draw(screen, frame, rows, band)
+            frame.release()
+            connection.send(None)
+    except (EOFError, BrokenPipeError, ConnectionResetError):
+        # the emulator has gone
+        pass
+    finally:
+        memory.close()
+        pygame.quit()
@@ -19,7 +19,13 @@
 
 from data.precalculated import packed_monochrome_to_24_bit
 from data.precalculated import parity_dict
+from data.precalculated import zsp_flags
 import time
+try:
+    import numpy
+except ImportError:
+    # optional, only used to speed up get_stringbuffer_from_memory
+    numpy = None
 
 def _get_int_TC(value, max_size = 0xff):
     '''Returns value converted to a signed integer in the specified
@@ -73,55 +79,117 @@ def has_even_parity(value):
 
 
 
+# 8-bit register : (pair holding it, True for the high byte)
+_pair_halves = {
+    'b' : ('bc', True),  'c' : ('bc', False),
+    'd' : ('de', True),  'e' : ('de', False),
+    'h' : ('hl', True),  'l' : ('hl', False)
+}
+
+def _pair_half(register):
+    '''Property presenting one byte of a register pair as an 8-bit
+        register'''
+    pair, high = _pair_halves[register]
+    if high:
+        def get_half(state):
+            return getattr(state, pair) >> 8
+        def set_half(state, value):
+            setattr(state, pair, (value << 8) | (getattr(state, pair) & 0xff))
+    else:
+        def get_half(state):
+            return getattr(state, pair) & 0xff
+        def set_half(state, value):
+            setattr(state, pair, (getattr(state, pair) & 0xff00) | value)
+    return property(get_half, set_half)
+
 class SystemState:
     '''Store all CPU state information'''
-    _memory = [0] * (2**16) # 16 address bits of memory
-    _flags = {
-        'z' : False, # Zero
-        's' : False, # Sign
-        'p' : False, # Parity
-        'cy': False, # Carry
-        'ac': False,  # Auxilliary carry (unimplemented)
-        'interrupt_enabled' : False
-    }
-
-    _registers = {
-        'a' : 0,
-        'b' : 0,
-        'c' : 0,
-        'd' : 0,
-        'e' : 0,
-        'h' : 0,
-        'l' : 0,
-        'sp': 0,
-        'pc': 0
-    }
+    '''Registers and flags are plain integer/bool slots rather than 
+        dict entries, and memory is a single bytearray. Compared with
+        a list of ints this is 64KB rather than ~512KB of memory per 
+        state, and attribute access on a slot is cheaper than hashing
+        a string key. The string-named accessors below are kept for
+        callers that pick registers at runtime.
+        BC, DE and HL are stored as 16-bit pairs, since memory operands
+        through HL are the most common addressing mode and should cost
+        no shifting. B, C, D, E, H and L are properties over them'''
+    __slots__ = (
+        '_memory', '_memory_view',
+        'a', 'bc', 'de', 'hl', 'sp', 'pc',
+        'z',  # Zero
+        's',  # Sign
+        'p',  # Parity
+        'cy', # Carry
+        'ac', # Auxilliary carry
+        'interrupt_enabled',
+        'halted', # HLT has run, waiting for an interrupt
+        '_write_watch',    # nonzero for addresses with write watchers
+        '_write_watchers', # called with the address of a watched write
+        '_written',        # track_writes bitmap, or None
+        '_written_start',  # first address covered by _written
+        '_read_memory',    # MemoryMap read function, or None
+        '_cycles' # 8080 clock cycles (T-states) executed since power up
+    )
+
+    def __init__(self):
+        '''Memory, registers and flags initialize to 0'''
+        self._memory = bytearray(2**16) # 16 address bits of memory
+        self._memory_view = memoryview(self._memory)
+        self.a = 0
+        self.bc = 0
+        self.de = 0
+        self.hl = 0
+        self.sp = 0
+        self.pc = 0
+        self.z = False
+        self.s = False
+        self.p = False
+        self.cy = False
+        self.ac = False
+        self.interrupt_enabled = False
+        self.halted = False
+        self._write_watch = bytearray(2**16)
+        self._write_watchers = []
+        self._written = None
+        self._written_start = 0
+        self._read_memory = None
+        self._cycles = 0
+
+    b = _pair_half('b')
+    c = _pair_half('c')
+    d = _pair_half('d')
+    e = _pair_half('e')
+    h = _pair_half('h')
+    l = _pair_half('l')
 
     def summarize(self, do_memdump = False):
         '''Return all state info on separate lines, 
                 optionally dumping memory to disk'''
                 
         output = "******** Registers ********\n"
-        output +="a  : "+"0x{:02x}".format(self._registers['a']) + "\n"
-        output +="b  : "+"0x{:02x}".format(self._registers['b']) + "\n"
-        output +="c  : "+"0x{:02x}".format(self._registers['c']) + "\n"
-        output +="d  : "+"0x{:02x}".format(self._registers['d']) + "\n"
-        output +="e  : "+"0x{:02x}".format(self._registers['e']) + "\n"
-        output +="h  : "+"0x{:02x}".format(self._registers['h']) + "\n"
-        output +="l  : "+"0x{:02x}".format(self._registers['l']) + "\n"
-        output +="sp : "+"0x{:04x}".format(self._registers['sp'])+ "\n"
-        output +="pc : "+"0x{:04x}".format(self._registers['pc'])+ "\n"
+        output +="a  : "+"0x{:02x}".format(self.a) + "\n"
+        output +="b  : "+"0x{:02x}".format(self.b) + "\n"
+        output +="c  : "+"0x{:02x}".format(self.c) + "\n"
+        output +="d  : "+"0x{:02x}".format(self.d) + "\n"
+        output +="e  : "+"0x{:02x}".format(self.e) + "\n"
+        output +="h  : "+"0x{:02x}".format(self.h) + "\n"
+        output +="l  : "+"0x{:02x}".format(self.l) + "\n"
+        output +="sp : "+"0x{:04x}".format(self.sp)+ "\n"
+        output +="pc : "+"0x{:04x}".format(self.pc)+ "\n"
         output +="\n"
         output +="********** Flags **********\n"
-        output +="z  : " + str(self._flags['z']) + "\n"
-        output +="s  : " + str(self._flags['s']) + "\n"
-        output +="p  : " + str(self._flags['p']) + "\n"
-        output +="cy : " + str(self._flags['cy']) + "\n"
-        output +="ac : " + str(self._flags['ac']) + "\n"
+        output +="z  : " + str(self.z) + "\n"
+        output +="s  : " + str(self.s) + "\n"
+        output +="p  : " + str(self.p) + "\n"
+        output +="cy : " + str(self.cy) + "\n"
+        output +="ac : " + str(self.ac) + "\n"
+        output +="\n"
+        output +="cycles : " + str(self._cycles) + "\n"
+        output +="halted : " + str(self.halted) + "\n"
         
         if do_memdump:
             with open("./memdump", "w") as o:
-                for element in _memory:
+                for element in self._memory:
                     o.write("%02x\n" % element)
                 output += "Memory dump saved to ./memdump\n\n"
         return output
@@ -129,17 +197,78 @@ class SystemState:
     def load_program(self, binary_data, address):
         '''Load binary blob into memory block starting at specified
             address'''
-        for i in range(0, len(binary_data)):
-            self._memory[address] = _get_int_TC(binary_data[i])
-            address += 1
+        end = address + len(binary_data)
+        self._memory[address:end] \
+                    = bytes(byte & 0xff for byte in binary_data)
+        if any(self._write_watch[address:end]):
+            for watched in range(address, end):
+                if self._write_watch[watched]:
+                    self.watched_write(watched)
+
+    def add_write_watcher(self, watcher, first = False):
+        '''Registers a function to be called with the address of any
+            write to memory marked by watch_memory, after the others or,
+            if first is set, before them'''
+        if first:
+            self._write_watchers.insert(0, watcher)
+        else:
+            self._write_watchers.append(watcher)
+
+    def remove_write_watcher(self, watcher):
+        '''Unregisters a function added with add_write_watcher'''
+        self._write_watchers.remove(watcher)
+
+    def watch_memory(self, address_start, address_end):
+        '''Marks an inclusive address range so writes to it are passed
+            to the write watchers'''
+        self._write_watch[address_start:address_end + 1] \
+                    = b'\x01' * (address_end + 1 - address_start)
+
+    def watched_write(self, address):
+        '''Passes a write to a watched address on to the watchers. A
+            watcher returning True has undone the write, and the ones
+            after it are not told. The generated instruction handlers
+            call this directly'''
+        for watcher in self._write_watchers:
+            if watcher(address):
+                return
+
+    def track_writes(self, address_start, address_end):
+        '''Keeps a bitmap of the bytes in an inclusive address range
+            written since the last take_written, e.g. so VRAM can be
+            redrawn only where it changed. Every byte starts out marked
+            as written. Start it through Emulator8080.track_writes, so
+            the instruction handlers report writes. Calling it again
+            replaces the range'''
+        self._written_start = address_start
+        self._written = bytearray(b'\x01' * (address_end + 1
+                                             - address_start))
+        self.watch_memory(address_start, address_end)
+        if self._mark_written not in self._write_watchers:
+            self.add_write_watcher(self._mark_written)
+
+    def _mark_written(self, address):
+        '''Write watcher maintaining the track_writes bitmap'''
+        offset = address - self._written_start
+        if 0 <= offset < len(self._written):
+            self._written[offset] = 1
+
+    def take_written(self, start = 0, end = None):
+        '''Returns the track_writes bitmap, one byte per address that is
+            nonzero if it was written, and clears it. start and end
+            select a slice of it, by offset from the start of the range,
+            leaving the rest marked'''
+        written = bytes(self._written[start:end])
+        self._written[start:start + len(written)] = bytes(len(written))
+        return written
 
     def get_register_value(self, register_name):
         '''Returns the numeric value stored in a register'''
-        return self._registers[register_name]
+        return getattr(self, register_name)
 
     def set_register_copy(self, register_to, register_from):
         '''Sets the value of to to the value of from'''
-        self._registers[register_to] = self._registers[register_from]
+        setattr(self, register_to, getattr(self, register_from))
 
     def set_register_value(self, register_name, value):
         '''Stores value in the named register, provided as a 
@@ -147,101 +276,120 @@ class SystemState:
         if type(value) is str:
             raise ValueError("Register given where value was expected")
         if register_name == 'pc' or register_name == 'sp':
-            self._registers[register_name] = _get_int_TC(value, 0xffff)
+            setattr(self, register_name, value & 0xffff)
         else:
-            self._registers[register_name]= _get_int_TC(value)
+            setattr(self, register_name, value & 0xff)
 
     def get_register_pair_value(self, register_hi, register_lo):
         '''Returns the contents of the named registers as a
             16-bit value'''
-        return self._registers[register_hi] << 8 \
-                        | self._registers[register_lo]
+        return getattr(self, register_hi + register_lo)
 
     def set_register_pair_value(self, value, register_hi, register_lo):
         '''Stores a 16-bit value into a register pair'''
-        self._registers[register_hi]=_get_int_TC((value & 0xff00) >> 8)
-        self._registers[register_lo]=_get_int_TC(value & 0x00ff)
+        setattr(self, register_hi + register_lo, value & 0xffff)
 
     def get_current_opcode(self):
         '''Returns the byte in memory specified by PC'''
-        return self._memory[self._registers['pc']]
+        return self._memory[self.pc]
 
     def get_stack_top(self):
         '''Returns the byte at the address specified by SP'''
-        return self._memory[self._registers['sp']]
+        return self.get_memory_by_address(self.sp)
 
     def get_memory_by_registers(self, register_hi, register_lo):
         '''Returns a byte from memory specified by the provided
             8-bit register pair'''
-        return self._memory[(self._registers[register_hi] << 8) \
-                            | self._registers[register_lo]]
+        return self.get_memory_by_address(
+                                getattr(self, register_hi + register_lo))
 
     def get_memory_by_address(self, address):
         '''Returns a byte from memory at the specified 16-bit 
-            discrete address'''
+            discrete address, read through the memory map if one with
+            read handlers is attached'''
+        if self._read_memory is not None:
+            return self._read_memory(address)
         return self._memory[address]
 
     def get_memory_word_immediate(self):
         '''Returns a 16-bit value from memory immediately following
             the current PC address'''
-        current_pc = self._registers['pc']
+        current_pc = self.pc
         return (self._memory[current_pc+2] << 8) \
                     | self._memory[current_pc+1]
 
     def set_memory_by_registers(self, value, register_hi, register_lo):
         '''Stores a byte in memory at the address specified by the 
             provided 8-bit register pair'''
-        self._memory[(self._registers[register_hi] << 8) \
-                    | self._registers[register_lo]] \
-                    = _get_int_TC(value)
+        self.set_memory_by_address(value,
+                                   getattr(self, register_hi + register_lo))
 
     def set_memory_by_address(self, value, address):
         '''Stores a byte in memory at the address specified'''
-        self._memory[address] = _get_int_TC(value)
+        self._memory[address] = value & 0xff
+        if self._write_watch[address]:
+            self.watched_write(address)
 
     def store_register_at_address(self, register, address):
         '''Stores the value of register at the specified address'''
-        self._memory[address] = self._registers[register]
+        self.set_memory_by_address(getattr(self, register), address)
 
     def set_stack_top(self, value):
         '''Stores a byte at the top of the stack'''
-        self._memory[self._registers['sp']] = _get_int_TC(value)
+        self.set_memory_by_address(value, self.sp)
 
     def get_memory_by_offset(self, offset):
         '''Returns a memory byte by offset from current pc'''
-        address = self._registers['pc'] + offset
-        return self._memory[address]
+        return self._memory[self.pc + offset]
 
     def set_flags(self, value, target_flags):
-        '''Updates _flags based on provided discrete value'''
+        '''Updates flags based on provided discrete value. The ALU
+            instructions set flags inline in the handlers codegen_8080
+            generates, this is kept for general use'''
+        z, s, p = zsp_flags[value & 0xff]
         if 'z' in target_flags: # Zero
-            self._flags['z'] = (value & 0xff) == 0
+            self.z = z
         if 's' in target_flags: # Sign
-            self._flags['s'] = (value & 128) != 0 
+            self.s = s
         if 'p' in target_flags: # Parity
-            self._flags['p'] = has_even_parity(value)
+            self.p = p
         if 'cy' in target_flags: # Carry
-            self._flags['cy'] = value > 0xff
-        #_flags['ac'] = ?? TODO later, it's not part of Space Invaders
+            self.cy = value > 0xff
         return
 
     def set_single_flag(self, target_flag, value):
         '''Sets the target flag to the boolean of the provided value'''
-        self._flags[target_flag] = (value == True) or (value != 0)
+        setattr(self, target_flag, bool(value))
 
     def get_flag(self, name):
         '''Returns the value of the named flag'''
-        return self._flags[name]
+        return getattr(self, name)
 
     def increment_register(self, name):
-        self._registers[name] += 1
+        '''Adds 1 to the named register, wrapping at its size'''
+        if name == 'sp' or name == 'pc':
+            setattr(self, name, (getattr(self, name) + 1) & 0xffff)
+        else:
+            setattr(self, name, (getattr(self, name) + 1) & 0xff)
 
     def decrement_register(self, name):
-        self._registers[name] -= 1
+        '''Subtracts 1 from the named register, wrapping at its size'''
+        if name == 'sp' or name == 'pc':
+            setattr(self, name, (getattr(self, name) - 1) & 0xffff)
+        else:
+            setattr(self, name, (getattr(self, name) - 1) & 0xff)
+
+    def get_cycles(self):
+        '''Returns the number of clock cycles executed so far'''
+        return self._cycles
+
+    def add_cycles(self, amount):
+        '''Advances the clock cycle counter by the given amount'''
+        self._cycles += amount
 
     def increase_pc(self, amount):
         '''Increases the program counter (PC) by the given amount'''
-        self._registers['pc'] += amount
+        self.pc = (self.pc + amount) & 0xffff
 
     def get_bitmap_from_memory(self, address_start, address_end,
                                         width, height):
@@ -282,12 +430,22 @@ class SystemState:
         return bytes(bmp_output)
 
     def get_memory_slice(self, address_start, address_end):
-        '''Returns a section of memory as list'''
-        return self._memory[address_start:address_end+1]
+        '''Returns a read-only view of a section of memory. The view
+            is not a copy, so it follows any later writes'''
+        return self._memory_view[address_start:address_end+1] \
+                    .toreadonly()
 
     def get_stringbuffer_from_memory(self, address_start, address_end):
         '''Returns a section of memory as a string compatible with
             pygame's 24-bit RGB Surface string buffer'''
+        if numpy is not None:
+            # each bit, lowest first, becomes 3 bytes of 0 or 255
+            pixels = numpy.unpackbits(
+                    numpy.frombuffer(self._memory_view[address_start:
+                                                       address_end + 1],
+                                     numpy.uint8),
+                    bitorder = 'little')
+            return (pixels * 255).repeat(3).tobytes()
         output = []
         for byte in self._memory[address_start:address_end+1]:
             '''Using this precalculated dict rather than calculating
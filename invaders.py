@@ -20,11 +20,9 @@
 ''' Holds the I/O code and specific hardware operations for 
     the Space Invaders arcade machine on the 8080 '''
 from sys import exit
-import emu8080.emulator_8080 as emulator_8080
 import pygame
 import time
 from functools import partial
-from multiprocessing import Process
 from data.precalculated import packed_monochrome_to_palette
 from emu8080.io_abstract import IOAbstract
 
@@ -63,8 +61,6 @@ class ShiftRegister():
         return output
 
 class SpaceInvaders(IOAbstract):
-    shift = ShiftRegister()
-
     system_info = {
         'orig_width'    : 256,
         'orig_height'   : 224,
@@ -74,10 +70,19 @@ class SpaceInvaders(IOAbstract):
         'vram_start'    : 0x2400,
         'vram_end'      : 0x3fff,
         'framerate'     : 1.0/60.0,
+        'clock_speed'   : 2000000,
         'palette'       : [(0,0,0), (255,255,255)],
         'mid_vblank'    : True,
-        'vblank_op'     : 0xcf,
-        'mid_vblank_op' : 0xd7
+        'vblank_op'     : 0xd7, # RST 2, end of screen
+        'mid_vblank_op' : 0xcf, # RST 1, scanline 96
+        'spin_detection': True, # main loop mostly waits on the ISRs
+        'jit'           : True,
+        'aot'           : True,
+        'numpy_render'  : True,
+        'dirty_tracking': True,
+        'half_frames'   : True, # the game redraws each half at its ISR
+        'pacing'        : 'realtime',
+        'max_frameskip' : 4
     }
     
     binary_dict = {
@@ -87,6 +92,14 @@ class SpaceInvaders(IOAbstract):
         0x1800 : "bin/invaders/invaders.e"
     }
 
+    # RAM is mirrored through the rest of the address space on the
+    # board, but the game never touches it there, and declaring the
+    # mirror would send every memory read through the map
+    memory_map = {
+        (0x0000, 0x1fff) : 'rom',
+        (0x2000, 0x3fff) : 'ram'
+    }
+
     ''' Read ports:
         Port 0
             bit 0 DIP4 (Seems to be self-test-request read at power up)
@@ -172,7 +185,7 @@ class SpaceInvaders(IOAbstract):
         'fleet4'        : 'sounds/invaders/fastinvader4.wav'
     }
 
-    def __init__(self):
+    def __init__(self, emulator = None):
         ''' Assign local configuration to class variables that
             the super code can see, then initialize super '''
         '''This feels clunky, I don't expect python actually
@@ -180,15 +193,19 @@ class SpaceInvaders(IOAbstract):
             better way to make this work'''
         self._system_info = self.system_info
         self._binary_dict = self.binary_dict
-        self._read_ports  = self.read_ports
-        self._write_ports = self.write_ports
+        self._memory_map  = self.memory_map
+        # Port values change as the machine runs, so each instance
+        # gets its own copy rather than sharing the class dicts
+        self._read_ports  = dict(self.read_ports)
+        self._write_ports = dict(self.write_ports)
         self._sound_dict =  self.sound_dict
         self._keymap      = self.keymap
-        super().__init__()
+        self.shift = ShiftRegister()
+        super().__init__(emulator)
 
     def set_sounds(self, port, new_data):
         '''Plays sound files according to output bit signals'''
-        old_data = self.write_ports[port]
+        old_data = self._write_ports[port]
         if old_data != new_data:
             '''All sound files start only when their relevant bit
                 changes from 0 to 1'''
@@ -216,35 +233,33 @@ class SpaceInvaders(IOAbstract):
                     self._sound_dict['fleet4'].play()
                 if (new_data & 0x10) and not (old_data & 0x10):
                     self._sound_dict['ufohit'].play()
-            self.write_ports[port] = new_data
+            self._write_ports[port] = new_data
         
-    def write_device(self, port_num):
-        '''Takes output from the program and simulates the 
-            appropriate hardware interaction'''
-        data = emulator_8080.get_write_data()
-        if port_num == 2:
-            self.shift.set_offset(data)
-        elif port_num == 3:
-            self.set_sounds(3, data)
-        elif port_num == 4:
-            self.shift.set_and_swap_bytes(data)
-        elif port_num == 5:
-            self.set_sounds(5, data)
-        elif port_num == 6:
-            None # ignore this port
-        #    strange 'debug' port? eg. it writes to this port when    
-        #        it writes text to the screen (0=a,1=b,2=c, etc)
-        else:
-            print("Attempted to write to invalid port " + \
-                                                 str(port_num))
-
-    def read_device(self, port_num):
-        '''Passes I/O data into emulator state'''
-        if port_num == 3: # read shift register
-            data = self.shift.get_value()
-        else:              # read other I/O
-            data = self.read_ports.get(port_num)
-        emulator_8080.apply_read_data(data)
-
-game = SpaceInvaders()
-game.run()
+    def port_writes(self):
+        '''Output ports: the shift register, the two sound ports and
+            port 6, a strange 'debug' port it writes to when it draws
+            text to the screen (0=a,1=b,2=c, etc), which is ignored'''
+        return {
+            2 : self.shift.set_offset,
+            3 : partial(self.set_sounds, 3),
+            4 : self.shift.set_and_swap_bytes,
+            5 : partial(self.set_sounds, 5),
+            6 : self.ignore_write
+        }
+
+    def ignore_write(self, data):
+        '''Write function for ports that do nothing'''
+        return
+
+    def port_reads(self):
+        '''Input ports from _read_ports, plus the shift register result
+            on port 3'''
+        reads = super().port_reads()
+        reads[3] = self.shift.get_value
+        return reads
+
+if __name__ == '__main__':
+    # guarded so a render process, which imports this module again as
+    # it starts, doesn't start another game
+    game = SpaceInvaders()
+    game.run()
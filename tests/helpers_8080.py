@@ -0,0 +1,49 @@
+'''
+    python8080, an 8080 emulator designed for arcade games.
+    Copyright (C) 2019  Jacob Gray
+
+    This program is free software: you can redistribute it and/or
+    modify it under the terms of the GNU General Public License as
+    published by the Free Software Foundation, either version 3 of
+    the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.
+    If not, see <https://www.gnu.org/licenses/>.
+'''
+
+from emu8080.emulator_8080 import Emulator8080
+
+'''Running short programs and comparing the states they end in, shared
+    by the tests'''
+
+REGISTERS = ('a', 'bc', 'de', 'hl', 'sp', 'pc', '_cycles')
+FLAGS = ('z', 's', 'p', 'cy', 'ac')
+
+def run_program(program = b'', pc = 0x0000, cycles = 200, jit = False,
+                setup = None):
+    '''Runs a program loaded at 0 from pc for a number of cycles, with
+        IN and OUT ignored. setup, if given, is called with the emulator
+        before it starts. Returns the emulator'''
+    emulator = Emulator8080()
+    emulator.load_program(program, 0x0000)
+    emulator.state.pc = pc
+    emulator.set_port_handlers({}, {})
+    if setup is not None:
+        setup(emulator)
+    emulator.set_jit(jit)
+    emulator.run_until(cycles = cycles)
+    return emulator
+
+def assert_same_state(test, state, expected):
+    '''Fails the test unless two states have the same registers, flags
+        and memory'''
+    for name in REGISTERS + FLAGS:
+        test.assertEqual(getattr(state, name), getattr(expected, name),
+                         name)
+    test.assertEqual(state._memory, expected._memory)
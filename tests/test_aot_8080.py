@@ -0,0 +1,67 @@
+'''
+    python8080, an 8080 emulator designed for arcade games.
+    Copyright (C) 2019  Jacob Gray
+
+    This program is free software: you can redistribute it and/or
+    modify it under the terms of the GNU General Public License as
+    published by the Free Software Foundation, either version 3 of
+    the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.
+    If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import os
+import tempfile
+import unittest
+from emu8080.aot_8080 import load_rom_blocks, rom_key
+
+'''Checks the module cache for precompiled ROM blocks'''
+
+rom = bytearray(0x10000)
+rom[0:4] = bytes([0x3c, 0xc3, 0x00, 0x00]) # INR A, JMP 0000
+rom_ranges = [(0x0000, 0x00ff)]
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache.cleanup)
+
+    def cached(self):
+        return sorted(os.listdir(self.cache.name))
+
+    def test_key_halves(self):
+        other_rom = bytearray(rom)
+        other_rom[0] = 0x04
+        rom_part, code_part = rom_key(rom, rom_ranges).split("_")
+        other_part = rom_key(other_rom, rom_ranges).split("_")
+        self.assertNotEqual(other_part[0], rom_part)
+        self.assertEqual(other_part[1], code_part)
+        self.assertNotEqual(rom_key(rom, rom_ranges, mapped = True)
+                                .split("_")[0], rom_part)
+
+    def test_stale_modules_removed(self):
+        rom_part = rom_key(rom, rom_ranges).split("_")[0]
+        # left behind by older code for this ROM and for another one,
+        # and named the way keys were before they were split
+        stale = "rom_%s_%s.py" % (rom_part, "0" * 16)
+        other = "rom_%s_%s.py" % ("f" * 16, "0" * 16)
+        unsplit = "rom_%s.py" % ("1" * 16)
+        for name in (stale, other, unsplit):
+            with open(os.path.join(self.cache.name, name), 'w') as module:
+                module.write("blocks = {}\n")
+        blocks = load_rom_blocks(rom, rom_ranges, self.cache.name)
+        self.assertIn(0x0000, blocks)
+        modules = [name for name in self.cached() if name.endswith(".py")]
+        self.assertEqual(modules, sorted(
+            [other, "rom_%s.py" % rom_key(rom, rom_ranges)]))
+
+if __name__ == '__main__':
+    unittest.main()
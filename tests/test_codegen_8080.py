@@ -0,0 +1,61 @@
+'''
+    python8080, an 8080 emulator designed for arcade games.
+    Copyright (C) 2019  Jacob Gray
+
+    This program is free software: you can redistribute it and/or
+    modify it under the terms of the GNU General Public License as
+    published by the Free Software Foundation, either version 3 of
+    the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.
+    If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import unittest
+from emu8080.system_state_8080 import SystemState
+from emu8080.codegen_8080 import build_instruction_dict, _check_flags
+from emu8080.codegen_8080 import instruction_body
+
+'''Checks the flags generated handlers set and what the traced ones
+    pass to dlog'''
+
+class TestTrace(unittest.TestCase):
+
+    def setUp(self):
+        self.logged = []
+        self.state = SystemState()
+        self.handlers = build_instruction_dict(self.state,
+                                    lambda *messages:
+                                        self.logged.append(messages),
+                                    [None] * 0x100, [None] * 0x100,
+                                    traced = True)
+
+    def test_memory_operand(self):
+        self.state.hl = 0x2000
+        self.state._memory[0x2000] = 0x5a
+        self.handlers[0x46]() # MOV B,M
+        self.assertEqual(self.logged, [("MOV B,M\t", 0x5a)])
+
+    def test_return_address(self):
+        self.state.sp = 0x23fe
+        self.state._memory[0x23fe:0x2400] = bytes([0x34, 0x12])
+        self.handlers[0xc9]() # RET
+        self.assertEqual(self.logged, [("RET\t", 0x1234)])
+        self.assertEqual(self.state.pc, 0x1234)
+
+class TestFlags(unittest.TestCase):
+
+    def test_spec_flags_checked(self):
+        body = instruction_body(0x37) # STC
+        _check_flags("STC", body, "cy")
+        with self.assertRaises(ValueError):
+            _check_flags("STC", body, "z s p cy ac")
+
+if __name__ == '__main__':
+    unittest.main()
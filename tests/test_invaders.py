@@ -0,0 +1,74 @@
+'''
+    python8080, an 8080 emulator designed for arcade games.
+    Copyright (C) 2019  Jacob Gray
+
+    This program is free software: you can redistribute it and/or
+    modify it under the terms of the GNU General Public License as
+    published by the Free Software Foundation, either version 3 of
+    the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.
+    If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import os
+import unittest
+# no window or sound needed to run the machine
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+from invaders import SpaceInvaders
+
+'''Runs Space Invaders' attract mode with the emulator's optional modes
+    on and off'''
+
+# long enough for the attract mode to draw and move the invaders
+FRAMES = 120
+
+def make_machine(memory_map = None, **system_info):
+    '''A Space Invaders machine running the ROM without the translator
+        and with system_info overriding the game's settings'''
+    settings = dict(SpaceInvaders.system_info, jit = False, aot = False,
+                    spin_detection = False, pacing = 'turbo')
+    settings.update(system_info)
+    class Machine(SpaceInvaders):
+        pass
+    Machine.system_info = settings
+    if memory_map is not None:
+        Machine.memory_map = memory_map
+    return Machine()
+
+def run_frames(machine, frames = FRAMES):
+    '''Runs the machine for a number of frames'''
+    machine.run_cycles(machine._cycles_per_frame * frames)
+    return machine.emulator.state
+
+class TestInvaders(unittest.TestCase):
+
+    def test_spin_detection_same_ram(self):
+        plain = run_frames(make_machine())
+        spinning = make_machine(spin_detection = True)
+        skipped = run_frames(spinning)
+        self.assertGreater(spinning.emulator.spin_skips, 0)
+        self.assertEqual(skipped._memory[0x2000:0x4000],
+                         plain._memory[0x2000:0x4000])
+
+    def test_changed_rows_without_other_watchers(self):
+        # nothing but track_writes asks the handlers to report writes
+        machine = make_machine(memory_map = {}, dirty_tracking = True)
+        machine.changed_rows()
+        run_frames(machine)
+        self.assertTrue(machine.changed_rows())
+
+    def test_input_poll_cycles_checked(self):
+        for poll_cycles in (0, -1, 1.5):
+            with self.assertRaises(ValueError):
+                make_machine(input_poll_cycles = poll_cycles)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+'''
+    python8080, an 8080 emulator designed for arcade games.
+    Copyright (C) 2019  Jacob Gray
+
+    This program is free software: you can redistribute it and/or
+    modify it under the terms of the GNU General Public License as
+    published by the Free Software Foundation, either version 3 of
+    the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.
+    If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import unittest
+from tests.helpers_8080 import run_program, assert_same_state
+
+'''Checks that translated blocks end up in the same state as the
+    interpreter'''
+
+# Stores 42 over the immediate of the MVI B that follows it in the same
+# block, so B must end up 42
+self_modifying = bytes([
+    0x3e, 0x42,       # MVI A,42
+    0x32, 0x06, 0x00, # STA 0006
+    0x06, 0x00,       # MVI B,00
+    0xc3, 0x07, 0x00  # JMP 0007
+])
+
+# Adds in BCD, pushing every PSW and counting the branches taken on
+# parity, zero, sign and carry. Most of the flags its ALU instructions
+# set are overwritten before they are read
+flag_loop = bytes([
+    0x31, 0x00, 0x02, # LXI SP,0200
+    0x3e, 0x00,       # MVI A,00
+    0xc6, 0x37,       # ADI 37
+    0x27,             # DAA
+    0xf5,             # PUSH PSW
+    0xe2, 0x0d, 0x00, # JPO 000d
+    0x04,             # INR B
+    0xca, 0x11, 0x00, # JZ 0011
+    0x0c,             # INR C
+    0xfa, 0x15, 0x00, # JM 0015
+    0x14,             # INR D
+    0xfe, 0x80,       # CPI 80
+    0xd2, 0x05, 0x00, # JNC 0005
+    0x1c,             # INR E
+    0xc3, 0x05, 0x00  # JMP 0005
+])
+
+class TestBlocks(unittest.TestCase):
+
+    def check_same(self, program = b'', pc = 0x0000, cycles = 200):
+        '''Runs with and without the translator, comparing the results'''
+        interpreted = run_program(program, pc, cycles).state
+        translated = run_program(program, pc, cycles, jit = True).state
+        assert_same_state(self, translated, interpreted)
+        return translated
+
+    def test_store_into_own_block(self):
+        state = self.check_same(self_modifying)
+        self.assertEqual(state.b, 0x42)
+
+    def test_block_at_end_of_memory(self):
+        # NOPs at 0xfffe and 0xffff, after which PC wraps to 0
+        self.check_same(pc = 0xfffe)
+
+    def test_flags_overwritten_in_block(self):
+        self.check_same(flag_loop, cycles = 2000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+'''
+    python8080, an 8080 emulator designed for arcade games.
+    Copyright (C) 2019  Jacob Gray
+
+    This program is free software: you can redistribute it and/or
+    modify it under the terms of the GNU General Public License as
+    published by the Free Software Foundation, either version 3 of
+    the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.
+    If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import unittest
+from emu8080.emulator_8080 import Emulator8080
+from emu8080.memory_map_8080 import MemoryMap
+from tests.helpers_8080 import run_program
+
+'''Checks that memory written through either side of a mirror reads back
+    the same through the other'''
+
+program = bytes([
+    0x3e, 0x5a,       # MVI A,5A
+    0x32, 0x00, 0x20, # STA 2000
+    0x3e, 0x00,       # MVI A,0
+    0x3a, 0x00, 0x40, # LDA 4000, the mirror of 2000
+    0x4f,             # MOV C,A
+    0x3e, 0x77,       # MVI A,77
+    0x32, 0x01, 0x40, # STA 4001
+    0x3a, 0x01, 0x60, # LDA 6001, another mirror of 2001
+    0x76              # HLT
+])
+
+class TestMirror(unittest.TestCase):
+
+    def run_program(self, jit = False, decode_cache = False):
+        '''Runs the program on a machine with RAM at 0x2000-0x3fff
+            mirrored through the rest of the address space'''
+        emulator = Emulator8080()
+        emulator.load_program(program, 0x0000)
+        memory_map = MemoryMap()
+        memory_map.map_rom(0x0000, 0x1fff)
+        memory_map.map_mirror(0x4000, 0xffff, 0x2000, 0x3fff)
+        emulator.set_memory_map(memory_map)
+        emulator.set_jit(jit)
+        emulator.set_decode_cache(decode_cache)
+        emulator.set_port_handlers({}, {})
+        emulator.run_until(cycles = 1000)
+        return emulator.state
+
+    def check(self, state):
+        self.assertEqual(state.c, 0x5a)
+        self.assertEqual(state.a, 0x77)
+        self.assertEqual(state.get_memory_by_address(0x2001), 0x77)
+        self.assertEqual(state.get_memory_by_address(0xe000), 0x5a)
+
+    def test_interpreted(self):
+        self.check(self.run_program())
+
+    def test_jit(self):
+        self.check(self.run_program(jit = True))
+
+    def test_decode_cache(self):
+        self.check(self.run_program(decode_cache = True))
+
+    def test_mirrored_memory_unwatched(self):
+        # only the mirror pages are watched, not the RAM they repeat
+        watch = self.run_program()._write_watch
+        self.assertFalse(any(watch[0x2000:0x4000]))
+        self.assertTrue(all(watch[0x4000:0x10000]))
+
+# writes over its own MVI's operand, which is in ROM
+rom_program = bytes([
+    0x3e, 0x55,       # MVI A,55
+    0x2f,             # CMA
+    0x32, 0x01, 0x00, # STA 0001
+    0xc3, 0x00, 0x00  # JMP 0000
+])
+
+def map_rom(emulator):
+    '''Attaches a map protecting 0x0000-0x1fff as ROM'''
+    memory_map = MemoryMap()
+    memory_map.map_rom(0x0000, 0x1fff)
+    emulator.set_memory_map(memory_map)
+
+class TestRom(unittest.TestCase):
+
+    def test_write_dropped(self):
+        emulator = run_program(rom_program, setup = map_rom)
+        self.assertEqual(emulator.state.get_memory_by_address(0x0001),
+                         0x55)
+
+    def test_block_kept(self):
+        # the undone write never reaches the translator
+        emulator = run_program(rom_program, cycles = 1000, jit = True,
+                               setup = map_rom)
+        translator = emulator._translator
+        self.assertEqual(emulator.state.get_memory_by_address(0x0001),
+                         0x55)
+        self.assertEqual(translator.invalidated_count, 0)
+        self.assertIn(0x0000, translator.blocks)
+        # running on only reuses the blocks
+        translated = translator.translated_count
+        emulator.run_until(cycles = 1000)
+        self.assertEqual(translator.translated_count, translated)
+
+# reads a byte from the device, then writes it back one higher
+device_program = bytes([
+    0x3a, 0x12, 0x40, # LDA 4012
+    0x3c,             # INR A
+    0x32, 0x34, 0x40, # STA 4034
+    0x76              # HLT
+])
+
+class TestDevice(unittest.TestCase):
+
+    def run_device(self, jit = False, decode_cache = False):
+        '''Runs the program with a device at 0x4000-0x40ff, returning
+            what it wrote as (address, byte) pairs'''
+        written = []
+        def setup(emulator):
+            memory_map = MemoryMap()
+            memory_map.map_device(0x4000, 0x40ff,
+                                  lambda address, value:
+                                      written.append((address, value)),
+                                  lambda address: address & 0xff)
+            emulator.set_memory_map(memory_map)
+            emulator.set_decode_cache(decode_cache)
+        run_program(device_program, jit = jit, setup = setup)
+        return written
+
+    def test_interpreted(self):
+        self.assertEqual(self.run_device(), [(0x4034, 0x13)])
+
+    def test_jit(self):
+        self.assertEqual(self.run_device(jit = True), [(0x4034, 0x13)])
+
+    def test_decode_cache(self):
+        self.assertEqual(self.run_device(decode_cache = True),
+                         [(0x4034, 0x13)])
+
+class TestDetach(unittest.TestCase):
+
+    def test_flat_again(self):
+        emulator = Emulator8080()
+        memory_map = MemoryMap()
+        memory_map.map_rom(0x0000, 0x1fff)
+        memory_map.map_mirror(0x4000, 0xffff, 0x2000, 0x3fff)
+        emulator.set_memory_map(memory_map)
+        emulator.set_memory_map(None)
+        state = emulator.state
+        self.assertFalse(any(state._write_watch))
+        self.assertIsNone(state._read_memory)
+        # handlers read memory directly and ROM takes writes again
+        emulator.load_program(bytes([0x3e, 0x99, 0x32, 0x00, 0x00,
+                                     0x3a, 0x00, 0x40, 0x76]), 0x0000)
+        emulator.set_port_handlers({}, {})
+        emulator.run_until(cycles = 100)
+        self.assertEqual(state.get_memory_by_address(0x0000), 0x99)
+        self.assertEqual(state.a, 0x00)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+'''
+    python8080, an 8080 emulator designed for arcade games.
+    Copyright (C) 2019  Jacob Gray
+
+    This program is free software: you can redistribute it and/or
+    modify it under the terms of the GNU General Public License as
+    published by the Free Software Foundation, either version 3 of
+    the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.
+    If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import unittest
+from emu8080.system_state_8080 import SystemState
+
+'''Checks the state's bookkeeping of writes'''
+
+class TestTrackWrites(unittest.TestCase):
+
+    def test_range_replaced(self):
+        state = SystemState()
+        state.track_writes(0x2400, 0x3fff)
+        state.track_writes(0x2400, 0x2fff)
+        self.assertEqual(state._write_watchers.count(state._mark_written),
+                         1)
+        state.take_written()
+        state.set_memory_by_address(0x12, 0x2401)
+        self.assertEqual(state.take_written()[:2], b'\x00\x01')
+
+if __name__ == '__main__':
+    unittest.main()